@@ -1,66 +1,152 @@
-import pandas as pd
+import argparse
 import time
-from datetime import datetime
+import pandas as pd
+from datetime import date
 from config.dbconfig import Base, engine, session
 from scripts.search import busqueda_eventos
-from scripts.clasificar_eventos import extraer_contenido_web, extraer_datos_evento, guardar_eventos, client
-from scripts.procesar_eventos import procesar_respuesta
-from scripts.revisar_links import revisar_links
+from scripts.backfill import backfill_eventos, VENTANA_DIAS
+from scripts.clasificar_eventos import extraer_datos_evento_pagina, guardar_eventos, asegurar_clave_natural, asegurar_columnas, router_extraccion
+from scripts.revisar_links import revisar_links, router_revision
+from scripts.router_llm import NO_HAY_MODELOS_DISPONIBLES, SinModelosDisponibles
+from scripts.crawler import iterar_paginas
+from scripts.cache_llm import imprimir_metricas
+from scripts.procesar_eventos import normalizar_respuestas, registros_evento, TAMANIO_LOTE
+from scripts.indice_sedes import SedeIndex
 from scripts.correccion_sedes import corregir_sedes
 from scripts.asignar_entidad import asignar_entidades_organizadoras
+from scripts.pipeline import ejecutar_pipeline
+from scripts.estado import obtener_estado, ETAPA_EXTRACCION, ETAPA_CARGA, COMPLETADO, DESCARTADO, ERROR
+from scripts.duplicados import IndiceDuplicados, unir_fuentes
+from scripts.metricas import metricas
+from scripts import almacen
 
-if __name__ == '__main__':
 
-    Base.metadata.create_all(engine)
+def ejecutar_por_etapas(buscar=True, session_db=None, backfill=None):
+    """
+    Corre cada etapa completa antes de pasar a la siguiente, comunicándolas por los datasets
+    Parquet de ``scripts.almacen``.
+    ``session_db`` permite cargar los eventos en otra base (el benchmark usa una SQLite).
+    ``backfill`` (kwargs de ``backfill_eventos``) reemplaza la búsqueda diaria por la histórica.
+    La duración de cada etapa completa queda en el span ``etapa_total``; el span ``etapa`` es por
+    elemento procesado y sólo lo registra el pipeline en streaming.
+    """
+    session_db = session_db or session
 
-    # Obtenemos la lista de links y títulos en el archivo resultados_busqueda.csv
-    busqueda_eventos()
+    # Obtenemos la lista de links y títulos en el dataset resultados_busqueda
+    if buscar:
+        with metricas.span("etapa_total", etapa="busqueda"):
+            if backfill:
+                backfill_eventos(**backfill)
+            else:
+                busqueda_eventos()
 
-    # Revisamos los links y generamos el archivo links_eventos_revisados.csv
-    revisar_links()
+    # Revisamos los links y agregamos los válidos al dataset links_eventos_revisados
+    with metricas.span("etapa_total", etapa="revision"):
+        revisar_links()
 
-    # Obtenemos los links revisados
-    urls_df = pd.read_csv(
-        "./data/links_eventos_revisados.csv", sep=";", low_memory=False)
-    lista_urls = urls_df["link"].to_list()
+    # Obtenemos los links revisados (sólo la columna de links)
+    lista_urls = almacen.leer(almacen.LINKS_REVISADOS, columnas=["link"])["link"].to_list()
 
     sedes_df = pd.read_csv("./data/sedes.csv", sep=";")
-    datos_eventos = []
+    # Índice del catálogo de sedes, construido una vez y compartido por todas las etapas
+    indice_sedes = SedeIndex(sedes_df)
+
+    # Cada extracción queda registrada por URL: si la corrida se corta, la siguiente
+    # no vuelve a descargar ni a gastar tokens en las URLs ya procesadas
+    estado = obtener_estado()
+    resueltas = estado.resueltas(ETAPA_EXTRACCION)
+    pendientes = [url for url in lista_urls if url not in resueltas]
+    if len(lista_urls) > len(pendientes):
+        print(f"{len(lista_urls) - len(pendientes)} URLs ya fueron procesadas en corridas anteriores.")
+
+    # Las gacetillas replicadas por varios medios se extraen una sola vez: las copias
+    # quedan como fuentes adicionales del evento de la primera página del grupo
+    duplicados = IndiceDuplicados(estado=estado)
+    con_fuentes_nuevas = set()
+    inicio_extraccion = time.perf_counter()
 
-    # Procesamiento de las URLS con LLM
-    for url in lista_urls:
+    # Las respuestas del LLM se normalizan por lotes. Si la corrida se corta antes de registrar
+    # un lote, la siguiente lo vuelve a pedir pero lo obtiene del caché de respuestas del LLM.
+    respuestas = []
+
+    def extraccion_fallida(url, resultado):
+        # El grupo de copias no se pierde: se liberan para extraerlas en la próxima corrida
+        estado.registrar(url, ETAPA_EXTRACCION, resultado)
+        liberadas = duplicados.descartar(url)
+        if liberadas:
+            print(f"{len(liberadas)} copias de {url} quedan pendientes para la próxima corrida.")
+
+    def registrar_respuestas():
+        if not respuestas:
+            return
+        eventos = normalizar_respuestas(respuestas, indice_sedes)
+        procesados = dict(zip(eventos["sitioWeb"], registros_evento(eventos)))
+        for _, url_respuesta in respuestas:
+            if url_respuesta in procesados:
+                estado.registrar(url_respuesta, ETAPA_EXTRACCION, COMPLETADO, procesados[url_respuesta])
+                duplicados.confirmar(url_respuesta)
+            else:
+                extraccion_fallida(url_respuesta, DESCARTADO)
+                print(f"No se pudieron procesar los datos para {url_respuesta}.")
+        respuestas.clear()
+
+    # Procesamiento de las URLS con LLM. El crawler descarga las páginas en paralelo
+    # y las entrega a medida que terminan, así el LLM no espera a la red.
+    for url, pagina in iterar_paginas(pendientes):
 
         print(f"Procesando URL: {url}")
-        contenido_web = extraer_contenido_web(url)
+        contenido_web = pagina["texto"] if pagina else None
         if contenido_web:
+            representante = duplicados.agregar(url, pagina["texto"])
+            if representante:
+                print(f"Es el mismo artículo que {representante}. Se agrega como fuente adicional.")
+                estado.registrar(url, ETAPA_EXTRACCION, DESCARTADO, {"duplicadoDe": representante})
+                con_fuentes_nuevas.add(representante)
+                continue
+
             try:
-                raw_response = extraer_datos_evento(contenido_web)
+                # Datos estructurados de la página si los hay; si no, una sola llamada al LLM
+                # trae el evento, la sede y el organizador
+                raw_response = extraer_datos_evento_pagina(pagina, contenido_web)
 
-                if raw_response == "NO_HAY_MODELOS_DISPONIBLES":
+                if raw_response == NO_HAY_MODELOS_DISPONIBLES:
                     print(
                         "Todos los modelos alcanzaron el límite de requests gratuitas. Deteniendo el procesamiento.")
                     break
 
                 elif raw_response:
                     print("Respuesta cruda del LLM:", raw_response)
-                    datos_procesados = procesar_respuesta(
-                        raw_response, url, sedes_df)
-                    if datos_procesados:
-                        datos_eventos.append(datos_procesados)
-                    else:
-                        print(f"No se pudieron procesar los datos para {url}.")
+                    respuestas.append((raw_response, url))
+                    if len(respuestas) >= TAMANIO_LOTE:
+                        registrar_respuestas()
                 else:
+                    extraccion_fallida(url, ERROR)
                     print(f"No se obtuvo respuesta del LLM para {url}.")
 
+            except SinModelosDisponibles:
+                print(
+                    "Todos los modelos alcanzaron el límite de requests gratuitas. Deteniendo el procesamiento.")
+                break
             except Exception as e:
+                extraccion_fallida(url, ERROR)
                 print(
                     f"Error inesperado durante el procesamiento de LLM para {url}: {e}")
         else:
+            estado.registrar(url, ETAPA_EXTRACCION, ERROR)
             print(f"No se pudo extraer contenido de la URL {url}. Saltando...")
-        time.sleep(7)
 
-    datos_eventos_filtrados = [
-        evento for evento in datos_eventos if evento is not None]
+    registrar_respuestas()
+    metricas.registrar_duracion("etapa_total", time.perf_counter() - inicio_extraccion, etapa="extraccion")
+
+    # Eventos extraídos (en esta corrida o en una anterior interrumpida) que todavía no se cargaron,
+    # más los ya cargados que sumaron fuentes adicionales en esta corrida
+    cargadas = estado.resueltas(ETAPA_CARGA) - con_fuentes_nuevas
+    fuentes = estado.duplicados()
+    datos_eventos_filtrados = []
+    for url, evento in estado.datos(ETAPA_EXTRACCION, urls=set(lista_urls) | con_fuentes_nuevas):
+        if evento is not None and url not in cargadas:
+            evento["fuentesAdicionales"] = unir_fuentes(fuentes.get(url))
+            datos_eventos_filtrados.append(evento)
     
     df_organizaciones = pd.read_csv("./data/organizadores_normalizado.csv", low_memory=False, sep=";")
 
@@ -68,20 +154,69 @@ if __name__ == '__main__':
         df_eventos = pd.DataFrame(datos_eventos_filtrados)
         
         # Corregimos las sedes usando fuzzy matching
-        df_eventos = corregir_sedes(df_eventos=df_eventos, df_sedes=sedes_df)
+        with metricas.span("etapa_total", etapa="sedes"):
+            df_eventos = corregir_sedes(df_eventos=df_eventos, df_sedes=indice_sedes, llm_client=router_extraccion)
         
-        df_eventos = asignar_entidades_organizadoras(df_eventos=df_eventos, df_organizaciones=df_organizaciones, llm_client=client)
+        with metricas.span("etapa_total", etapa="organizadores"):
+            df_eventos = asignar_entidades_organizadoras(df_eventos=df_eventos, df_organizaciones=df_organizaciones, llm_client=router_extraccion)
 
-        # Generamos el CSV con los eventos para usar en la carga posteriormente
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_filename = f"./data/eventos_procesados_{timestamp}.csv"
-        
-        df_eventos.to_csv(output_filename, index=False, encoding='utf-8', sep=";")
+        # Guardamos los eventos de la corrida para revisarlos o volver a cargarlos posteriormente
+        almacen.agregar(almacen.EVENTOS_PROCESADOS, df_eventos)
         print(
-            f"¡Procesamiento completado! Datos guardados en '{output_filename}'")
+            f"¡Procesamiento completado! Datos guardados en el dataset '{almacen.EVENTOS_PROCESADOS}'")
         try:
-            guardar_eventos(df_eventos, session)
+            with metricas.span("etapa_total", etapa="carga"):
+                carga = guardar_eventos(df_eventos, session_db)
+            # Sólo se dan por cargados los eventos de lotes confirmados; los de lotes revertidos
+            # quedan con error para reintentarse en la próxima corrida
+            for url in df_eventos["sitioWeb"]:
+                if url in carga["cargados"]:
+                    estado.registrar(url, ETAPA_CARGA, COMPLETADO)
+                elif url in carga["fallidos"]:
+                    estado.registrar(url, ETAPA_CARGA, ERROR)
+                else:
+                    estado.registrar(url, ETAPA_CARGA, DESCARTADO)
         finally:
-            session.close()
+            session_db.close()
     else:
         print("No se procesó ningún evento con éxito. El archivo CSV y la inserción en DB no fueron realizados.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Recolector de eventos de turismo de reuniones.")
+    parser.add_argument(
+        "--streaming", action="store_true",
+        help="Conecta las etapas con colas y carga cada evento en la base apenas está listo.")
+    parser.add_argument(
+        "--sin-busqueda", action="store_true",
+        help="No consulta Custom Search; usa los resultados de búsqueda ya guardados.")
+    parser.add_argument(
+        "--backfill", nargs=2, metavar=("DESDE", "HASTA"), type=date.fromisoformat,
+        help="Búsqueda histórica entre dos fechas AAAA-MM-DD, por ventanas y reanudable día a día.")
+    parser.add_argument(
+        "--ventana-dias", type=int, default=VENTANA_DIAS,
+        help=f"Días de cada ventana del backfill (por defecto {VENTANA_DIAS}).")
+    parser.add_argument(
+        "--metricas-prometheus", metavar="ARCHIVO",
+        help="Además del reporte JSON/CSV, escribe las métricas de la corrida en formato Prometheus.")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    asegurar_clave_natural(engine)
+    asegurar_columnas(engine)
+
+    backfill = None
+    if args.backfill:
+        desde, hasta = args.backfill
+        backfill = {"desde": desde, "hasta": hasta, "dias_ventana": args.ventana_dias}
+
+    if args.streaming:
+        ejecutar_pipeline(buscar=not args.sin_busqueda, backfill=backfill)
+    else:
+        ejecutar_por_etapas(buscar=not args.sin_busqueda, backfill=backfill)
+
+    imprimir_metricas()
+    router_revision.imprimir_resumen()
+    router_extraccion.imprimir_resumen()
+    metricas.imprimir_resumen()
+    metricas.guardar_reporte(prometheus_path=args.metricas_prometheus)
@@ -22,4 +22,8 @@ class Evento (Base):
     sede = Column(Text, nullable=False, default="Desconocida")
     sitio_web = Column(String(255), nullable=False, default="Desconocido")
     entidad_organizadora = Column(String(255), nullable=False, default="Desconocida")
-    requiere_revision = Column(String(255), nullable=False, default=True)
\ No newline at end of file
+    requiere_revision = Column(String(255), nullable=False, default=True)
+    # SHA-256 de sitio_web + nombre + fecha_inicio, usado para cargar eventos sin duplicarlos
+    clave_natural = Column(String(64), nullable=True, unique=True)
+    # URLs de otros medios que publicaron el mismo artículo, separadas por ' | '
+    fuentes_adicionales = Column(Text, nullable=True)
@@ -0,0 +1,220 @@
+import glob
+import os
+import threading
+import uuid
+from datetime import date, datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+DATA_DIR = "./data"
+
+# Artefactos intermedios del pipeline. Cada uno es un dataset Parquet en ./data/<nombre>/,
+# particionado por fecha de corrida (./data/<nombre>/fecha=AAAA-MM-DD/*.parquet)
+RESULTADOS_BUSQUEDA = "resultados_busqueda"
+LINKS_REVISADOS = "links_eventos_revisados"
+EVENTOS_PROCESADOS = "eventos_procesados"
+EVENTOS_CORREGIDOS_SEDES = "eventos_corregidos_sedes"
+EVENTOS_CON_ENTIDADES = "eventos_con_entidades"
+
+# CSV que escribían las versiones anteriores: se importan al dataset la primera vez que se usa
+CSV_ANTERIORES = {
+    RESULTADOS_BUSQUEDA: ["resultados_busqueda.csv"],
+    LINKS_REVISADOS: ["links_eventos_revisados.csv"],
+    EVENTOS_PROCESADOS: ["eventos_procesados_*.csv"],
+    EVENTOS_CORREGIDOS_SEDES: ["eventos_corregidos_sedes.csv"],
+    EVENTOS_CON_ENTIDADES: ["eventos_con_entidades.csv"],
+}
+
+PARTICION = "fecha"
+COMPRESION = "zstd"
+
+_PARTICIONADO = ds.partitioning(pa.schema([(PARTICION, pa.string())]), flavor="hive")
+_lock_migracion = threading.Lock()
+
+
+# ----- FUNCIONES AUXILIARES -----
+
+def ruta_dataset(nombre, data_dir=DATA_DIR):
+    return os.path.join(data_dir, nombre)
+
+
+def _archivos(nombre, data_dir=DATA_DIR, fecha=None):
+    particion = f"{PARTICION}={fecha}" if fecha else f"{PARTICION}=*"
+    return sorted(glob.glob(os.path.join(ruta_dataset(nombre, data_dir), particion, "*.parquet")))
+
+
+def _texto_o_nulo(valor):
+    if valor is None or (isinstance(valor, float) and valor != valor):
+        return None
+    return str(valor)
+
+
+def _a_tabla(df):
+    """
+    Convierte el DataFrame a una tabla de Arrow. Las columnas de texto se guardan siempre como
+    string (aunque en un lote traigan sólo números) para que el tipo no cambie entre archivos.
+    """
+    columnas = {}
+    for columna in df.columns:
+        serie = df[columna]
+        if pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie):
+            columnas[str(columna)] = pa.array(serie.map(_texto_o_nulo), type=pa.string())
+        else:
+            columnas[str(columna)] = pa.array(serie, from_pandas=True)
+    return pa.table(columnas)
+
+
+def _unificar_esquemas(esquemas):
+    """
+    Esquema común de los archivos del dataset: las columnas que faltan en algunos quedan nulas,
+    las numéricas de distinto tipo pasan a float y cualquier otro conflicto se lee como texto.
+    """
+    tipos = {}
+    for esquema in esquemas:
+        for campo in esquema:
+            if campo.name == PARTICION:
+                continue
+            tipos.setdefault(campo.name, set()).add(campo.type)
+
+    campos = []
+    for nombre, tipos_campo in tipos.items():
+        tipos_campo = {t for t in tipos_campo if t != pa.null()} or {pa.null()}
+        if len(tipos_campo) == 1:
+            tipo = tipos_campo.pop()
+        elif all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in tipos_campo):
+            tipo = pa.float64()
+        else:
+            tipo = pa.string()
+        campos.append(pa.field(nombre, tipo))
+    campos.append(pa.field(PARTICION, pa.string()))
+    return pa.schema(campos)
+
+
+def _escribir(tabla, directorio):
+    """Escribe la tabla en un archivo nuevo de ``directorio``, de forma atómica."""
+    os.makedirs(directorio, exist_ok=True)
+    nombre = f"{datetime.now():%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+    # El prefijo '.' hace que el archivo a medio escribir quede fuera de las lecturas
+    temporal = os.path.join(directorio, f".{nombre}.tmp")
+    pq.write_table(tabla, temporal, compression=COMPRESION)
+    destino = os.path.join(directorio, nombre)
+    os.replace(temporal, destino)
+    return destino
+
+
+def _migrar_csv(nombre, data_dir=DATA_DIR):
+    """
+    Si el dataset todavía no existe, importa los CSV que escribían las versiones anteriores
+    (cada uno en la partición de la fecha en que se modificó por última vez). Los CSV no se tocan.
+    """
+    with _lock_migracion:
+        if os.path.isdir(ruta_dataset(nombre, data_dir)):
+            return
+        for patron in CSV_ANTERIORES.get(nombre, []):
+            for path in sorted(glob.glob(os.path.join(data_dir, patron))):
+                try:
+                    df = pd.read_csv(path, sep=";", low_memory=False)
+                except (pd.errors.EmptyDataError, pd.errors.ParserError) as e:
+                    print(f"No se pudo importar {path}: {e}")
+                    continue
+                if df.empty:
+                    continue
+                fecha = date.fromtimestamp(os.path.getmtime(path)).isoformat()
+                _escribir(_a_tabla(df), os.path.join(ruta_dataset(nombre, data_dir), f"{PARTICION}={fecha}"))
+                print(f"Se importaron {len(df)} filas de {path} al dataset '{nombre}'.")
+        os.makedirs(ruta_dataset(nombre, data_dir), exist_ok=True)
+
+
+# ----- LECTURA Y ESCRITURA -----
+
+def agregar(nombre, df, fecha=None, data_dir=DATA_DIR):
+    """
+    Agrega las filas de ``df`` al dataset ``nombre`` como un archivo Parquet nuevo en la partición
+    de ``fecha`` (por defecto, hoy). No reescribe nada de lo ya guardado. Devuelve la ruta del
+    archivo o None si no había filas.
+    """
+    if df is None or df.empty:
+        return None
+    _migrar_csv(nombre, data_dir)
+    fecha = fecha or date.today()
+    if isinstance(fecha, date):
+        fecha = fecha.isoformat()
+    directorio = os.path.join(ruta_dataset(nombre, data_dir), f"{PARTICION}={fecha}")
+    return _escribir(_a_tabla(df.reset_index(drop=True)), directorio)
+
+
+def dataset(nombre, data_dir=DATA_DIR):
+    """Dataset de Arrow con el esquema unificado de todos los archivos, o None si está vacío."""
+    _migrar_csv(nombre, data_dir)
+    archivos = _archivos(nombre, data_dir)
+    if not archivos:
+        return None
+    esquema = _unificar_esquemas(pq.read_schema(archivo) for archivo in archivos)
+    return ds.dataset(archivos, schema=esquema, format="parquet",
+                      partitioning=_PARTICIONADO, partition_base_dir=ruta_dataset(nombre, data_dir))
+
+
+def leer(nombre, columnas=None, filtros=None, desde=None, hasta=None, data_dir=DATA_DIR):
+    """
+    Lee el dataset ``nombre`` como DataFrame. Sólo se leen del disco las ``columnas`` pedidas, y
+    ``filtros`` (en el formato de ``pandas.read_parquet``, p. ej. ``[("link", "not in", vistos)]``)
+    junto con ``desde``/``hasta`` (fechas de corrida) se aplican al escanear, salteando las
+    particiones y los grupos de filas que no pueden cumplirlos.
+    """
+    datos = dataset(nombre, data_dir)
+    if datos is None:
+        return pd.DataFrame(columns=columnas or [])
+
+    condiciones = list(filtros or [])
+    if desde:
+        condiciones.append((PARTICION, ">=", desde.isoformat() if isinstance(desde, date) else desde))
+    if hasta:
+        condiciones.append((PARTICION, "<=", hasta.isoformat() if isinstance(hasta, date) else hasta))
+    filtro = pq.filters_to_expression(condiciones) if condiciones else None
+
+    existentes = None
+    if columnas is not None:
+        existentes = [c for c in columnas if c in datos.schema.names]
+    df = datos.to_table(columns=existentes, filter=filtro).to_pandas()
+    return df.reindex(columns=columnas) if columnas is not None else df
+
+
+def compactar(nombre, data_dir=DATA_DIR):
+    """
+    Une en un solo archivo los de cada partición que tenga varios (las etapas en streaming y la
+    búsqueda agregan de a pocas filas). Se llama al final de cada corrida.
+    """
+    for particion in sorted(glob.glob(os.path.join(ruta_dataset(nombre, data_dir), f"{PARTICION}=*"))):
+        archivos = sorted(glob.glob(os.path.join(particion, "*.parquet")))
+        if len(archivos) < 2:
+            continue
+        esquema = _unificar_esquemas(pq.read_schema(archivo) for archivo in archivos)
+        esquema = pa.schema([campo for campo in esquema if campo.name != PARTICION])
+        tabla = ds.dataset(archivos, schema=esquema, format="parquet").to_table()
+        _escribir(tabla, particion)
+        for archivo in archivos:
+            os.remove(archivo)
+
+
+def exportar_csv(nombre, path, columnas=None, desde=None, hasta=None, data_dir=DATA_DIR):
+    """Exporta el dataset (o las corridas entre ``desde`` y ``hasta``) a un CSV para revisión humana."""
+    df = leer(nombre, columnas=columnas, desde=desde, hasta=hasta, data_dir=data_dir)
+    df.to_csv(path, sep=";", index=False, encoding="utf-8")
+    print(f"Se exportaron {len(df)} filas de '{nombre}' a {path}")
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Exporta un artefacto intermedio del pipeline a CSV.")
+    parser.add_argument("nombre", choices=sorted(CSV_ANTERIORES))
+    parser.add_argument("salida", help="Ruta del CSV a generar.")
+    parser.add_argument("--desde", type=date.fromisoformat, help="Primera fecha de corrida (AAAA-MM-DD).")
+    parser.add_argument("--hasta", type=date.fromisoformat, help="Última fecha de corrida (AAAA-MM-DD).")
+    args = parser.parse_args()
+    exportar_csv(args.nombre, args.salida, desde=args.desde, hasta=args.hasta)
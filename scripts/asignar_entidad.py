@@ -1,11 +1,24 @@
-from fuzzywuzzy import process
-from bs4 import BeautifulSoup
-import requests
-from groq import RateLimitError
-
-
-def asignar_entidades_organizadoras(df_eventos, df_organizaciones, llm_client):
-    entidades = df_organizaciones["Entidad organizadores"].dropna().unique().tolist()
+import pandas as pd
+from scripts.router_llm import SinModelosDisponibles
+from scripts.cache_paginas import extraer_contenido_web
+from scripts.indice_organizadores import MatcherOrganizadores
+from scripts import almacen
+
+VERSION_PROMPT_ORGANIZADOR = "organizador-v1"
+UMBRAL_MATCH = 90
+
+
+def asignar_entidades_organizadoras(df_eventos, df_organizaciones, llm_client, guardar=True):
+    """
+    Obtiene la entidad organizadora cruda de cada evento (de la extracción combinada o, si
+    falta, consultando al LLM) y después las empareja todas juntas contra el catálogo con
+    ``MatcherOrganizadores``. ``df_organizaciones`` puede ser el DataFrame del catálogo o un
+    matcher ya construido. ``llm_client`` es el ``RouterLLM`` con la cadena de modelos.
+    """
+    if isinstance(df_organizaciones, MatcherOrganizadores):
+        matcher = df_organizaciones
+    else:
+        matcher = MatcherOrganizadores.desde_df(df_organizaciones)
 
     prompt = (
         "Esta página trata sobre un evento. Extraé el nombre de la entidad organizadora principal tal como aparece en el texto. "
@@ -13,53 +26,30 @@ def asignar_entidades_organizadoras(df_eventos, df_organizaciones, llm_client):
         "Este es el contenido de la página:\n\n"
     )
 
+    # 1) Entidad cruda por evento
+    entidades_raw = {}
     for index, row in df_eventos.iterrows():
         try:
             url = row.get("sitioWeb", "")
             if not url or not isinstance(url, str):
                 raise ValueError("URL inválida")
 
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            for script_or_style in soup(["script", "style"]):
-                script_or_style.decompose()
-
-            text_content = soup.get_text()
-            lines = (line.strip() for line_cnt, line in enumerate(
-                text_content.splitlines()) if line_cnt < 1000)
-            chunks = (phrase.strip() for phrase in ' '.join(lines).split("  "))
-            cleaned_text = '\n'.join(chunk for chunk in chunks if chunk)
-
-            max_chars = 15000
-            if len(cleaned_text) > max_chars:
-                cleaned_text = cleaned_text[:max_chars] + "\n... [Contenido truncado]"
-
-            llm_response = llm_client.chat.completions.create(
-                model="gemma2-9b-it",
-                messages=[{"role": "user", "content": prompt + cleaned_text}]
-            )
-
-            entidad_raw = llm_response.choices[0].message.content.strip()
-            mejor_match, score = process.extractOne(entidad_raw, entidades)
-
-            if score >= 90:
-                entidad_final = mejor_match
-                revision = "No"
-            else:
-                entidad_final = "NO_MATCH"
-                revision = "Sí"
-
-            df_eventos.at[index, "entidadOriginalLLM"] = entidad_raw
-            df_eventos.at[index, "entidadOrganizadora"] = entidad_final
-            df_eventos.at[index, "matchScore"] = score
-            df_eventos.at[index, "requiereRevision"] = revision
-
-            print(f"✔ [{index}] '{entidad_raw}' → '{entidad_final}' (score: {score})")
-
-        except RateLimitError:
-            print(f"Límite de API alcanzado en el índice {index}. Deteniendo el procesamiento.")
+            # Si la extracción combinada ya trajo el organizador, no se vuelve a consultar al LLM
+            entidad_raw = row.get("entidadOriginalLLM")
+            if not isinstance(entidad_raw, str) or not entidad_raw or entidad_raw == "ERROR":
+                cleaned_text = extraer_contenido_web(url, llm_client.modelo_principal, prompt)
+                if cleaned_text is None:
+                    raise ValueError("No se pudo obtener el contenido de la página")
+
+                entidad_raw = llm_client.completar(
+                    messages=[{"role": "user", "content": prompt + cleaned_text}],
+                    version_prompt=VERSION_PROMPT_ORGANIZADOR,
+                    contenido=cleaned_text
+                ).strip()
+            entidades_raw[index] = entidad_raw
+
+        except SinModelosDisponibles:
+            print(f"Ningún modelo disponible en el índice {index}. Deteniendo el procesamiento.")
             break
 
         except Exception as e:
@@ -68,8 +58,20 @@ def asignar_entidades_organizadoras(df_eventos, df_organizaciones, llm_client):
             df_eventos.at[index, "entidadOrganizadora"] = "ERROR"
             df_eventos.at[index, "matchScore"] = 0
             df_eventos.at[index, "requiereRevision"] = "Sí"
-    
-    df_eventos.to_csv("./data/eventos_con_entidades.csv", sep=";", index=False)
 
-    return df_eventos
+    # 2) Matching de todas las entidades en un solo lote
+    if entidades_raw:
+        crudas = pd.Series(entidades_raw)
+        matches = matcher.emparejar_columna(crudas, umbral=UMBRAL_MATCH)
+        for index, entidad_raw in crudas.items():
+            match = matches.loc[index]
+            df_eventos.at[index, "entidadOriginalLLM"] = entidad_raw
+            df_eventos.at[index, "entidadOrganizadora"] = match["entidad"]
+            df_eventos.at[index, "matchScore"] = match["score"]
+            df_eventos.at[index, "requiereRevision"] = match["requiereRevision"]
+            print(f"✔ [{index}] '{entidad_raw}' → '{match['entidad']}' (score: {match['score']})")
 
+    if guardar:
+        almacen.agregar(almacen.EVENTOS_CON_ENTIDADES, df_eventos)
+
+    return df_eventos
@@ -0,0 +1,194 @@
+import json
+import math
+import os
+import threading
+from collections import deque
+from datetime import timedelta
+from scripts.search import (
+    API_CREDENTIALS, MAX_CONCURRENCIA, TIPOS_EVENTO, ejecutar_consultas, leer_sedes)
+from scripts.planificador_busqueda import armar_consultas
+from scripts.cuota_busqueda import CuotaCredenciales, CUOTA_DIARIA
+from scripts.metricas import metricas
+from scripts import almacen
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+DATA_DIR = "./data"
+REGISTRO_PATH = os.path.join(DATA_DIR, "backfill_ventanas.json")
+
+# Días que cubre cada ventana de fechas del backfill
+VENTANA_DIAS = 30
+# Resultados por página de Custom Search y máximo que devuelve la API por query (start + num <= 100)
+RESULTADOS_POR_PAGINA = 10
+MAX_RESULTADOS_API = 100
+
+PENDIENTE = "pendiente"
+COMPLETA = "completa"
+
+
+def dividir_ventanas(desde, hasta, dias=VENTANA_DIAS):
+    """Divide el rango ``[desde, hasta]`` (fechas incluidas) en ventanas consecutivas de ``dias`` días."""
+    ventanas = []
+    inicio = desde
+    while inicio <= hasta:
+        fin = min(inicio + timedelta(days=dias - 1), hasta)
+        ventanas.append((inicio, fin))
+        inicio = fin + timedelta(days=1)
+    return ventanas
+
+
+def restriccion_fechas(inicio, fin):
+    """Parámetro ``sort`` de Custom Search que restringe los resultados a la ventana."""
+    return f"date:r:{inicio:%Y%m%d}:{fin:%Y%m%d}"
+
+
+class RegistroBackfill:
+    """
+    Registro persistente de cada query en cada ventana del backfill, en ``backfill_ventanas.json``:
+    la página desde la que sigue (``start``), cuántas páginas y resultados trajo y si ya está
+    completa. Se guarda después de cada página, así que una corrida cortada (o que se quedó sin
+    cuota) retoma al día siguiente exactamente donde quedó.
+    """
+
+    def __init__(self, path=REGISTRO_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.ventanas = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.ventanas = json.load(f)
+
+    @staticmethod
+    def clave(ventana, query):
+        inicio, fin = ventana
+        return f"{inicio.isoformat()}:{fin.isoformat()}|{query}"
+
+    def _guardar(self):
+        directorio = os.path.dirname(self.path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        temporal = f"{self.path}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(self.ventanas, f, ensure_ascii=False)
+        os.replace(temporal, self.path)
+
+    def obtener(self, ventana, query):
+        return self.ventanas.get(self.clave(ventana, query))
+
+    def registrar(self, ventana, query, resultados, nuevos, proximo_start):
+        """Guarda una página ejecutada. ``proximo_start`` es None si la query terminó en la ventana."""
+        with self._lock:
+            registro = self.ventanas.setdefault(self.clave(ventana, query), {
+                "estado": PENDIENTE, "start": 1, "paginas": 0, "resultados": 0, "nuevos": 0,
+            })
+            registro["paginas"] += 1
+            registro["resultados"] += resultados
+            registro["nuevos"] += nuevos
+            if proximo_start is None:
+                registro["estado"] = COMPLETA
+            else:
+                registro["start"] = proximo_start
+            self._guardar()
+
+    def paginas_por_query(self):
+        """Promedio de páginas de las queries ya completas (1 si todavía no hay ninguna)."""
+        completas = [r["paginas"] for r in self.ventanas.values() if r["estado"] == COMPLETA]
+        return sum(completas) / len(completas) if completas else 1.0
+
+
+def proximo_start(respuesta, start, resultados):
+    """``start`` de la página siguiente, o None si la query no tiene más resultados que pedir."""
+    siguiente = start + RESULTADOS_POR_PAGINA
+    if resultados < RESULTADOS_POR_PAGINA or siguiente + RESULTADOS_POR_PAGINA - 1 > MAX_RESULTADOS_API:
+        return None
+    if not respuesta.get("queries", {}).get("nextPage"):
+        return None
+    return siguiente
+
+
+def estimar_dias(queries_pendientes, paginas_por_query, cuota_diaria):
+    """Días de cuota que faltan para terminar el backfill al ritmo de páginas observado."""
+    if not queries_pendientes:
+        return 0
+    return math.ceil(queries_pendientes * paginas_por_query / max(cuota_diaria, 1))
+
+
+def backfill_eventos(desde, hasta, al_encontrar=None, dias_ventana=VENTANA_DIAS,
+                     max_concurrencia=MAX_CONCURRENCIA, registro=None, cancelar=None):
+    """
+    Búsqueda histórica entre ``desde`` y ``hasta``: el rango se divide en ventanas de
+    ``dias_ventana`` días y cada query del catálogo (tipo de evento × grupo de sedes, con el año de
+    la ventana) se ejecuta restringida a cada ventana con ``sort=date:r:AAAAMMDD:AAAAMMDD``,
+    paginando con ``start`` mientras la API siga devolviendo páginas completas.
+
+    Las ventanas se recorren de la más antigua a la más reciente y se reparten entre las
+    credenciales con la misma contabilidad de cuota que la búsqueda diaria; cuando se agota, lo
+    que falta queda en el registro de ventanas para la corrida del día siguiente.
+
+    Los resultados pasan por el mismo guardado con descarte de URLs ya vistas que la búsqueda
+    diaria y, si se indica ``al_encontrar``, se entregan al pipeline en streaming a medida que
+    llegan, así la revisión y la extracción avanzan mientras el backfill sigue buscando.
+    ``cancelar`` corta el backfill antes de la próxima página; lo pendiente queda en el registro.
+    """
+    sedes = leer_sedes()
+    if sedes is None:
+        return
+    registro = registro or RegistroBackfill()
+    ventanas = dividir_ventanas(desde, hasta, dias_ventana)
+    consultas_por_anio = {}
+
+    plan = deque()
+    completas = 0
+    for ventana in ventanas:
+        anio = str(ventana[0].year)
+        if anio not in consultas_por_anio:
+            consultas_por_anio[anio] = armar_consultas(TIPOS_EVENTO, sedes, anio)
+        for consulta in consultas_por_anio[anio]:
+            previo = registro.obtener(ventana, consulta["query"])
+            if previo and previo["estado"] == COMPLETA:
+                completas += 1
+                continue
+            plan.append(_consulta_ventana(consulta, ventana, previo["start"] if previo else 1))
+
+    cuota = CuotaCredenciales(API_CREDENTIALS)
+    cuota_diaria = CUOTA_DIARIA * len(API_CREDENTIALS)
+    paginas = registro.paginas_por_query()
+    print(f"Backfill {desde.isoformat()} → {hasta.isoformat()}: {len(ventanas)} ventanas de {dias_ventana} días, "
+          f"{len(plan) + completas} queries ({completas} ya completas).")
+    print(f"Quedan {len(plan)} queries a ~{paginas:.1f} páginas cada una: "
+          f"~{estimar_dias(len(plan), paginas, cuota_diaria)} días de cuota ({cuota_diaria} queries por día).")
+    print(f"Cuota disponible hoy: {cuota.restante()}")
+
+    def registrar(consulta, respuesta, resultados, nuevos):
+        start = consulta["parametros"]["start"]
+        siguiente = proximo_start(respuesta, start, resultados)
+        registro.registrar(consulta["ventana"], consulta["query"], resultados, nuevos, siguiente)
+        metricas.incrementar("backfill_paginas")
+        if siguiente is not None:
+            return [_consulta_ventana(consulta, consulta["ventana"], siguiente)]
+        return None
+
+    ejecutar_consultas(plan, cuota, registrar, al_encontrar=al_encontrar,
+                       max_concurrencia=max_concurrencia, cancelar=cancelar)
+    almacen.compactar(almacen.RESULTADOS_BUSQUEDA)
+
+    print("\n--- Backfill finalizado por hoy ---")
+    if plan:
+        ventanas_pendientes = len({consulta["ventana"] for consulta in plan})
+        paginas = registro.paginas_por_query()
+        print(f"Quedaron {len(plan)} queries en {ventanas_pendientes} ventanas para la próxima corrida "
+              f"(~{estimar_dias(len(plan), paginas, cuota_diaria)} días de cuota).")
+    else:
+        print("Todas las ventanas del rango están completas.")
+
+
+def _consulta_ventana(consulta, ventana, start):
+    inicio, fin = ventana
+    return {
+        "tipo": consulta["tipo"],
+        "sedes": consulta["sedes"],
+        "query": consulta["query"],
+        "ventana": ventana,
+        "parametros": {"sort": restriccion_fechas(inicio, fin), "start": start},
+        "etiqueta": f" ({inicio.isoformat()} a {fin.isoformat()}, desde el resultado {start})",
+    }
@@ -0,0 +1,647 @@
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+import requests
+from scripts import almacen
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+DATA_DIR = "./data"
+BENCHMARK_DIR = os.path.join(DATA_DIR, "benchmark")
+CORPUS_DIR = os.path.join(BENCHMARK_DIR, "corpus")
+CORPUS_INDICE_PATH = os.path.join(CORPUS_DIR, "indice.json")
+CORRIDAS_DIR = os.path.join(BENCHMARK_DIR, "corridas")
+# Archivos del repositorio que cada escenario necesita en su propio ./data
+ARCHIVOS_BASE = ["sedes.csv", "organizadores_normalizado.csv", "prefiltro_pesos.json"]
+# Fuentes de URLs reales para grabar el corpus
+FUENTES_CORPUS = [almacen.RESULTADOS_BUSQUEDA, almacen.LINKS_REVISADOS]
+
+TAMANIOS = [100, 1000, 10000]
+# Puertos del servidor de páginas: el crawler trata cada puerto como un dominio distinto
+HOSTS_SIMULADOS = 8
+# Demora de cortesía entre pedidos al mismo dominio simulado (la real es DEMORA_POR_HOST)
+DEMORA_HOST_SIMULADO = 0.0
+LATENCIA_LLM = 0.05
+JITTER_LLM = 0.5
+TASA_429 = 0.0
+RETRY_AFTER = 1
+# Fracción de páginas sintéticas que repiten el artículo de otra (gacetillas replicadas)
+TASA_DUPLICADOS = 0.05
+# Variación tolerada respecto de una corrida de referencia antes de marcar una regresión
+TOLERANCIA_REGRESION = 0.2
+TIMEOUT_GRABACION = 10
+SEMILLA = 1
+
+# Etapas de main.ejecutar_por_etapas que se comparan entre corridas (spans "etapa_total")
+ETAPAS = ["revision", "extraccion", "sedes", "organizadores", "carga"]
+
+MESES = [
+    "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto", "septiembre",
+    "octubre", "noviembre", "diciembre"
+]
+OTRAS_LOCACIONES = ["Córdoba", "Rosario, Santa Fe", "San Juan", "Salta", "Neuquén", "Mar del Plata, Buenos Aires"]
+TIPOS_EVENTO = ["Congreso", "Jornada", "Feria", "Seminario", "Encuentro", "Foro", "Exposición"]
+TEMAS = ["Medicina", "Educación", "Tecnología", "Turismo y hotelería", "Economía", "Derecho", "Gastronomía"]
+VOCABULARIO = (
+    "provincia gobierno ciudad departamento municipio vecinos actividad programa proyecto sector "
+    "empresa productores ministerio universidad estudiantes docentes profesionales especialistas "
+    "desarrollo turismo cultura economía salud educación ambiente agua energía vino vendimia "
+    "capacitación inversión crecimiento comunidad región nacional internacional público privado "
+    "año semana jornada propuesta participación convocatoria asistentes expositores disertantes "
+    "organización instituciones acuerdo trabajo equipo resultados análisis informe datos "
+    "presentación iniciativa apertura cierre espacio encuentro experiencia oportunidad desafío"
+).split()
+BOILERPLATE = (
+    '<header class="masthead"><nav class="menu"><a href="/">Inicio</a> <a href="/politica">Política</a> '
+    '<a href="/economia">Economía</a> <a href="/sociedad">Sociedad</a> <a href="/deportes">Deportes</a>'
+    '</nav></header>'
+)
+PIE = (
+    '<footer class="footer"><p>Todos los derechos reservados. Suscribite al newsletter.</p>'
+    '<div class="social"><a href="#">Facebook</a> <a href="#">Instagram</a></div></footer>'
+)
+
+
+# ----- CORPUS DE PÁGINAS -----
+
+def _slug(texto):
+    return re.sub(r"[^a-z0-9]+", "-", texto.lower()).strip("-")[:80] or "nota"
+
+
+def _leer_columna(path, columna):
+    try:
+        return pd.read_csv(path, sep=";", low_memory=False)[columna].dropna().astype(str).tolist()
+    except (FileNotFoundError, KeyError):
+        return []
+
+
+def grabar_corpus(limite=None, directorio=CORPUS_DIR):
+    """
+    Descarga una vez las páginas de las URLs ya conocidas (resultados de búsqueda y links
+    revisados) y las guarda en ``directorio`` junto con un índice, para
+    que el benchmark las sirva después sin salir a internet.
+    """
+    paginas = {}
+    for nombre in FUENTES_CORPUS:
+        df = almacen.leer(nombre)
+        columna_titulo = "title" if "title" in df.columns else "titulo"
+        for link, titulo in zip(df.get("link", []), df.get(columna_titulo, [])):
+            if link:
+                paginas.setdefault(link, titulo)
+    urls = list(paginas)[:limite] if limite else list(paginas)
+
+    os.makedirs(directorio, exist_ok=True)
+    indice = []
+    for numero, url in enumerate(urls):
+        try:
+            response = requests.get(url, timeout=TIMEOUT_GRABACION)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"No se pudo grabar {url}: {e}")
+            continue
+        archivo = f"{numero:05d}.html"
+        with open(os.path.join(directorio, archivo), "w", encoding="utf-8") as f:
+            f.write(response.text)
+        indice.append({"url": url, "titulo": paginas[url], "archivo": archivo})
+
+    with open(os.path.join(directorio, "indice.json"), "w", encoding="utf-8") as f:
+        json.dump(indice, f, ensure_ascii=False, indent=2)
+    print(f"Corpus grabado: {len(indice)} páginas en '{directorio}'")
+    return indice
+
+
+class Corpus:
+    """
+    Páginas que sirve el benchmark. Las primeras son las grabadas con ``grabar_corpus`` (si las
+    hay) y el resto se genera de forma determinística por número de página: eventos en Mendoza
+    con sede y organizador del catálogo (algunos con JSON-LD), eventos de otras provincias,
+    notas sin evento y portadas de sección, más una fracción de artículos replicados.
+    """
+
+    def __init__(self, directorio=CORPUS_DIR, semilla=SEMILLA, tasa_duplicados=TASA_DUPLICADOS):
+        self.directorio = directorio
+        self.semilla = semilla
+        self.tasa_duplicados = tasa_duplicados
+        self.grabadas = []
+        indice_path = os.path.join(directorio, "indice.json")
+        if os.path.exists(indice_path):
+            with open(indice_path, "r", encoding="utf-8") as f:
+                self.grabadas = json.load(f)
+        self.sedes = _leer_columna(os.path.join(DATA_DIR, "sedes.csv"), "Nombre") or ["Centro de Congresos"]
+        self.organizadores = (
+            _leer_columna(os.path.join(DATA_DIR, "organizadores_normalizado.csv"), "Entidad organizadores")
+            or ["Gobierno de Mendoza"]
+        )
+        self.titulos = (
+            almacen.leer(almacen.RESULTADOS_BUSQUEDA, columnas=["title"])["title"].dropna().astype(str).tolist())
+
+    def _tipo(self, numero):
+        valor = random.Random(self.semilla * 1_000_003 + numero).random()
+        if valor < 0.6:
+            return "evento"
+        if valor < 0.75:
+            return "otra-provincia"
+        if valor < 0.9:
+            return "temas"
+        return "nota"
+
+    def ruta(self, numero):
+        """Ruta de la página ``numero``; el número va en la ruta para resolverla al servirla."""
+        return f"/{self._tipo(numero)}/{numero}/{_slug(self.titulo(numero))}"
+
+    def titulo(self, numero):
+        if numero < len(self.grabadas):
+            return self.grabadas[numero]["titulo"]
+        rng = random.Random(self.semilla * 7_000_003 + numero)
+        tipo = self._tipo(numero)
+        if tipo == "temas":
+            return f"Sección {rng.choice(VOCABULARIO).capitalize()}: últimas noticias"
+        if tipo == "nota" and self.titulos:
+            return rng.choice(self.titulos)
+        return f"{rng.choice(TIPOS_EVENTO)} de {rng.choice(TEMAS)} {rng.choice(VOCABULARIO)} {numero}"
+
+    def html(self, numero):
+        if numero < len(self.grabadas):
+            with open(os.path.join(self.directorio, self.grabadas[numero]["archivo"]), "r", encoding="utf-8") as f:
+                return f.read()
+        # Un artículo replicado repite el cuerpo de la página anterior, que cae en otro dominio
+        rng = random.Random(self.semilla * 3_000_017 + numero)
+        if numero > len(self.grabadas) and rng.random() < self.tasa_duplicados:
+            return self._sintetica(numero - 1)
+        return self._sintetica(numero)
+
+    def _parrafos(self, rng, cantidad):
+        return "".join(
+            "<p>" + " ".join(rng.choice(VOCABULARIO) for _ in range(rng.randint(40, 90))).capitalize() + ".</p>"
+            for _ in range(cantidad)
+        )
+
+    def _sintetica(self, numero):
+        rng = random.Random(self.semilla * 7_000_003 + numero)
+        tipo = self._tipo(numero)
+        titulo = self.titulo(numero)
+
+        if tipo == "temas":
+            enlaces = "".join(
+                f'<li><a href="/nota/{rng.randint(1, 10**6)}/">{" ".join(rng.choice(VOCABULARIO) for _ in range(8))}</a></li>'
+                for _ in range(40)
+            )
+            cuerpo = f"<main><h1>{titulo}</h1><ul>{enlaces}</ul></main>"
+            return f"<html><head><title>{titulo}</title></head><body>{BOILERPLATE}{cuerpo}{PIE}</body></html>"
+
+        mes = rng.randrange(12)
+        dia_inicio = rng.randint(1, 25)
+        dia_fin = dia_inicio + rng.randint(0, 3)
+        organizador = rng.choice(self.organizadores)
+        if tipo == "evento":
+            lugar, sede = "Mendoza", rng.choice(self.sedes)
+        else:
+            lugar = rng.choice(OTRAS_LOCACIONES)
+            sede = f"Centro de Convenciones de {lugar.split(',')[0]}"
+
+        detalle = ""
+        if tipo in ("evento", "otra-provincia"):
+            detalle = (
+                f"<p>Se realizará del {dia_inicio} al {dia_fin} de {MESES[mes]} de 2025 en {sede}, "
+                f"{lugar}. Inscripción abierta para asistentes y expositores.</p>"
+                f"<p>Sede: {sede}</p><p>Organiza: {organizador}</p>"
+            )
+        json_ld = ""
+        if tipo == "evento" and rng.random() < 0.25:
+            evento = {
+                "@context": "https://schema.org", "@type": "Event", "name": titulo,
+                "startDate": f"2025-{mes + 1:02d}-{dia_inicio:02d}", "endDate": f"2025-{mes + 1:02d}-{dia_fin:02d}",
+                "location": {"@type": "Place", "name": sede, "address": f"{lugar}, Argentina"},
+                "organizer": {"@type": "Organization", "name": organizador},
+            }
+            json_ld = f'<script type="application/ld+json">{json.dumps(evento, ensure_ascii=False)}</script>'
+
+        cuerpo = (
+            f"<article><h1>{titulo}</h1><p class=\"fecha\">{rng.randint(1, 28)}/{mes + 1:02d}/2025</p>"
+            f"{self._parrafos(rng, 2)}{detalle}{self._parrafos(rng, rng.randint(4, 12))}</article>"
+        )
+        return (
+            f"<html><head><title>{titulo}</title>{json_ld}</head>"
+            f"<body>{BOILERPLATE}{cuerpo}{PIE}</body></html>"
+        )
+
+
+# ----- SERVIDOR DE PÁGINAS -----
+
+class _ManejadorPaginas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        coincidencia = re.match(r"^/[\w-]+/(\d+)/", self.path)
+        if not coincidencia:
+            self.send_error(404)
+            return
+        cuerpo = self.server.corpus.html(int(coincidencia.group(1))).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class ServidorPaginas:
+    """Sirve el ``Corpus`` en ``hosts`` puertos locales, que el crawler ve como dominios distintos."""
+
+    def __init__(self, corpus, hosts=HOSTS_SIMULADOS):
+        self.corpus = corpus
+        self.servidores = []
+        for _ in range(hosts):
+            servidor = ThreadingHTTPServer(("127.0.0.1", 0), _ManejadorPaginas)
+            servidor.daemon_threads = True
+            servidor.corpus = corpus
+            self.servidores.append(servidor)
+
+    @property
+    def hosts(self):
+        return [f"127.0.0.1:{s.server_address[1]}" for s in self.servidores]
+
+    def url(self, numero):
+        return f"http://{self.hosts[numero % len(self.hosts)]}{self.corpus.ruta(numero)}"
+
+    def iniciar(self):
+        for servidor in self.servidores:
+            threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        return self
+
+    def detener(self):
+        for servidor in self.servidores:
+            servidor.shutdown()
+            servidor.server_close()
+
+
+# ----- SERVIDOR LLM SIMULADO -----
+
+def _es_evento_mendoza(texto):
+    texto = texto.lower()
+    return (
+        "mendoza" in texto
+        and re.search(rf"\bdel? \d{{1,2}} al \d{{1,2}} de ({'|'.join(MESES)})", texto) is not None
+        and not any(lugar.lower() in texto for lugar in OTRAS_LOCACIONES)
+    )
+
+
+def _evento_simulado(texto):
+    titulo = re.search(r"Título: (.+)", texto)
+    fechas = re.search(rf"del? (\d{{1,2}}) al (\d{{1,2}}) de ({'|'.join(MESES)})", texto, re.IGNORECASE)
+    sede = re.search(r"Sede: (.+)", texto)
+    organizador = re.search(r"Organiza: (.+)", texto)
+    tipo = random.choice(TIPOS_EVENTO)
+    evento = {
+        "nombreEvento": titulo.group(1).strip() if titulo else "Evento simulado",
+        "tipoEvento": tipo,
+        "detalleTipoRotacion": "Provincial",
+        "tema": random.choice(TEMAS),
+        "fechaEdicion": None,
+        "fechaInicio": None,
+        "fechaFinalizacion": None,
+        "añoRaw": "2025",
+        "mesLiteralRaw": None,
+        "diaInicioRaw": None,
+        "diaFinalRaw": None,
+        "Localidad": sede.group(1).strip() if sede else None,
+        "fechaRaw": fechas.group(0) if fechas else None,
+        "sedeRaw": sede.group(1).strip() if sede else None,
+        "agrupacion": "FERIAS Y EXPOSICIONES" if tipo in ("Feria", "Exposición") else "CONGRESOS Y CONVENCIONES",
+        "sedePrincipal": sede.group(1).strip() if sede else None,
+        "organizador": organizador.group(1).strip() if organizador else None,
+    }
+    if fechas:
+        mes = MESES.index(fechas.group(3).lower()) + 1
+        evento.update({
+            "fechaInicio": f"2025-{mes:02d}-{int(fechas.group(1)):02d}",
+            "fechaFinalizacion": f"2025-{mes:02d}-{int(fechas.group(2)):02d}",
+            "mesLiteralRaw": fechas.group(3),
+            "diaInicioRaw": fechas.group(1),
+            "diaFinalRaw": fechas.group(2),
+        })
+    return evento
+
+
+def respuesta_simulada(messages):
+    """
+    Respuesta plausible para cada prompt del pipeline, reconocido por su texto: revisión simple y
+    por lotes, extracción (combinada o de campos sueltos), sede y organizador.
+    """
+    sistema = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    usuario = messages[-1]["content"] if messages else ""
+
+    if "varias páginas numeradas" in sistema:
+        bloques = re.split(r"### Página (\d+)\n", usuario)[1:]
+        return json.dumps([
+            {"item": int(numero), "valido": _es_evento_mendoza(bloque)}
+            for numero, bloque in zip(bloques[::2], bloques[1::2])
+        ])
+    if "revisa publicaciones" in sistema:
+        datos = re.search(r"título: (.*) del evento y el link: (\S+) en un objeto", sistema)
+        if datos and _es_evento_mendoza(usuario):
+            return json.dumps({"titulo": datos.group(1), "link": datos.group(2)}, ensure_ascii=False)
+        return "No es válido"
+    if "Ya se conocen estos datos" in usuario:
+        evento = _evento_simulado(usuario)
+        return json.dumps({campo: evento.get(campo) for campo in re.findall(r"^- (\w+):", usuario, re.M)},
+                          ensure_ascii=False)
+    if "Extrae y devuelve la siguiente información" in usuario:
+        return json.dumps(_evento_simulado(usuario), ensure_ascii=False)
+    if "entidad organizadora principal" in usuario:
+        return _evento_simulado(usuario)["organizador"] or "Gobierno de Mendoza"
+    if "nombre de la sede" in usuario:
+        return _evento_simulado(usuario)["sedePrincipal"] or "Desconocida"
+    return "No es válido"
+
+
+class _ManejadorLLM(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        pedido = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        servidor = self.server
+
+        time.sleep(max(servidor.latencia * (1 + random.uniform(-servidor.jitter, servidor.jitter)), 0))
+        if random.random() < servidor.tasa_429:
+            self._responder(429, {"error": {"message": "Rate limit reached (simulado)", "type": "tokens"}},
+                            {"retry-after": str(servidor.retry_after)})
+            return
+
+        contenido = respuesta_simulada(pedido.get("messages", []))
+        tokens_entrada = sum(len(m.get("content") or "") for m in pedido.get("messages", [])) // 4
+        tokens_salida = len(contenido) // 4
+        self._responder(200, {
+            "id": "chatcmpl-benchmark",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": pedido.get("model", "simulado"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": contenido}}],
+            "usage": {"prompt_tokens": tokens_entrada, "completion_tokens": tokens_salida,
+                      "total_tokens": tokens_entrada + tokens_salida},
+        })
+
+    def _responder(self, codigo, datos, headers=None):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for clave, valor in (headers or {}).items():
+            self.send_header(clave, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class ServidorLLMSimulado:
+    """
+    Servidor local compatible con la API de chat de OpenAI/Groq. Responde después de
+    ``latencia`` segundos (± ``jitter``) y devuelve un 429 con ``retry-after`` en una fracción
+    ``tasa_429`` de los pedidos, para medir los reintentos y el failover sin gastar cuota.
+    """
+
+    def __init__(self, latencia=LATENCIA_LLM, jitter=JITTER_LLM, tasa_429=TASA_429, retry_after=RETRY_AFTER):
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), _ManejadorLLM)
+        self.servidor.daemon_threads = True
+        self.servidor.latencia = latencia
+        self.servidor.jitter = jitter
+        self.servidor.tasa_429 = tasa_429
+        self.servidor.retry_after = retry_after
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.servidor.server_address[1]}"
+
+    def iniciar(self):
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self
+
+    def detener(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+# ----- ESCENARIO (proceso hijo) -----
+
+def correr_escenario(hosts, demora_host, limites_reales):
+    """
+    Corre ``main.ejecutar_por_etapas`` sin búsqueda sobre el ``./data`` del directorio actual
+    (preparado por ``ejecutar_benchmark``), cargando en una SQLite local. Se ejecuta en un
+    proceso aparte por tamaño, para que los cachés, el estado y los routers arranquen vacíos.
+    """
+    # Estos módulos leen el entorno (API de Groq, claves) y ./data al importarse, así que se
+    # importan recién aquí, con el entorno y el directorio de trabajo del escenario ya listos
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    import main
+    from config.dbconfig import Base
+    from scripts import crawler, limitador_llm
+    from scripts.clasificar_eventos import router_extraccion
+    from scripts.revisar_links import router_revision
+    from scripts.metricas import metricas
+
+    for host in hosts:
+        crawler.DEMORAS_HOST[host] = demora_host
+    if not limites_reales:
+        # Se mide el rendimiento propio del pipeline, no los límites del plan gratuito
+        sin_limites = {"rpm": 10**6, "tpm": 10**9}
+        limitador_llm.limitador = limitador_llm.LimitadorLLM(
+            limites={modelo: sin_limites for modelo in [*limitador_llm.LIMITES_MODELOS, "simulado"]})
+    for router in (router_revision, router_extraccion):
+        for modelo in router.modelos:
+            modelo.cuota_diaria = None
+
+    engine = create_engine(f"sqlite:///{os.path.abspath(os.path.join(DATA_DIR, 'eventos.sqlite'))}")
+    Base.metadata.create_all(engine)
+    session_db = sessionmaker(bind=engine)()
+
+    inicio = time.perf_counter()
+    main.ejecutar_por_etapas(buscar=False, session_db=session_db)
+    duracion = time.perf_counter() - inicio
+
+    with engine.connect() as conexion:
+        cargados = conexion.exec_driver_sql("SELECT COUNT(*) FROM evento").scalar()
+    reporte = metricas.guardar_reporte(os.path.join(DATA_DIR, "reportes"))
+    with open("resultado.json", "w", encoding="utf-8") as f:
+        json.dump({"duracion": duracion, "eventos_cargados": cargados, "reporte": os.path.abspath(reporte)}, f)
+
+
+# ----- EJECUCIÓN -----
+
+def _preparar_escenario(directorio, servidor_paginas, tamanio):
+    datos = os.path.join(directorio, "data")
+    os.makedirs(datos, exist_ok=True)
+    for archivo in ARCHIVOS_BASE:
+        origen = os.path.join(DATA_DIR, archivo)
+        if os.path.exists(origen):
+            shutil.copy(origen, datos)
+    almacen.agregar(almacen.RESULTADOS_BUSQUEDA, pd.DataFrame({
+        "title": [servidor_paginas.corpus.titulo(i) for i in range(tamanio)],
+        "link": [servidor_paginas.url(i) for i in range(tamanio)],
+        "snippet": "",
+    }), data_dir=datos)
+
+
+def _resumir(tamanio, resultado):
+    with open(resultado["reporte"], "r", encoding="utf-8") as f:
+        reporte = json.load(f)
+    fila = {"urls": tamanio, "segundos": round(resultado["duracion"], 2),
+            "urls_por_segundo": round(tamanio / resultado["duracion"], 2) if resultado["duracion"] else None,
+            "eventos_cargados": resultado["eventos_cargados"]}
+    for span in reporte["spans"]:
+        if span["nombre"] == "etapa_total" and span["etiquetas"].get("etapa") in ETAPAS:
+            fila[f"{span['etiquetas']['etapa']}_s"] = round(span["total"], 2)
+        elif span["nombre"] == "llm":
+            fila["llamadas_llm"] = fila.get("llamadas_llm", 0) + span["cantidad"]
+            fila["llm_p95_s"] = round(max(fila.get("llm_p95_s", 0), span["p95"]), 3)
+    for contador in reporte["contadores"]:
+        if contador["nombre"] in ("llm_tokens_entrada", "llm_tokens_salida", "llm_reintentos"):
+            fila[contador["nombre"]] = fila.get(contador["nombre"], 0) + int(contador["valor"])
+    return fila
+
+
+def comparar(filas, referencia_path, tolerancia=TOLERANCIA_REGRESION):
+    """
+    Compara el tiempo de cada etapa con una corrida anterior del benchmark (su JSON de
+    resultados) y devuelve las regresiones: etapas más lentas que la referencia en más de
+    ``tolerancia`` (fracción) para la misma cantidad de URLs.
+    """
+    with open(referencia_path, "r", encoding="utf-8") as f:
+        referencia = {fila["urls"]: fila for fila in json.load(f)["resultados"]}
+
+    regresiones = []
+    for fila in filas:
+        base = referencia.get(fila["urls"])
+        if not base:
+            continue
+        for columna in [f"{etapa}_s" for etapa in ETAPAS] + ["segundos"]:
+            actual, anterior = fila.get(columna), base.get(columna)
+            # Por debajo de medio segundo la variación es ruido
+            if actual is None or not anterior or max(actual, anterior) < 0.5:
+                continue
+            if actual > anterior * (1 + tolerancia):
+                regresiones.append(
+                    f"{fila['urls']} URLs, {columna}: {anterior:.2f}s -> {actual:.2f}s "
+                    f"(+{(actual / anterior - 1) * 100:.0f}%)")
+    return regresiones
+
+
+def ejecutar_benchmark(tamanios=TAMANIOS, hosts=HOSTS_SIMULADOS, demora_host=DEMORA_HOST_SIMULADO,
+                       latencia=LATENCIA_LLM, tasa_429=TASA_429, retry_after=RETRY_AFTER,
+                       limites_reales=False, referencia=None, tolerancia=TOLERANCIA_REGRESION):
+    """
+    Corre el pipeline completo (revisión, extracción, sedes, organizadores y carga en SQLite)
+    contra el corpus servido localmente y el LLM simulado, una vez por cada tamaño de
+    ``tamanios``. Guarda los tiempos por etapa en ``data/benchmark/resultados_<fecha>.json`` y
+    ``.csv`` y, si se indica una corrida de ``referencia``, informa las regresiones.
+    """
+    corpus = Corpus()
+    print(f"Corpus: {len(corpus.grabadas)} páginas grabadas, el resto sintéticas.")
+    servidor_paginas = ServidorPaginas(corpus, hosts).iniciar()
+    servidor_llm = ServidorLLMSimulado(latencia=latencia, tasa_429=tasa_429, retry_after=retry_after).iniciar()
+    marca = datetime.now().strftime("%Y%m%d_%H%M%S")
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    entorno = {clave: valor for clave, valor in os.environ.items()
+               if clave not in ("GEMINI_API_KEY", "LLM_LOCAL_URL", "LLM_LOCAL_MODELO", "LLM_LOCAL_API_KEY")}
+    entorno.update({
+        "GROQ_BASE_URL": servidor_llm.url,
+        "GROQ_API_KEY": "benchmark",
+        "EMETUR_GROQ_API_KEY": "benchmark",
+        "PYTHONPATH": os.pathsep.join(filter(None, [raiz, os.environ.get("PYTHONPATH")])),
+    })
+
+    filas = []
+    try:
+        for tamanio in tamanios:
+            directorio = os.path.abspath(os.path.join(CORRIDAS_DIR, f"{marca}_{tamanio}"))
+            _preparar_escenario(directorio, servidor_paginas, tamanio)
+            print(f"\n--- Benchmark con {tamanio} URLs (log en {directorio}/salida.log) ---")
+
+            comando = [
+                sys.executable, "-m", "scripts.benchmark", "escenario",
+                "--hosts", *servidor_paginas.hosts, "--demora-host", str(demora_host),
+            ]
+            if limites_reales:
+                comando.append("--limites-reales")
+            with open(os.path.join(directorio, "salida.log"), "w", encoding="utf-8") as log:
+                proceso = subprocess.run(comando, cwd=directorio, env=entorno, stdout=log, stderr=subprocess.STDOUT)
+            if proceso.returncode != 0:
+                print(f"El escenario de {tamanio} URLs terminó con error (código {proceso.returncode}).")
+                continue
+
+            with open(os.path.join(directorio, "resultado.json"), "r", encoding="utf-8") as f:
+                fila = _resumir(tamanio, json.load(f))
+            filas.append(fila)
+            print(", ".join(f"{clave}={valor}" for clave, valor in fila.items()))
+    finally:
+        servidor_paginas.detener()
+        servidor_llm.detener()
+
+    configuracion = {"hosts": hosts, "demora_host": demora_host, "latencia_llm": latencia,
+                     "tasa_429": tasa_429, "retry_after": retry_after, "limites_reales": limites_reales,
+                     "paginas_grabadas": len(corpus.grabadas)}
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    json_path = os.path.join(BENCHMARK_DIR, f"resultados_{marca}.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump({"fecha": marca, "configuracion": configuracion, "resultados": filas}, f, ensure_ascii=False, indent=2)
+    pd.DataFrame(filas).to_csv(os.path.join(BENCHMARK_DIR, f"resultados_{marca}.csv"), sep=";", index=False)
+    print(f"\nResultados guardados en '{json_path}'")
+
+    regresiones = comparar(filas, referencia, tolerancia) if referencia else []
+    for regresion in regresiones:
+        print(f"REGRESIÓN: {regresion}")
+    return filas, regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark offline del pipeline con páginas grabadas y un LLM simulado.")
+    subparsers = parser.add_subparsers(dest="comando")
+
+    correr = subparsers.add_parser("correr", help="Mide el pipeline completo para cada cantidad de URLs.")
+    correr.add_argument("--tamanios", type=int, nargs="+", default=TAMANIOS)
+    correr.add_argument("--hosts", type=int, default=HOSTS_SIMULADOS, help="Dominios simulados.")
+    correr.add_argument("--demora-host", type=float, default=DEMORA_HOST_SIMULADO,
+                        help="Demora de cortesía entre pedidos a un mismo dominio simulado.")
+    correr.add_argument("--latencia-llm", type=float, default=LATENCIA_LLM, help="Segundos por respuesta del LLM.")
+    correr.add_argument("--tasa-429", type=float, default=TASA_429, help="Fracción de pedidos que responden 429.")
+    correr.add_argument("--retry-after", type=float, default=RETRY_AFTER)
+    correr.add_argument("--limites-reales", action="store_true",
+                        help="Respeta los límites por minuto de LIMITES_MODELOS (para dimensionar la ventana nocturna).")
+    correr.add_argument("--referencia", help="JSON de resultados de una corrida anterior para detectar regresiones.")
+    correr.add_argument("--tolerancia", type=float, default=TOLERANCIA_REGRESION)
+
+    grabar = subparsers.add_parser("grabar", help="Descarga las páginas de las URLs conocidas al corpus.")
+    grabar.add_argument("--limite", type=int)
+
+    escenario = subparsers.add_parser("escenario", help=argparse.SUPPRESS)
+    escenario.add_argument("--hosts", nargs="+", default=[])
+    escenario.add_argument("--demora-host", type=float, default=DEMORA_HOST_SIMULADO)
+    escenario.add_argument("--limites-reales", action="store_true")
+
+    args = parser.parse_args()
+    if args.comando == "grabar":
+        grabar_corpus(args.limite)
+    elif args.comando == "escenario":
+        correr_escenario(args.hosts, args.demora_host, args.limites_reales)
+    else:
+        if args.comando is None:
+            args = parser.parse_args(["correr"])
+        _, regresiones = ejecutar_benchmark(
+            args.tamanios, args.hosts, args.demora_host, args.latencia_llm, args.tasa_429,
+            args.retry_after, args.limites_reales, args.referencia, args.tolerancia)
+        sys.exit(1 if regresiones else 0)
@@ -0,0 +1,192 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from scripts.limitador_llm import completar_chat
+from scripts.metricas import metricas
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+DATA_DIR = "./data"
+CACHE_LLM_PATH = os.path.join(DATA_DIR, "cache_llm.sqlite")
+
+# Tamaño máximo de las respuestas almacenadas antes de desalojar las menos usadas
+MAX_BYTES = 64 * 1024 * 1024
+
+
+def hash_texto(texto):
+    return hashlib.sha256((texto or "").encode("utf-8")).hexdigest()
+
+
+class CacheLLM:
+    """
+    Caché persistente de respuestas del LLM. La clave combina el modelo, la versión de la
+    plantilla de prompt y el hash del contenido enviado, así que reanudar una corrida no vuelve
+    a pagar tokens por páginas que ya se procesaron con el mismo prompt. Cambiar la versión de
+    una plantilla invalida automáticamente sus respuestas anteriores.
+    """
+
+    def __init__(self, path=CACHE_LLM_PATH, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.aciertos = 0
+        self.fallos = 0
+        self.tokens_ahorrados = 0
+        self._lock = threading.Lock()
+
+        directorio = os.path.dirname(path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS respuestas (
+                clave TEXT PRIMARY KEY,
+                modelo TEXT NOT NULL,
+                version_prompt TEXT NOT NULL,
+                respuesta TEXT NOT NULL,
+                tokens INTEGER NOT NULL DEFAULT 0,
+                bytes INTEGER NOT NULL,
+                usos INTEGER NOT NULL DEFAULT 0,
+                creado REAL NOT NULL,
+                ultimo_acceso REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_respuestas_acceso ON respuestas (ultimo_acceso);
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def clave(modelo, version_prompt, contenido):
+        return hash_texto(f"{modelo}\x1f{version_prompt}\x1f{hash_texto(contenido)}")
+
+    def obtener(self, modelo, version_prompt, contenido, validar=None):
+        """Devuelve la respuesta almacenada o None, actualizando las métricas de aciertos."""
+        encontrada = self.obtener_de([modelo], version_prompt, contenido, validar)
+        return encontrada[1] if encontrada else None
+
+    def obtener_de(self, modelos, version_prompt, contenido, validar=None):
+        """
+        Busca el pedido entre las respuestas de varios ``modelos`` y devuelve la del primero (en
+        el orden dado) que lo tenga como ``(modelo, respuesta)``, o None. Cuenta como un único
+        acierto o fallo. Con ``validar``, las respuestas guardadas que no lo cumplen (de antes de
+        que se validara al guardar) se ignoran como si no estuvieran.
+        """
+        claves = {self.clave(modelo, version_prompt, contenido): modelo for modelo in modelos}
+        marcadores = ", ".join("?" for _ in claves)
+        with self._lock:
+            filas = {
+                clave: (respuesta, tokens) for clave, respuesta, tokens in self._conn.execute(
+                    f"SELECT clave, respuesta, tokens FROM respuestas WHERE clave IN ({marcadores})",
+                    list(claves)
+                )
+            }
+            clave = next(
+                (c for c in claves if c in filas and (validar is None or validar(filas[c][0]))), None)
+            if clave is None:
+                self.fallos += 1
+                return None
+            self._conn.execute(
+                "UPDATE respuestas SET usos = usos + 1, ultimo_acceso = ? WHERE clave = ?",
+                (time.time(), clave)
+            )
+            self._conn.commit()
+            respuesta, tokens = filas[clave]
+            self.aciertos += 1
+            self.tokens_ahorrados += tokens
+            return claves[clave], respuesta
+
+    def guardar(self, modelo, version_prompt, contenido, respuesta, tokens=0):
+        clave = self.clave(modelo, version_prompt, contenido)
+        ahora = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO respuestas "
+                "(clave, modelo, version_prompt, respuesta, tokens, bytes, usos, creado, ultimo_acceso) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                (clave, modelo, version_prompt, respuesta, tokens, len(respuesta.encode("utf-8")), ahora, ahora)
+            )
+            self._desalojar()
+            self._conn.commit()
+
+    def _desalojar(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM respuestas").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        a_borrar = []
+        for clave, tamanio in self._conn.execute("SELECT clave, bytes FROM respuestas ORDER BY ultimo_acceso"):
+            if total <= self.max_bytes:
+                break
+            a_borrar.append((clave,))
+            total -= tamanio
+        self._conn.executemany("DELETE FROM respuestas WHERE clave = ?", a_borrar)
+
+    def metricas(self):
+        consultas = self.aciertos + self.fallos
+        with self._lock:
+            entradas, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM respuestas").fetchone()
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+            "tokens_ahorrados": self.tokens_ahorrados,
+            "entradas": entradas,
+            "bytes": total_bytes,
+        }
+
+
+# ----- INSTANCIA COMPARTIDA -----
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache_llm():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheLLM()
+        return _cache
+
+
+def completar_con_cache(client, model, messages, version_prompt, contenido, medir=None,
+                        consultar_cache=True, validar=None, **kwargs):
+    """
+    Igual que ``completar_chat`` pero devuelve directamente el texto de la respuesta y lo
+    busca antes en el caché persistente. ``contenido`` es el texto variable del prompt (la
+    página y cualquier dato que la acompañe); ``version_prompt`` identifica la plantilla.
+    Si se pasa ``medir``, se la llama con la latencia (segundos) y los tokens de cada llamada
+    que efectivamente llegó al modelo (no en los aciertos del caché). Con
+    ``consultar_cache=False`` no se busca (quien llama ya lo hizo) pero la respuesta se guarda.
+    ``validar`` recibe el texto de la respuesta y devuelve si se puede usar: sólo se guardan las
+    que lo cumplen, así una respuesta mal formada no se repite en las corridas siguientes.
+    """
+    cache = obtener_cache_llm()
+    if consultar_cache:
+        respuesta = cache.obtener(model, version_prompt, contenido, validar)
+        metricas.incrementar("cache_llm", resultado="acierto" if respuesta is not None else "fallo", modelo=model)
+        if respuesta is not None:
+            return respuesta
+
+    inicio = time.monotonic()
+    response = completar_chat(client, model=model, messages=messages, **kwargs)
+    respuesta = response.choices[0].message.content
+    uso = getattr(response, "usage", None)
+    tokens = getattr(uso, "total_tokens", 0) or 0
+    if medir is not None:
+        medir(time.monotonic() - inicio, tokens)
+    if respuesta and (validar is None or validar(respuesta)):
+        cache.guardar(model, version_prompt, contenido, respuesta, tokens)
+    return respuesta
+
+
+def imprimir_metricas():
+    m = obtener_cache_llm().metricas()
+    print(
+        f"Caché LLM: {m['aciertos']} aciertos, {m['fallos']} fallos "
+        f"({m['tasa_aciertos']:.0%}), ~{m['tokens_ahorrados']} tokens ahorrados, "
+        f"{m['entradas']} entradas ({m['bytes'] / 1024:.0f} KB)"
+    )
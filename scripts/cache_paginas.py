@@ -0,0 +1,269 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from scripts.extraccion_html import html_a_texto
+from scripts.presupuesto_tokens import ajustar_a_modelo
+from scripts.metricas import metricas
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+DATA_DIR = "./data"
+CACHE_PATH = os.path.join(DATA_DIR, "cache_paginas.sqlite")
+
+# Tiempo durante el cual una página descargada se considera fresca y se sirve sin ir a la red
+TTL_SEGUNDOS = 24 * 60 * 60
+# Tamaño máximo que puede ocupar el HTML + texto almacenado antes de desalojar entradas
+MAX_BYTES = 256 * 1024 * 1024
+TIMEOUT = 10
+
+MAX_CHARS = 15000
+MARCA_TRUNCADO = "\n... [Contenido truncado para brevedad]"
+
+
+# ----- LIMPIEZA DE HTML -----
+
+def limpiar_html(html):
+    """
+    Convierte el HTML de una página en texto plano con el motor de ``extraccion_html``: parsea
+    con lxml, descarta scripts, menús, barras laterales y pies, se queda con el contenido
+    principal y antepone los metadatos útiles (OpenGraph, ``<time>`` y eventos JSON-LD).
+    """
+    with metricas.span("parseo_html"):
+        return html_a_texto(html)
+
+
+def truncar_texto(texto, max_chars=MAX_CHARS):
+    """Recorta el texto a ``max_chars`` caracteres para no exceder el contexto del LLM."""
+    if len(texto) > max_chars:
+        return texto[:max_chars] + MARCA_TRUNCADO
+    return texto
+
+
+# ----- ALMACÉN DE PÁGINAS -----
+
+class CachePaginas:
+    """
+    Almacén de páginas direccionado por contenido. Cada URL apunta al hash SHA-256 de su HTML,
+    y el HTML junto con su texto limpio se guarda una única vez por hash. Así, una URL se descarga
+    y se parsea una sola vez aunque la consulten todas las etapas del pipeline.
+
+    Las entradas vencidas (``ttl``) se revalidan con ETag/Last-Modified y, cuando el tamaño total
+    supera ``max_bytes``, se desalojan los contenidos usados hace más tiempo.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=TTL_SEGUNDOS, max_bytes=MAX_BYTES, timeout=TIMEOUT):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+        directorio = os.path.dirname(path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS contenidos (
+                hash TEXT PRIMARY KEY,
+                html TEXT NOT NULL,
+                texto TEXT NOT NULL,
+                bytes INTEGER NOT NULL,
+                ultimo_acceso REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                descargado REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_contenidos_acceso ON contenidos (ultimo_acceso);
+            """
+        )
+        self._conn.commit()
+
+    # --- Lectura ---
+
+    def _buscar(self, url):
+        fila = self._conn.execute(
+            "SELECT u.hash, u.etag, u.last_modified, u.descargado, c.html, c.texto "
+            "FROM urls u JOIN contenidos c ON c.hash = u.hash WHERE u.url = ?",
+            (url,)
+        ).fetchone()
+        if fila is None:
+            return None
+        claves = ("hash", "etag", "last_modified", "descargado", "html", "texto")
+        return dict(zip(claves, fila))
+
+    def consultar(self, url):
+        """
+        Consulta el caché sin ir a la red. Devuelve una tupla ``(pagina, headers)``: ``pagina`` es
+        la página si está fresca (o None) y ``headers`` son las cabeceras condicionales a enviar
+        para revalidar una entrada vencida.
+        """
+        with self._lock:
+            entrada = self._buscar(url)
+
+        if entrada is None:
+            metricas.incrementar("cache_paginas", resultado="ausente")
+            return None, {}
+
+        ahora = time.time()
+        if ahora - entrada["descargado"] < self.ttl:
+            metricas.incrementar("cache_paginas", resultado="fresca")
+            self._tocar(entrada["hash"], ahora)
+            return {"url": url, "html": entrada["html"], "texto": entrada["texto"]}, {}
+
+        metricas.incrementar("cache_paginas", resultado="vencida")
+        headers = {}
+        if entrada["etag"]:
+            headers["If-None-Match"] = entrada["etag"]
+        if entrada["last_modified"]:
+            headers["If-Modified-Since"] = entrada["last_modified"]
+        return None, headers
+
+    def revalidar(self, url):
+        """Marca como fresca una entrada que el servidor confirmó sin cambios (HTTP 304)."""
+        ahora = time.time()
+        with self._lock:
+            entrada = self._buscar(url)
+            if entrada is None:
+                return None
+            self._conn.execute("UPDATE urls SET descargado = ? WHERE url = ?", (ahora, url))
+            self._conn.commit()
+        self._tocar(entrada["hash"], ahora)
+        return {"url": url, "html": entrada["html"], "texto": entrada["texto"]}
+
+    def obtener(self, url):
+        """
+        Devuelve un diccionario con ``url``, ``html`` y ``texto`` de la página, descargándola
+        sólo si no está en caché o si venció y el servidor informa que cambió.
+        Devuelve None si no se pudo obtener.
+        """
+        pagina, headers = self.consultar(url)
+        if pagina is not None:
+            return pagina
+
+        dominio = urlsplit(url).netloc.lower()
+        try:
+            with metricas.span("descarga", origen="cache_paginas"):
+                response = requests.get(url, timeout=self.timeout, headers=headers)
+            metricas.incrementar("http_respuestas", dominio=dominio, estado=response.status_code)
+            if response.status_code == 304 and headers:
+                return self.revalidar(url)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            if getattr(e, "response", None) is None:
+                metricas.incrementar("http_respuestas", dominio=dominio, estado=type(e).__name__)
+            print(f"Error al acceder a la URL {url}: {e}")
+            return None
+
+        # Sin charset en los headers requests asume ISO-8859-1: se detecta desde el contenido
+        if "charset" not in response.headers.get("Content-Type", "").lower():
+            response.encoding = response.apparent_encoding
+
+        return self.guardar(
+            url, response.text,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified")
+        )
+
+    # --- Escritura ---
+
+    def guardar(self, url, html, etag=None, last_modified=None):
+        """Almacena el HTML de ``url`` (y su texto limpio) y devuelve la página resultante."""
+        hash_html = hashlib.sha256(html.encode("utf-8")).hexdigest()
+        ahora = time.time()
+
+        with self._lock:
+            existente = self._conn.execute(
+                "SELECT texto FROM contenidos WHERE hash = ?", (hash_html,)).fetchone()
+
+        if existente:
+            # Mismo contenido ya visto (otra URL o una descarga anterior): no se vuelve a parsear
+            texto = existente[0]
+        else:
+            try:
+                texto = limpiar_html(html)
+            except Exception as e:
+                print(f"Error al procesar el contenido de {url}: {e}")
+                return None
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO contenidos (hash, html, texto, bytes, ultimo_acceso) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (hash_html, html, texto, len(html) + len(texto), ahora)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO urls (url, hash, etag, last_modified, descargado) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, hash_html, etag, last_modified, ahora)
+            )
+            self._desalojar()
+            self._conn.commit()
+
+        return {"url": url, "html": html, "texto": texto}
+
+    def _tocar(self, hash_html, ahora):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE contenidos SET ultimo_acceso = ? WHERE hash = ?", (ahora, hash_html))
+            self._conn.commit()
+
+    def _desalojar(self):
+        """Elimina los contenidos menos usados hasta quedar por debajo de ``max_bytes``."""
+        total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM contenidos").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        cursor = self._conn.execute("SELECT hash, bytes FROM contenidos ORDER BY ultimo_acceso")
+        a_borrar = []
+        for hash_html, tamanio in cursor:
+            if total <= self.max_bytes:
+                break
+            a_borrar.append((hash_html,))
+            total -= tamanio
+
+        self._conn.executemany("DELETE FROM contenidos WHERE hash = ?", a_borrar)
+        self._conn.executemany("DELETE FROM urls WHERE hash = ?", a_borrar)
+
+
+# ----- INSTANCIA COMPARTIDA POR TODAS LAS ETAPAS -----
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache():
+    """Devuelve la instancia de ``CachePaginas`` compartida por el proceso."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CachePaginas()
+        return _cache
+
+
+def obtener_pagina(url):
+    """Atajo a ``obtener_cache().obtener(url)``."""
+    return obtener_cache().obtener(url)
+
+
+def extraer_contenido_web(url, modelo=None, prompt=""):
+    """
+    Devuelve el texto limpio de la página ``url`` leyendo a través del caché compartido, o None
+    si no se pudo obtener. Si se indica ``modelo``, el texto se ajusta a su presupuesto de tokens
+    (descontando ``prompt``); si no, se trunca a ``MAX_CHARS`` caracteres.
+    """
+    pagina = obtener_pagina(url)
+    if pagina is None:
+        return None
+    if modelo:
+        return ajustar_a_modelo(pagina["texto"], modelo, prompt)
+    return truncar_texto(pagina["texto"])
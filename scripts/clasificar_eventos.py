@@ -1,23 +1,30 @@
 from groq import Groq, RateLimitError
+from sqlalchemy import inspect, select, text
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import SQLAlchemyError
 from google.api_core import exceptions
-from bs4 import BeautifulSoup
-import requests
 from dotenv import load_dotenv
 from IPython.display import Markdown
 import textwrap
+import hashlib
 import google.generativeai as genai
 import os
 import sys
 import pandas as pd
 import json
-import time
 
 proyecto_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(proyecto_dir)
 
 from models.evento_reuniones import Evento
 from config.dbconfig import session
+from scripts.cache_paginas import extraer_contenido_web
+from scripts.presupuesto_tokens import ajustar_a_modelo
+from scripts.datos_estructurados import extraer_datos_estructurados, AGRUPACIONES
+from scripts.router_llm import RouterLLM, SinModelosDisponibles, NO_HAY_MODELOS_DISPONIBLES
+from scripts.procesar_eventos import limpiar_raw_response, mapear_tipo_evento
+from scripts import almacen
 
 load_dotenv()
 
@@ -31,41 +38,127 @@ GROQ_API_KEY = os.getenv("EMETUR_GROQ_API_KEY")
 client = Groq(api_key=GROQ_API_KEY)
 
 
-def extraer_contenido_web(url):
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        for script_or_style in soup(['script', 'style']):
-            script_or_style.decompose()
-
-        text_content = soup.get_text()
-
-        lines = (line.strip() for line_cnt, line in enumerate(
-            text_content.splitlines()) if line_cnt < 1000)
-        chunks = (phrase.strip() for phrase in ' '.join(lines).split("  "))
-        cleaned_text = '\n'.join(chunk for chunk in chunks if chunk)
+# Versiones de las plantillas de prompt. Forman parte de la clave del caché de respuestas:
+# al modificar un prompt hay que incrementar su versión para no reutilizar respuestas viejas.
+VERSION_PROMPT_EVENTO = "evento-v1"
+VERSION_PROMPT_COMBINADO = "evento-combinado-v1"
+VERSION_PROMPT_CAMPOS = "evento-campos-v1"
+
+MODELO_EXTRACCION = "gemma2-9b-it"
+# Cadena de modelos de la extracción: si se agota la cuota de uno se pasa al siguiente
+router_extraccion = RouterLLM.desde_entorno(client, MODELO_EXTRACCION, etiqueta_groq="groq-emetur")
+
+# Opciones de clasificación que se le dan al LLM
+OPCIONES_TIPO_EVENTO = (
+    "Asamblea, Conferencia, Congreso, Convención, Encuentro, Foro, Jornada, Seminario, Simposio, "
+    "Exposición, Feria, Workshop, Evento Deportivo Internacional, Incentivo, Evento Cultural, Evento Deportivo Nacional, Otro tipo de evento"
+)
+OPCIONES_ROTACION = (
+    "Local, Provincial, Nacional - Regional (Patagonia), Nacional - Regional (NOA), Nacional - Regional (Litoral), "
+    "Nacional - Regional (Centro), Nacional - Regional (Cuyo), Nacional, Internacional - Iberoamérica, Internacional - Panamérica, "
+    "Internacional - Latinoamérica, Internacional - Sudamérica, Internacional - Mercosur, Internacional, Único, NS/NC"
+)
+OPCIONES_TEMA = (
+    "Acuático, Agricultura y ganadería, Ajedrez, Alimentos, Arquitectura, Arte y diseño, Artes marciales y peleas, Automotores, "
+    "Básquet, Bibliotecología, Ciclismo, Ciencias históricas y sociales, Ciencias naturales y exactas, Comercio, Comunicación, "
+    "Cosmética y tratamientos estéticos, Cultura, Danza, Deporte y ocio, Derecho, Diseño de indumentaria y moda, Ecología y medio ambiente, "
+    "Economía, Educación, Energía, Entretenimiento, parques y atracciones, Farmacia, Fisicoculturismo, Fútbol, Gastronomía, Geografia, "
+    "Gobierno/Sindical, Golf, Handball, Hockey, Industria/Industrial, Lingüística, Literatura, Logística, Management y negocios, "
+    "Maratón, Matemática y estadística, Medicina, Multideportes, Multisectorial, Ns/Nc, Odontología, Otro, Packaging y regalería, "
+    "Polo, Psicología, Religión, Rugby, Seguridad, Seguros, Servicios, Sóftbol, Tecnología, Tenis, paddel o paleta, Tiro con arco y flecha, "
+    "Transporte, Turismo y hotelería, Veterinaria, Vóley"
+)
+
+# Campos que se le piden al LLM por separado cuando los datos estructurados de la página
+# (JSON-LD, microdata, OpenGraph) ya resolvieron el nombre, las fechas y el resto
+INSTRUCCIONES_CAMPOS = {
+    "tipoEvento": f"tipoEvento: el tipo de evento, eligiendo la opción que mejor se ajuste de esta lista: {OPCIONES_TIPO_EVENTO}.",
+    "detalleTipoRotacion": f"detalleTipoRotacion: el detalle de la rotación, eligiendo de esta lista: {OPCIONES_ROTACION}.",
+    "tema": f"tema: el tema principal del evento, eligiendo de esta lista: {OPCIONES_TEMA}.",
+    "sedePrincipal": "sedePrincipal: el nombre de la sede o locación principal tal como aparece en el texto.",
+    "organizador": "organizador: el nombre de la entidad organizadora principal tal como aparece en el texto.",
+}
+
+# Campos que el LLM debe devolver en la extracción del evento y los tipos aceptados para cada uno.
+# Los marcados como requeridos son los mínimos para que el evento sea utilizable.
+ESQUEMA_EVENTO = {
+    "nombreEvento": ((str,), True),
+    "tipoEvento": ((str,), True),
+    "detalleTipoRotacion": ((str,), True),
+    "tema": ((str,), True),
+    "fechaEdicion": ((str, type(None)), False),
+    "fechaInicio": ((str, type(None)), True),
+    "fechaFinalizacion": ((str, type(None)), True),
+    "añoRaw": ((str, int, type(None)), False),
+    "mesLiteralRaw": ((str, type(None)), False),
+    "diaInicioRaw": ((str, int, type(None)), False),
+    "diaFinalRaw": ((str, int, type(None)), False),
+    "Localidad": ((str, type(None)), False),
+    "fechaRaw": ((str, type(None)), False),
+    "sedeRaw": ((str, type(None)), False),
+    "agrupacion": ((str, type(None)), False),
+}
+
+# Campos adicionales del modo combinado, que reemplazan las consultas separadas de
+# corregir_sedes y asignar_entidades_organizadoras
+ESQUEMA_COMBINADO = {
+    **ESQUEMA_EVENTO,
+    "sedePrincipal": ((str, type(None)), False),
+    "organizador": ((str, type(None)), False),
+}
+
+
+def validar_datos_evento(datos, esquema=ESQUEMA_EVENTO):
+    """
+    Valida un diccionario devuelto por el LLM contra ``esquema``. Devuelve la lista de errores
+    encontrados (vacía si es válido).
+    """
+    if not isinstance(datos, dict):
+        return [f"Se esperaba un objeto JSON y se recibió {type(datos).__name__}"]
+
+    errores = []
+    for campo, (tipos, requerido) in esquema.items():
+        if campo not in datos:
+            if requerido:
+                errores.append(f"Falta el campo requerido '{campo}'")
+            continue
+        if not isinstance(datos[campo], tipos):
+            errores.append(f"Tipo inválido para '{campo}': {type(datos[campo]).__name__}")
+    return errores
 
-        max_chars = 15000
-        if len(cleaned_text) > max_chars:
-            cleaned_text = cleaned_text[:max_chars] + \
-                "\n... [Contenido truncado para brevedad]"
 
-        return cleaned_text
-    except requests.exceptions.RequestException as e:
-        print(f"Error al acceder a la URL {url}: {e}")
-        return None
-    except Exception as e:
-        print(f"Error al procesar el contenido de {url}: {e}")
+def _leer_json(contenido):
+    try:
+        return json.loads(limpiar_raw_response(contenido or ""))
+    except json.JSONDecodeError:
         return None
 
 
-def extraer_datos_evento(contenido_web):
-    if not contenido_web:
-        return None
+def validador_respuesta(esquema=None):
+    """
+    Validador para el caché del LLM: acepta la respuesta si es un objeto JSON y, si se indica
+    ``esquema``, si además cumple ``validar_datos_evento``.
+    """
+    def validar(contenido):
+        datos = _leer_json(contenido)
+        if esquema is None:
+            return isinstance(datos, dict)
+        return not validar_datos_evento(datos, esquema)
+    return validar
+
+
+def construir_prompt_evento(contenido_web, combinado=False):
+    """Arma el prompt de extracción; en modo combinado pide también sede y organizador."""
+    instrucciones_combinadas = ""
+    if combinado:
+        instrucciones_combinadas = (
+            "\n\n11. sedePrincipal: Extrae el nombre de la sede o locación principal (por ejemplo, el teatro, "
+            "centro cultural, estadio o sala) tal como aparece en el texto, sin encabezados ni texto adicional.\n\n"
+            "12. organizador: Extrae el nombre de la entidad organizadora principal tal como aparece en el texto, "
+            "sin encabezados ni texto adicional. Si algún dato no aparece, devuelve null en ese campo.\n\n"
+        )
 
-    prompt = (
+    return (
         f"Se trata de un evento en el ámbito de turismo de reuniones, congresos y convenciones.\n"
         f"Analiza el siguiente contenido de página web (texto e información aparente en imágenes o banners):\n\n"
         f"{contenido_web}\n\n"
@@ -73,21 +166,11 @@ def extraer_datos_evento(contenido_web):
         "1. nombreEvento: Extrae el nombre oficial del evento exactamente como aparece en el título o encabezado principal, "
         "sin agregar numeración o texto adicional.\n\n"
         "2. tipoEvento: Identifica el tipo de evento y selecciona la opción que mejor se ajuste de la siguiente lista:\n"
-        "   Asamblea, Conferencia, Congreso, Convención, Encuentro, Foro, Jornada, Seminario, Simposio, "
-        "Exposición, Feria, Workshop, Evento Deportivo Internacional, Incentivo, Evento Cultural, Evento Deportivo Nacional, Otro tipo de evento.\n\n"
+        f"   {OPCIONES_TIPO_EVENTO}.\n\n"
         "3. detalleTipoRotacion: Extrae el detalle de la rotación y selecciona la opción que mejor se ajuste de la siguiente lista:\n"
-        "   Local, Provincial, Nacional - Regional (Patagonia), Nacional - Regional (NOA), Nacional - Regional (Litoral), "
-        "Nacional - Regional (Centro), Nacional - Regional (Cuyo), Nacional, Internacional - Iberoamérica, Internacional - Panamérica, "
-        "Internacional - Latinoamérica, Internacional - Sudamérica, Internacional - Mercosur, Internacional, Único, NS/NC.\n\n"
+        f"   {OPCIONES_ROTACION}.\n\n"
         "4. tema: Extrae el tema principal del evento y clasifícalo en la siguiente lista de temas:\n"
-        "   Acuático, Agricultura y ganadería, Ajedrez, Alimentos, Arquitectura, Arte y diseño, Artes marciales y peleas, Automotores, "
-        "Básquet, Bibliotecología, Ciclismo, Ciencias históricas y sociales, Ciencias naturales y exactas, Comercio, Comunicación, "
-        "Cosmética y tratamientos estéticos, Cultura, Danza, Deporte y ocio, Derecho, Diseño de indumentaria y moda, Ecología y medio ambiente, "
-        "Economía, Educación, Energía, Entretenimiento, parques y atracciones, Farmacia, Fisicoculturismo, Fútbol, Gastronomía, Geografia, "
-        "Gobierno/Sindical, Golf, Handball, Hockey, Industria/Industrial, Lingüística, Literatura, Logística, Management y negocios, "
-        "Maratón, Matemática y estadística, Medicina, Multideportes, Multisectorial, Ns/Nc, Odontología, Otro, Packaging y regalería, "
-        "Polo, Psicología, Religión, Rugby, Seguridad, Seguros, Servicios, Sóftbol, Tecnología, Tenis, paddel o paleta, Tiro con arco y flecha, "
-        "Transporte, Turismo y hotelería, Veterinaria, Vóley.\n\n"
+        f"   {OPCIONES_TEMA}.\n\n"
         "5. fechaEdicion: Extrae la fecha de edición del artículo (generalmente al inicio del texto) y conviértela al formato AAAA-MM-DD.\n\n"
         "6. fechaInicio y fechaFinalizacion: Extrae de forma precisa las fechas en las que se realizará (o se realizó) el evento. En el artículo suele indicarse un rango, por ejemplo 'del 10 al 12 de julio'. Primero, fija el año en 2025 (es decir, si no se indica, siempre utiliza '2025') y devuelve ese valor en un campo llamado 'añoRaw'. Segundo, extrae el mes tal como aparece en la página (por ejemplo, 'julio') y devuélvelo en un campo 'mesLiteralRaw' sin modificarlo. Luego, extrae el día de inicio y el día final del rango, y devuelve estos valores en los campos 'diaInicioRaw' y 'diaFinalRaw', respectivamente. Con esa información, construye la fecha completa en formato AAAA-MM-DD para 'fechaInicio' y 'fechaFinalizacion'. Además, incluye un campo 'fechaRaw' que contenga la interpretación en crudo de la(s) fecha(s) tal como aparecen en la página. Ten en cuenta que los verbos pueden estar en presente o en pasado.\n\n"
         "7. Localidad: Extrae el nombre de la sede del evento (por ejemplo, 'Sede San Rafael', 'Instituto X', etc.) de forma precisa, "
@@ -98,87 +181,346 @@ def extraer_datos_evento(contenido_web):
         "CONGRESOS Y CONVENCIONES: Asamblea, Conferencia, Congreso, Convención, Encuentro, Foro, Jornada, Seminario, Simposio \n"
         "FERIAS Y EXPOSICIONES: Exposición, Feria, Workshop \n"
         "FUERA DEL ALCANCE DEL OETR: Evento Deportivo Internacional, Incentivo, Evento Cultural, Evento Deportivo Nacional, Otro tipo de evento"
+        f"{instrucciones_combinadas}"
         "Devuélveme únicamente la información en formato JSON, sin etiquetas ni formateos adicionales."
     )
 
+
+def extraer_datos_evento(contenido_web):
+    if not contenido_web:
+        return None
+
+    contenido_web = ajustar_a_modelo(contenido_web, MODELO_EXTRACCION, construir_prompt_evento(""))
+    prompt = construir_prompt_evento(contenido_web)
+
     try:
-        response = client.chat.completions.create(
+        respuesta = router_extraccion.completar(
             messages=[
                 {
                     "role": "user",
                     "content": prompt
                 }
             ],
-            model="gemma2-9b-it"
+            version_prompt=VERSION_PROMPT_EVENTO,
+            contenido=contenido_web,
+            validar=validador_respuesta(ESQUEMA_EVENTO)
         )
-        print(response.choices[0].message.content)
-        return response.choices[0].message.content
-    except RateLimitError:
-        raise
-    except exceptions.ResourceExhausted:
+        print(respuesta)
+        return respuesta
+    except SinModelosDisponibles:
         raise
     except Exception as e:
         print(f"Error al generar contenido con el modelo: {e}")
         return None
 
 
-def guardar_eventos(df, session):
-    print("\n--- Intentando insertar datos en la base de datos MySQL ---")
+def extraer_datos_evento_combinado(contenido_web):
+    """
+    Extrae en una sola llamada al LLM los datos del evento junto con la sede principal y la
+    entidad organizadora (campos ``sedePrincipal`` y ``organizador``), validando la respuesta
+    contra ``ESQUEMA_COMBINADO``. Si la respuesta no es un JSON válido o le faltan campos del
+    evento, recurre a ``extraer_datos_evento``; si sólo faltan la sede o el organizador, éstos
+    se resuelven después con las consultas separadas de ``corregir_sedes`` y
+    ``asignar_entidades_organizadoras``.
+    """
+    if not contenido_web:
+        return None
+
+    contenido_web = ajustar_a_modelo(
+        contenido_web, MODELO_EXTRACCION, construir_prompt_evento("", combinado=True))
+    prompt = construir_prompt_evento(contenido_web, combinado=True)
+
+    try:
+        contenido = router_extraccion.completar(
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            version_prompt=VERSION_PROMPT_COMBINADO,
+            contenido=contenido_web,
+            validar=validador_respuesta(ESQUEMA_COMBINADO),
+            response_format={"type": "json_object"}
+        )
+    except SinModelosDisponibles:
+        raise
+    except Exception as e:
+        print(f"Error al generar contenido con el modelo: {e}")
+        return extraer_datos_evento(contenido_web)
+
+    try:
+        datos = json.loads(limpiar_raw_response(contenido or ""))
+    except json.JSONDecodeError as e:
+        print(f"La respuesta combinada no es un JSON válido ({e}). Usando la extracción separada.")
+        return extraer_datos_evento(contenido_web)
+
+    errores = validar_datos_evento(datos, ESQUEMA_COMBINADO)
+    if errores:
+        print(f"La respuesta combinada no cumple el esquema: {errores}. Usando la extracción separada.")
+        return extraer_datos_evento(contenido_web)
+
+    print(contenido)
+    return json.dumps(datos, ensure_ascii=False)
+
+
+def completar_campos_evento(contenido_web, datos, campos):
+    """
+    Pide al LLM sólo ``campos`` de un evento del que ya se conocen ``datos``. Devuelve un
+    diccionario con los campos obtenidos (vacío si la respuesta no se pudo interpretar).
+    """
+    def armar_prompt(contenido):
+        return (
+            "Se trata de un evento en el ámbito de turismo de reuniones, congresos y convenciones.\n"
+            f"Ya se conocen estos datos del evento: {json.dumps(datos, ensure_ascii=False)}\n\n"
+            f"Analiza el siguiente contenido de página web:\n\n{contenido}\n\n"
+            "Devuelve únicamente un objeto JSON (sin envoltura Markdown) con los siguientes campos. "
+            "Si algún dato no aparece, devuelve null en ese campo.\n"
+            + "\n".join(f"- {INSTRUCCIONES_CAMPOS[campo]}" for campo in campos)
+        )
+
+    prompt = armar_prompt(ajustar_a_modelo(contenido_web, MODELO_EXTRACCION, armar_prompt("")))
+
+    try:
+        contenido = router_extraccion.completar(
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            version_prompt=VERSION_PROMPT_CAMPOS,
+            # El prompt incluye los datos ya conocidos y los campos pedidos
+            contenido=prompt,
+            validar=validador_respuesta(),
+            response_format={"type": "json_object"}
+        )
+        respuesta = json.loads(limpiar_raw_response(contenido or ""))
+    except SinModelosDisponibles:
+        raise
+    except Exception as e:
+        print(f"Error al completar los campos {campos} con el modelo: {e}")
+        return {}
+
+    if not isinstance(respuesta, dict):
+        return {}
+    return {campo: respuesta[campo] for campo in campos if isinstance(respuesta.get(campo), str)}
+
+
+def extraer_datos_evento_pagina(pagina, contenido_web):
+    """
+    Extrae los datos del evento de una página descargada (diccionario con ``html`` y ``texto``).
+    Si la página declara el evento con datos estructurados (JSON-LD, microdata u OpenGraph), el
+    nombre, las fechas, la sede y el organizador se toman de ahí y al LLM sólo se le piden los
+    campos que falten, con un prompt mucho más corto. Si no, usa ``extraer_datos_evento_combinado``.
+    Devuelve el JSON como string, igual que las extracciones con LLM, o
+    ``NO_HAY_MODELOS_DISPONIBLES`` si hacía falta el LLM y todos los modelos están agotados.
+    """
+    datos = extraer_datos_estructurados(pagina.get("html")) if pagina else None
+    if not datos:
+        try:
+            return extraer_datos_evento_combinado(contenido_web)
+        except SinModelosDisponibles:
+            return NO_HAY_MODELOS_DISPONIBLES
+
+    faltantes = [campo for campo in INSTRUCCIONES_CAMPOS if not datos.get(campo)]
+    print(f"Evento declarado con datos estructurados. Campos pedidos al LLM: {faltantes or 'ninguno'}")
+    if faltantes and contenido_web:
+        try:
+            datos.update(completar_campos_evento(contenido_web, datos, faltantes))
+        except SinModelosDisponibles:
+            # Los datos estructurados alcanzan para el evento: los campos faltantes quedan vacíos
+            print("No hay modelos disponibles para completar los campos faltantes.")
+
+    if datos.get("tipoEvento") and not datos.get("agrupacion"):
+        datos["agrupacion"] = AGRUPACIONES[mapear_tipo_evento(datos["tipoEvento"])]
+    if datos.get("sedePrincipal") and not datos.get("sedeRaw"):
+        datos["sedeRaw"] = datos["sedePrincipal"]
+        datos["Localidad"] = datos["sedePrincipal"]
+
+    return json.dumps(datos, ensure_ascii=False)
+
+
+# Columnas del DataFrame de eventos -> columnas de la tabla evento
+COLUMNAS_EVENTO = {
+    'nombre': 'nombre',
+    'tipo': 'tipo',
+    'agrupacion': 'agrupacion',
+    'detalle_tipo_rotacion': 'detalle_tipo_rotacion',
+    'tema': 'tema',
+    'fecha_edicion': 'fecha_edicion',
+    'fecha_inicio': 'fecha_inicio',
+    'fecha_fin': 'fecha_fin',
+    'anio': 'anio',
+    'mes': 'mes',
+    'dia_inicio': 'dia_inicio',
+    'dia_fin': 'dia_fin',
+    'fecha_texto': 'fecha_texto',
+    'sedeRaw': 'sede',
+    'sitio_web': 'sitio_web',
+    'entidadOrganizadora': 'entidad_organizadora',
+    'requiereRevision': 'requiere_revision',
+    'fuentesAdicionales': 'fuentes_adicionales',
+}
+# procesar_respuesta genera la URL como 'sitioWeb'
+ALIAS_COLUMNAS = {'sitio_web': 'sitioWeb'}
+COLUMNAS_FECHA = ['fecha_edicion', 'fecha_inicio', 'fecha_fin']
+TAMANIO_LOTE = 500
+# Columnas agregadas al modelo después de creada la tabla: nombre -> definición SQL
+COLUMNAS_NUEVAS = {'fuentes_adicionales': 'TEXT NULL'}
+
+
+def calcular_clave_natural(sitio_web, nombre, fecha_inicio):
+    """
+    Clave natural de un evento (sitio web + nombre + fecha de inicio) como SHA-256 hex.
+    Debe coincidir con la expresión SQL usada en ``asegurar_clave_natural``.
+    """
+    fecha = fecha_inicio.isoformat() if fecha_inicio is not None else ""
+    return hashlib.sha256(f"{sitio_web}\x1f{nombre}\x1f{fecha}".encode("utf-8")).hexdigest()
+
+
+def asegurar_clave_natural(engine):
+    """
+    Agrega la columna ``clave_natural`` (y su índice único) a una tabla ``evento`` creada antes de
+    que existiera, calculándola para las filas ya cargadas. En MySQL, las filas que colisionan
+    con otra (duplicados históricos) quedan con la clave en NULL.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table("evento"):
+        return
+    if "clave_natural" in {c["name"] for c in inspector.get_columns("evento")}:
+        return
+
+    print("Agregando la columna clave_natural a la tabla evento...")
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE evento ADD COLUMN clave_natural VARCHAR(64) NULL"))
+        conn.execute(text("CREATE UNIQUE INDEX ux_evento_clave_natural ON evento (clave_natural)"))
+        if engine.dialect.name == "mysql":
+            conn.execute(text(
+                "UPDATE IGNORE evento SET clave_natural = "
+                "SHA2(CONCAT_WS(CHAR(31), sitio_web, nombre, COALESCE(fecha_inicio, '')), 256)"
+            ))
+
+
+def asegurar_columnas(engine):
+    """Agrega a una tabla ``evento`` ya existente las columnas nuevas del modelo que le falten."""
+    inspector = inspect(engine)
+    if not inspector.has_table("evento"):
+        return
+    existentes = {c["name"] for c in inspector.get_columns("evento")}
+    with engine.begin() as conn:
+        for columna, definicion in COLUMNAS_NUEVAS.items():
+            if columna not in existentes:
+                print(f"Agregando la columna {columna} a la tabla evento...")
+                conn.execute(text(f"ALTER TABLE evento ADD COLUMN {columna} {definicion}"))
+
+
+def _preparar_registros(df):
+    """
+    Convierte el DataFrame de eventos en registros listos para la tabla: renombra columnas,
+    convierte las fechas de una vez por columna, completa los valores por defecto del modelo
+    y calcula la clave natural. Devuelve los registros y la cantidad de filas descartadas.
+    """
+    datos = pd.DataFrame(index=df.index)
+    for columna_df, columna_db in COLUMNAS_EVENTO.items():
+        if columna_df not in df.columns:
+            columna_df = ALIAS_COLUMNAS.get(columna_df, columna_df)
+        datos[columna_db] = df[columna_df] if columna_df in df.columns else None
+
+    for columna in COLUMNAS_FECHA:
+        fechas = pd.to_datetime(datos[columna], errors='coerce')
+        datos[columna] = fechas.dt.date.astype(object).where(fechas.notna(), None)
+
+    validos = datos['nombre'].notna() & datos['sitio_web'].notna() & (datos['sitio_web'] != 'Desconocido')
+    descartados = int((~validos).sum())
+    datos = datos[validos]
+
+    # Las columnas NOT NULL con valor por defecto en el modelo: un NULL explícito en un
+    # INSERT masivo no dispara el default del ORM, así que se completa acá
+    for columna in Evento.__table__.columns:
+        if columna.name in datos.columns and columna.default is not None and not columna.nullable:
+            datos[columna.name] = datos[columna.name].where(
+                datos[columna.name].notna(), columna.default.arg)
+    datos = datos.astype(object).where(datos.notna(), None)
+
+    datos['clave_natural'] = [
+        calcular_clave_natural(sitio, nombre, fecha)
+        for sitio, nombre, fecha in zip(datos['sitio_web'], datos['nombre'], datos['fecha_inicio'])
+    ]
+    repetidos = datos.duplicated(subset=['clave_natural'], keep='last')
+    descartados += int(repetidos.sum())
+    datos = datos[~repetidos]
+
+    return datos.to_dict(orient='records'), descartados
+
+
+def _sentencia_upsert(dialecto, registros):
+    """INSERT masivo que actualiza la fila existente cuando la clave natural ya está cargada."""
+    columnas_actualizables = [c for c in registros[0] if c != 'clave_natural']
+    if dialecto == "mysql":
+        stmt = mysql_insert(Evento).values(registros)
+        return stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in columnas_actualizables})
+    stmt = sqlite_insert(Evento).values(registros)
+    return stmt.on_conflict_do_update(
+        index_elements=['clave_natural'],
+        set_={c: stmt.excluded[c] for c in columnas_actualizables}
+    )
+
+
+def guardar_eventos(df, session, tamanio_lote=TAMANIO_LOTE):
+    """
+    Carga masiva e idempotente de eventos. Inserta en lotes con ``INSERT ... ON DUPLICATE KEY
+    UPDATE`` sobre la clave natural (sitio web + nombre + fecha de inicio), de modo que volver a
+    correr el pipeline actualiza los eventos existentes en lugar de duplicarlos.
+
+    Devuelve un diccionario con la cantidad de filas insertadas, actualizadas y descartadas
+    (sin nombre o sitio web, o repetidas dentro del mismo DataFrame), más los sitios web de los
+    lotes confirmados (``cargados``) y de los que fallaron y se revirtieron (``fallidos``), para
+    que sólo los primeros se den por cargados y los otros se reintenten.
+    """
+    print("\n--- Intentando insertar datos en la base de datos ---")
+    resultado = {"insertados": 0, "actualizados": 0, "descartados": 0, "cargados": set(), "fallidos": set()}
     if df.empty:
         print("El DataFrame está vacío. No hay datos para insertar.")
-        return
+        return resultado
 
-    rows_inserted = 0
-    for index, row in df.iterrows():
-        try:
-            evento_data = {
-                'nombre': row.get('nombre'),
-                'tipo': row.get('tipo'),
-                'agrupacion': row.get('agrupacion'),
-                'detalle_tipo_rotacion': row.get('detalle_tipo_rotacion'),
-                'tema': row.get('tema'),
-                'fecha_edicion': pd.to_datetime(row.get('fecha_edicion'), errors='coerce'),
-                'fecha_inicio': pd.to_datetime(row.get('fecha_inicio'), errors='coerce'),
-                'fecha_fin': pd.to_datetime(row.get('fecha_fin'), errors='coerce'),
-                'anio': row.get('anio'),
-                'mes': row.get('mes'),
-                'dia_inicio': row.get('dia_inicio'),
-                'dia_fin': row.get('dia_fin'),
-                'fecha_texto': row.get('fecha_texto'),
-                'sede': row.get('sedeRaw'),
-                'sitio_web': row.get('sitio_web'),
-                'entidad_organizadora': row.get('entidadOrganizadora'),
-                'requiere_revision': row.get('requiereRevision')
-            }
-            evento = Evento(**evento_data)
-            session.add(evento)
-            rows_inserted += 1
+    registros, resultado["descartados"] = _preparar_registros(df)
+    dialecto = session.get_bind().dialect.name
 
+    for inicio in range(0, len(registros), tamanio_lote):
+        lote = registros[inicio:inicio + tamanio_lote]
+        claves = [r['clave_natural'] for r in lote]
+        try:
+            existentes = set(session.execute(
+                select(Evento.clave_natural).where(Evento.clave_natural.in_(claves))
+            ).scalars())
+            session.execute(_sentencia_upsert(dialecto, lote))
+            session.commit()
         except SQLAlchemyError as e:
             session.rollback()
-            print(f"Error al procesar registro {index} para DB: {e}. Revirtiendo...")
-            continue
-        except Exception as e:
-            print(f"Error inesperado al procesar registro {index}: {e}")
+            print(f"Error al cargar el lote {inicio}-{inicio + len(lote)}: {e}. Revirtiendo...")
+            resultado["descartados"] += len(lote)
+            resultado["fallidos"].update(r['sitio_web'] for r in lote)
             continue
-    
-    try:
-        session.commit()
-        print(f"\n¡Inserción completada! Se insertaron un total de {rows_inserted} registros.")
-    except SQLAlchemyError as e:
-        session.rollback()
-        print(f"Error final al comitear: {e}. Revirtiendo...")
+
+        resultado["cargados"].update(r['sitio_web'] for r in lote)
+        resultado["actualizados"] += len(existentes)
+        resultado["insertados"] += len(lote) - len(existentes)
+
+    print(
+        f"\n¡Carga completada! Insertados: {resultado['insertados']}, "
+        f"actualizados: {resultado['actualizados']}, descartados: {resultado['descartados']}."
+    )
+    return resultado
 
 
 def procesar_eventos_de_links():
-    try:
-        df_links = pd.read_csv("./data/links_eventos_revisados.csv", sep=";")
-    except FileNotFoundError:
-        print("Error: No se encontró el archivo 'links_eventos_revisados.csv'. Ejecute revisar_links.py primero.")
+    df_links = almacen.leer(almacen.LINKS_REVISADOS, columnas=["link"])
+    if df_links.empty:
+        print("Error: No hay links revisados. Ejecute revisar_links.py primero.")
         return
 
     eventos_procesados = []
-    output_filename = f"./data/eventos_procesados_{time.strftime('%Y%m%d_%H%M%S')}.csv"
 
     try:
         for index, row in df_links.iterrows():
@@ -201,14 +543,14 @@ def procesar_eventos_de_links():
                     print(f"Respuesta recibida: {datos_evento_str}")
                     continue
     
-    except (RateLimitError, exceptions.ResourceExhausted):
+    except (RateLimitError, exceptions.ResourceExhausted, SinModelosDisponibles):
         print("Límite de API alcanzado. Guardando los eventos procesados hasta ahora.")
     
     finally:
         if eventos_procesados:
             df_eventos = pd.DataFrame(eventos_procesados)
-            df_eventos.to_csv(output_filename, sep=";", index=False)
-            print(f"✅ Se guardaron {len(eventos_procesados)} eventos en {output_filename}")
+            almacen.agregar(almacen.EVENTOS_PROCESADOS, df_eventos)
+            print(f"✅ Se guardaron {len(eventos_procesados)} eventos en el dataset '{almacen.EVENTOS_PROCESADOS}'")
             
             column_mapping = {
                 'nombreEvento': 'nombre', 'tipoEvento': 'tipo', 'detalleTipoRotacion': 'detalle_tipo_rotacion',
@@ -227,35 +569,36 @@ def procesar_eventos_de_links():
         else:
             print("No se procesaron eventos.")
 
-df_eventos = pd.read_csv("./data/links_eventos_revisados.csv", sep=";", low_memory=False)
-rows = []
-
-for _, row in df_eventos.iterrows():
-    try:
-        contenido_web = extraer_contenido_web(row['link'])
-        evento_clasificado = extraer_datos_evento(contenido_web)  # puede ser str JSON o dict
+if __name__ == '__main__':
+    # Al importarse desde main.py este bloque no debe ejecutarse: descargaría y
+    # clasificaría todos los links revisados por segunda vez.
+    df_eventos = almacen.leer(almacen.LINKS_REVISADOS, columnas=["link"])
+    rows = []
 
-        data = json.loads(evento_clasificado) if isinstance(evento_clasificado, str) else evento_clasificado
-        if not data:
-            continue
+    for _, row in df_eventos.iterrows():
+        try:
+            contenido_web = extraer_contenido_web(row['link'])
+            evento_clasificado = extraer_datos_evento(contenido_web)  # puede ser str JSON o dict
 
-        # data puede ser dict (una fila) o list[dict] (varias filas)
-        if isinstance(data, dict):
-            rows.append(data)
-        elif isinstance(data, list):
-            rows.extend(data)
-        else:
-            print("Formato no esperado:", type(data))
-            continue
+            data = json.loads(evento_clasificado) if isinstance(evento_clasificado, str) else evento_clasificado
+            if not data:
+                continue
 
-    except json.JSONDecodeError as e:
-        print("JSON inválido:", e)
-        continue
-    except Exception as e:
-        print("Error procesando link:", e)
-        continue
+            # data puede ser dict (una fila) o list[dict] (varias filas)
+            if isinstance(data, dict):
+                rows.append(data)
+            elif isinstance(data, list):
+                rows.extend(data)
+            else:
+                print("Formato no esperado:", type(data))
+                continue
 
-df_clasificados = pd.json_normalize(rows) if rows else pd.DataFrame()
-df_clasificados.to_csv("./data/eventos_clasificados.csv", sep=";", index=False)
+        except json.JSONDecodeError as e:
+            print("JSON inválido:", e)
+            continue
+        except Exception as e:
+            print("Error procesando link:", e)
+            continue
 
-    
+    df_clasificados = pd.json_normalize(rows) if rows else pd.DataFrame()
+    df_clasificados.to_csv("./data/eventos_clasificados.csv", sep=";", index=False)
@@ -1,13 +1,17 @@
 import pandas as pd
-from fuzzywuzzy import process
-import requests
-from bs4 import BeautifulSoup
-from groq import RateLimitError
+from scripts.router_llm import SinModelosDisponibles
+from scripts.cache_paginas import extraer_contenido_web
+from scripts.indice_sedes import obtener_indice_sedes
+from scripts import almacen
 
-def corregir_sedes(df_eventos, df_sedes, llm_client, model_name="gemma2-9b-it"):
+VERSION_PROMPT_SEDE = "sede-v1"
+
+def corregir_sedes(df_eventos, df_sedes, llm_client, guardar=True):
     """
     Extrae la sede principal desde el sitio del evento usando LLM y valida con fuzzy
-    contra el catálogo oficial de sedes (df_sedes["Nombre"]).
+    contra el catálogo oficial de sedes (df_sedes["Nombre"]; también acepta un SedeIndex ya
+    construido). Si df_eventos ya trae la columna sedeOriginalLLM (extracción combinada), sólo
+    se hace el fuzzy matching. ``llm_client`` es el ``RouterLLM`` con la cadena de modelos.
 
     Columnas generadas en df_eventos:
       - sedeOriginalLLM: salida literal del LLM
@@ -16,7 +20,7 @@ def corregir_sedes(df_eventos, df_sedes, llm_client, model_name="gemma2-9b-it"):
       - sedeRequiereRevision: 'Sí' si no hubo match confiable o error
     """
 
-    sedes_oficiales = df_sedes["Nombre"].dropna().unique().tolist()
+    indice_sedes = obtener_indice_sedes(df_sedes)
 
     prompt_base = (
         "Esta página trata sobre un evento. Extraé el nombre de la sede o locación "
@@ -31,33 +35,23 @@ def corregir_sedes(df_eventos, df_sedes, llm_client, model_name="gemma2-9b-it"):
             if not url or not isinstance(url, str):
                 raise ValueError("URL inválida")
 
-            # 1) Descargar y limpiar HTML
-            resp = requests.get(url, timeout=10)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, "html.parser")
-            for tag in soup(["script", "style"]):
-                tag.decompose()
-
-            text_content = soup.get_text()
-            # Limitar a primeras 1000 líneas para evitar ruido
-            lines = (line.strip() for line_cnt, line in enumerate(text_content.splitlines()) if line_cnt < 1000)
-            chunks = (phrase.strip() for phrase in " ".join(lines).split("  "))
-            cleaned_text = "\n".join(chunk for chunk in chunks if chunk)
-
-            # Truncar duro por seguridad
-            max_chars = 15000
-            if len(cleaned_text) > max_chars:
-                cleaned_text = cleaned_text[:max_chars] + "\n... [Contenido truncado]"
+            # 1) Si la extracción combinada ya trajo la sede, no se vuelve a consultar al LLM
+            sede_raw = row.get("sedeOriginalLLM")
+            if not isinstance(sede_raw, str) or not sede_raw or sede_raw == "ERROR":
+                # Obtener el texto limpio desde el caché compartido de páginas
+                cleaned_text = extraer_contenido_web(url, llm_client.modelo_principal, prompt_base)
+                if cleaned_text is None:
+                    raise ValueError("No se pudo obtener el contenido de la página")
 
-            # 2) LLM: extraer sede principal literal
-            llm_response = llm_client.chat.completions.create(
-                model=model_name,
-                messages=[{"role": "user", "content": prompt_base + cleaned_text}]
-            )
-            sede_raw = llm_response.choices[0].message.content.strip()
+                # 2) LLM: extraer sede principal literal
+                sede_raw = llm_client.completar(
+                    messages=[{"role": "user", "content": prompt_base + cleaned_text}],
+                    version_prompt=VERSION_PROMPT_SEDE,
+                    contenido=cleaned_text
+                ).strip()
 
-            # 3) Fuzzy matching contra catálogo oficial
-            mejor_match, score = process.extractOne(sede_raw, sedes_oficiales)
+            # 3) Fuzzy matching contra catálogo oficial (indexado)
+            mejor_match, score = indice_sedes.buscar(sede_raw)
 
             if score >= 90:
                 sede_final = mejor_match
@@ -74,8 +68,8 @@ def corregir_sedes(df_eventos, df_sedes, llm_client, model_name="gemma2-9b-it"):
 
             print(f"✔ [{index}] '{sede_raw}' → '{sede_final}' (score: {score})")
 
-        except RateLimitError:
-            print(f"Límite de API alcanzado en el índice {index}. Deteniendo el procesamiento.")
+        except SinModelosDisponibles:
+            print(f"Ningún modelo disponible en el índice {index}. Deteniendo el procesamiento.")
             break
 
         except Exception as e:
@@ -85,6 +79,7 @@ def corregir_sedes(df_eventos, df_sedes, llm_client, model_name="gemma2-9b-it"):
             df_eventos.at[index, "sedeMatchScore"] = 0
             df_eventos.at[index, "sedeRequiereRevision"] = "Sí"
 
-    # 5) Guardar CSV final
-    df_eventos.to_csv("./data/eventos_corregidos_sedes.csv", sep=";", index=False)
+    # 5) Guardar el resultado (el pipeline en streaming procesa de a un evento y no lo necesita)
+    if guardar:
+        almacen.agregar(almacen.EVENTOS_CORREGIDOS_SEDES, df_eventos)
     return df_eventos
@@ -0,0 +1,201 @@
+import asyncio
+import queue
+import threading
+import time
+from urllib.parse import urlsplit
+import httpx
+from scripts.cache_paginas import obtener_cache
+from scripts.metricas import metricas
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+# Cantidad máxima de descargas simultáneas en todo el crawler
+MAX_CONCURRENCIA = 32
+# Cantidad máxima de descargas simultáneas contra un mismo dominio
+MAX_POR_HOST = 2
+# Segundos mínimos entre el inicio de dos descargas al mismo dominio
+DEMORA_POR_HOST = 1.0
+# Demoras específicas para dominios que necesitan más cortesía que el valor por defecto
+DEMORAS_HOST = {}
+TIMEOUT = 10.0
+# Tamaño de la cola que comunica el crawler con la etapa siguiente
+TAMANIO_COLA = 64
+
+
+def _host(url):
+    return urlsplit(url).netloc.lower()
+
+
+class _PorHost(dict):
+    """Diccionario que crea bajo demanda el recurso de sincronización de cada dominio."""
+
+    def __init__(self, fabrica):
+        super().__init__()
+        self.fabrica = fabrica
+
+    def __missing__(self, host):
+        valor = self[host] = self.fabrica()
+        return valor
+
+
+class Crawler:
+    """
+    Descarga páginas en paralelo con un único ``httpx.AsyncClient`` compartido, respetando un
+    límite global de concurrencia y, por dominio, un límite de conexiones y una demora mínima
+    entre pedidos. Cada página se escribe en el caché compartido (``cache_paginas``), de modo
+    que las etapas siguientes la leen sin volver a descargarla.
+    """
+
+    def __init__(self, max_concurrencia=MAX_CONCURRENCIA, max_por_host=MAX_POR_HOST,
+                 demora_por_host=DEMORA_POR_HOST, demoras_host=None, timeout=TIMEOUT):
+        self.max_concurrencia = max_concurrencia
+        self.max_por_host = max_por_host
+        self.demora_por_host = demora_por_host
+        self.demoras_host = demoras_host if demoras_host is not None else DEMORAS_HOST
+        self.timeout = timeout
+        self.cache = obtener_cache()
+
+    def _demora(self, host):
+        return self.demoras_host.get(host, self.demora_por_host)
+
+    async def _esperar_turno(self, host):
+        """Respeta la demora mínima entre pedidos consecutivos al mismo dominio."""
+        async with self._locks_host[host]:
+            ahora = time.monotonic()
+            espera = self._proximo_turno.get(host, 0) - ahora
+            self._proximo_turno[host] = max(ahora, self._proximo_turno.get(host, 0)) + self._demora(host)
+        if espera > 0:
+            metricas.incrementar("espera_cortesia_segundos", espera)
+            await asyncio.sleep(espera)
+
+    async def _descargar(self, client, url):
+        pagina, headers = self.cache.consultar(url)
+        if pagina is not None:
+            return pagina
+
+        host = _host(url)
+        # Primero el turno del dominio y después el cupo global, para no ocupar cupos
+        # globales esperando a un dominio lento: el cupo global sólo se toma para el request
+        async with self._por_host[host]:
+            await self._esperar_turno(host)
+            async with self._global:
+                try:
+                    inicio = time.perf_counter()
+                    try:
+                        response = await client.get(url, headers=headers)
+                    finally:
+                        metricas.registrar_duracion("descarga", time.perf_counter() - inicio, origen="crawler")
+                    metricas.incrementar("http_respuestas", dominio=host, estado=response.status_code)
+                    if response.status_code == 304 and headers:
+                        return self.cache.revalidar(url)
+                    response.raise_for_status()
+                except httpx.HTTPError as e:
+                    if not isinstance(e, httpx.HTTPStatusError):
+                        metricas.incrementar("http_respuestas", dominio=host, estado=type(e).__name__)
+                    print(f"Error al acceder a la URL {url}: {e}")
+                    return None
+
+        # El parseo es trabajo de CPU: se hace fuera del event loop para no frenar las descargas
+        return await asyncio.to_thread(
+            self.cache.guardar, url, response.text,
+            response.headers.get("ETag"), response.headers.get("Last-Modified")
+        )
+
+    async def rastrear(self, urls):
+        """
+        Generador asíncrono que descarga ``urls`` concurrentemente y entrega tuplas
+        ``(url, pagina)`` a medida que cada descarga termina. ``pagina`` es None si falló.
+        """
+        self._global = asyncio.Semaphore(self.max_concurrencia)
+        self._por_host = _PorHost(lambda: asyncio.Semaphore(self.max_por_host))
+        self._locks_host = _PorHost(asyncio.Lock)
+        self._proximo_turno = {}
+
+        urls = list(dict.fromkeys(u for u in urls if isinstance(u, str) and u))
+        limites = httpx.Limits(
+            max_connections=self.max_concurrencia,
+            max_keepalive_connections=self.max_concurrencia
+        )
+        async with httpx.AsyncClient(timeout=self.timeout, follow_redirects=True, limits=limites) as client:
+            async def tarea(url):
+                try:
+                    return url, await self._descargar(client, url)
+                except Exception as e:
+                    print(f"Error al procesar el contenido de {url}: {e}")
+                    return url, None
+
+            # Ventana deslizante de tareas: sólo se lanzan unas pocas descargas por delante del
+            # consumidor, así la memoria no crece con el largo de la lista de URLs
+            pendientes = iter(urls)
+            activas = set()
+
+            def lanzar():
+                while len(activas) < self.max_concurrencia * 4:
+                    url = next(pendientes, None)
+                    if url is None:
+                        return
+                    activas.add(asyncio.create_task(tarea(url)))
+
+            lanzar()
+            try:
+                while activas:
+                    terminadas, activas = await asyncio.wait(activas, return_when=asyncio.FIRST_COMPLETED)
+                    lanzar()
+                    for terminada in terminadas:
+                        yield terminada.result()
+            finally:
+                for t in activas:
+                    t.cancel()
+
+
+def iterar_paginas(urls, crawler=None, tamanio_cola=TAMANIO_COLA):
+    """
+    Versión sincrónica de ``Crawler.rastrear``: corre el crawler en un hilo aparte y entrega
+    ``(url, pagina)`` a medida que llegan, para que la etapa siguiente empiece a trabajar sin
+    esperar a que terminen todas las descargas. La cola es acotada, así que si el consumidor
+    es más lento el crawler se frena en lugar de acumular páginas en memoria.
+    """
+    crawler = crawler or Crawler()
+    cola = queue.Queue(maxsize=tamanio_cola)
+    fin = object()
+    detener = threading.Event()
+
+    async def productor():
+        agen = crawler.rastrear(urls)
+        try:
+            async for item in agen:
+                while not detener.is_set():
+                    try:
+                        cola.put_nowait(item)
+                        break
+                    except queue.Full:
+                        await asyncio.sleep(0.05)
+                if detener.is_set():
+                    break
+        finally:
+            await agen.aclose()
+
+    def correr():
+        try:
+            asyncio.run(productor())
+        except Exception as e:
+            print(f"Error en el crawler: {e}")
+        finally:
+            cola.put(fin)
+
+    hilo = threading.Thread(target=correr, daemon=True)
+    hilo.start()
+    try:
+        while True:
+            item = cola.get()
+            if item is fin:
+                break
+            yield item
+    finally:
+        detener.set()
+        # Vaciar la cola para que el productor pueda terminar si estaba bloqueado
+        while hilo.is_alive():
+            try:
+                cola.get(timeout=0.1)
+            except queue.Empty:
+                pass
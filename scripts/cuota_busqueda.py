@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from scripts.metricas import metricas
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+DATA_DIR = "./data"
+CUOTA_PATH = os.path.join(DATA_DIR, "cuota_busqueda.json")
+
+# Queries gratuitas por día de cada credencial de Custom Search
+CUOTA_DIARIA = 100
+# Límite por minuto de la API: las queries de una misma credencial se espacian para no pasarlo
+QUERIES_POR_MINUTO = 90
+# La cuota diaria de Google se reinicia a la medianoche del Pacífico
+ZONA_CUOTA = ZoneInfo("America/Los_Angeles")
+
+
+def dia_de_cuota():
+    return datetime.now(ZONA_CUOTA).date().isoformat()
+
+
+class CuotaCredenciales:
+    """
+    Contabilidad local de la cuota diaria de cada credencial de Custom Search, persistida en
+    ``cuota_busqueda.json`` y reiniciada al cambiar el día de cuota. Cada query reserva una
+    unidad antes de enviarse (así los hilos concurrentes nunca gastan de más) y se elige siempre
+    la credencial con más cuota disponible. Una credencial que respondió 429 por cuota diaria
+    queda marcada como agotada hasta el día siguiente, sin gastar requests en averiguarlo.
+    """
+
+    def __init__(self, credenciales, cuota_diaria=CUOTA_DIARIA, path=CUOTA_PATH,
+                 queries_por_minuto=QUERIES_POR_MINUTO):
+        self.nombres = [c["name"] for c in credenciales]
+        self.cuota_diaria = cuota_diaria
+        self.path = path
+        self.intervalo = 60.0 / queries_por_minuto
+        self._lock = threading.Lock()
+        self._proximo_turno = {nombre: 0.0 for nombre in self.nombres}
+
+        self.dia = dia_de_cuota()
+        self.usadas = {nombre: 0 for nombre in self.nombres}
+        self.agotadas = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                guardado = json.load(f)
+            if guardado.get("dia") == self.dia:
+                self.usadas.update({n: u for n, u in guardado.get("usadas", {}).items() if n in self.usadas})
+                self.agotadas = set(guardado.get("agotadas", [])) & set(self.nombres)
+
+    def _guardar(self):
+        directorio = os.path.dirname(self.path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        temporal = f"{self.path}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"dia": self.dia, "usadas": self.usadas, "agotadas": sorted(self.agotadas)}, f)
+        os.replace(temporal, self.path)
+
+    def _restante(self, nombre):
+        if nombre in self.agotadas:
+            return 0
+        return max(self.cuota_diaria - self.usadas[nombre], 0)
+
+    def restante(self):
+        """Cuota disponible de cada credencial: ``{nombre: queries}``."""
+        with self._lock:
+            return {nombre: self._restante(nombre) for nombre in self.nombres}
+
+    def restante_total(self):
+        return sum(self.restante().values())
+
+    def reservar(self):
+        """
+        Reserva una query en la credencial con más cuota disponible y espera su turno según el
+        límite por minuto. Devuelve el índice de la credencial o None si todas están agotadas.
+        """
+        with self._lock:
+            disponibles = [i for i, nombre in enumerate(self.nombres) if self._restante(nombre) > 0]
+            if not disponibles:
+                return None
+            idx = max(disponibles, key=lambda i: self._restante(self.nombres[i]))
+            nombre = self.nombres[idx]
+            self.usadas[nombre] += 1
+            self._guardar()
+
+            ahora = time.monotonic()
+            turno = max(ahora, self._proximo_turno[nombre])
+            self._proximo_turno[nombre] = turno + self.intervalo
+        if turno > ahora:
+            metricas.incrementar("espera_cuota_busqueda_segundos", turno - ahora)
+            time.sleep(turno - ahora)
+        return idx
+
+    def liberar(self, idx):
+        """Devuelve una reserva de una query que no llegó a consumir cuota."""
+        with self._lock:
+            nombre = self.nombres[idx]
+            self.usadas[nombre] = max(self.usadas[nombre] - 1, 0)
+            self._guardar()
+
+    def agotar(self, idx):
+        """Marca la credencial como agotada hasta el próximo día de cuota."""
+        with self._lock:
+            self.agotadas.add(self.nombres[idx])
+            self._guardar()
@@ -0,0 +1,202 @@
+import html as html_lib
+import re
+from lxml import etree
+from scripts.extraccion_html import parsear_html, eventos_jsonld, opengraph
+from scripts.procesar_eventos import mapear_tipo_evento
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+MESES = [
+    "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto", "septiembre",
+    "octubre", "noviembre", "diciembre"
+]
+
+# Agrupación de cada tipo de evento (la misma tabla que se le da al LLM en el prompt)
+AGRUPACIONES = {
+    **dict.fromkeys(
+        ["Asamblea", "Conferencia", "Congreso", "Convención", "Encuentro", "Foro", "Jornada",
+         "Seminario", "Simposio"], "CONGRESOS Y CONVENCIONES"),
+    **dict.fromkeys(["Exposición", "Feria", "Workshop"], "FERIAS Y EXPOSICIONES"),
+    **dict.fromkeys(
+        ["Evento Deportivo Internacional", "Incentivo", "Evento Cultural", "Evento Deportivo Nacional",
+         "Otro tipo de evento"], "FUERA DEL ALCANCE DEL OETR"),
+}
+
+# Subtipos de schema.org Event que determinan el tipo de evento
+TIPOS_SCHEMA = {
+    "ExhibitionEvent": "Exposición",
+}
+
+# Rotación que se puede afirmar a partir del nombre ('Congreso Internacional de ...')
+ROTACIONES_NOMBRE = [
+    (re.compile(r"\binternacional\b", re.IGNORECASE), "Internacional"),
+    (re.compile(r"\b(nacional|argentin[oa])\b", re.IGNORECASE), "Nacional"),
+    (re.compile(r"\bprovincial\b", re.IGNORECASE), "Provincial"),
+]
+
+_FECHA_ISO = re.compile(r"^(\d{4})-(\d{2})-(\d{2})")
+
+
+# ----- LECTURA DE MICRODATA -----
+
+def _valor_itemprop(elemento):
+    valor = elemento.get("content") or elemento.get("datetime")
+    if valor is None:
+        valor = re.sub(r"\s+", " ", elemento.text_content()).strip()
+    return valor
+
+
+def _item_microdata(raiz):
+    """Convierte un elemento ``itemscope`` en un diccionario con la forma de un objeto JSON-LD."""
+    item = {"@type": raiz.get("itemtype", "").split("/")[-1]}
+    for elemento in raiz.xpath(".//*[@itemprop]"):
+        # Sólo las propiedades que pertenecen a este item, no a uno anidado
+        if elemento.xpath("ancestor::*[@itemscope][1]")[0] is not raiz:
+            continue
+        for nombre in elemento.get("itemprop").split():
+            if nombre in item:
+                continue
+            if elemento.get("itemscope") is not None:
+                item[nombre] = _item_microdata(elemento)
+            else:
+                item[nombre] = _valor_itemprop(elemento)
+    return item
+
+
+def eventos_microdata(arbol):
+    """Eventos schema.org declarados con microdata (``itemtype="https://schema.org/...Event"``)."""
+    return [
+        _item_microdata(elemento)
+        for elemento in arbol.xpath("//*[@itemscope and @itemtype]")
+        if elemento.get("itemtype").rstrip("/").endswith("Event")
+    ]
+
+
+def evento_opengraph(og):
+    """Evento descripto sólo con etiquetas OpenGraph (``og:type=event`` / ``event:start_time``)."""
+    if og.get("og:type") != "event" and "event:start_time" not in og:
+        return None
+    return {
+        "@type": "Event",
+        "name": og.get("og:title"),
+        "startDate": og.get("event:start_time"),
+        "endDate": og.get("event:end_time"),
+    }
+
+
+# ----- NORMALIZACIÓN AL FORMATO DE LA RESPUESTA DEL LLM -----
+
+def _texto(valor):
+    if isinstance(valor, list):
+        valor = valor[0] if valor else None
+    if isinstance(valor, dict):
+        valor = valor.get("name")
+    if not isinstance(valor, str):
+        return None
+    valor = html_lib.unescape(valor).strip()
+    return valor or None
+
+
+def _fecha(valor):
+    """(fecha 'AAAA-MM-DD', año, mes, día) de una fecha ISO 8601, o None."""
+    coincidencia = _FECHA_ISO.match(_texto(valor) or "")
+    if not coincidencia:
+        return None
+    anio, mes, dia = (int(g) for g in coincidencia.groups())
+    if not 1 <= mes <= 12 or not 1 <= dia <= 31:
+        return None
+    return coincidencia.group(0), anio, mes, dia
+
+
+def _direccion(lugar):
+    if isinstance(lugar, list):
+        lugar = lugar[0] if lugar else None
+    if not isinstance(lugar, dict):
+        return None
+    direccion = lugar.get("address")
+    if isinstance(direccion, dict):
+        partes = [direccion.get(c) for c in ("streetAddress", "addressLocality", "addressRegion")]
+        direccion = ", ".join(p.strip() for p in partes if isinstance(p, str) and p.strip())
+    return _texto(direccion)
+
+
+def normalizar_evento(evento, og=None):
+    """
+    Traduce un objeto schema.org ``Event`` a los campos de la respuesta del LLM que usa
+    ``procesar_respuesta``. Sólo completa los campos que se pueden deducir con certeza; el resto
+    queda afuera para que lo complete el LLM. Devuelve None si no hay nombre y fecha de inicio.
+    """
+    og = og or {}
+    nombre = _texto(evento.get("name"))
+    inicio = _fecha(evento.get("startDate"))
+    if not nombre or not inicio:
+        return None
+    fin = _fecha(evento.get("endDate")) or inicio
+
+    datos = {
+        "nombreEvento": nombre,
+        "fechaInicio": inicio[0],
+        "fechaFinalizacion": fin[0],
+        "añoRaw": str(inicio[1]),
+        "mesLiteralRaw": MESES[inicio[2] - 1],
+        "diaInicioRaw": str(inicio[3]),
+        "diaFinalRaw": str(fin[3]),
+        "fechaRaw": " - ".join(v for v in (_texto(evento.get("startDate")), _texto(evento.get("endDate"))) if v),
+    }
+
+    publicado = _fecha(evento.get("datePublished")) or _fecha(og.get("article:published_time"))
+    if publicado:
+        datos["fechaEdicion"] = publicado[0]
+
+    sede = _texto(evento.get("location"))
+    if sede:
+        datos["sedePrincipal"] = sede
+        datos["Localidad"] = sede
+        direccion = _direccion(evento.get("location"))
+        datos["sedeRaw"] = f"{sede}, {direccion}" if direccion else sede
+
+    organizador = _texto(evento.get("organizer"))
+    if organizador:
+        datos["organizador"] = organizador
+
+    # Tipo y rotación sólo si el nombre o el tipo de schema.org los dicen explícitamente
+    tipo_schema = evento.get("@type")
+    tipo_schema = tipo_schema[0] if isinstance(tipo_schema, list) and tipo_schema else tipo_schema
+    tipo = mapear_tipo_evento(nombre)
+    if tipo == "Otro tipo de evento":
+        tipo = TIPOS_SCHEMA.get(str(tipo_schema).split("/")[-1])
+    if tipo:
+        datos["tipoEvento"] = tipo
+        datos["agrupacion"] = AGRUPACIONES[tipo]
+    for patron, rotacion in ROTACIONES_NOMBRE:
+        if patron.search(nombre):
+            datos["detalleTipoRotacion"] = rotacion
+            break
+
+    return datos
+
+
+def extraer_datos_estructurados(html):
+    """
+    Busca un evento descripto con datos estructurados (JSON-LD, microdata u OpenGraph) y lo
+    devuelve con los campos de la respuesta del LLM, o None si la página no declara ninguno
+    utilizable. Si hay varios, se usa el primero que tenga nombre y fecha de inicio.
+    """
+    if not html or not html.strip():
+        return None
+    try:
+        arbol = parsear_html(html)
+    except (etree.ParserError, ValueError):
+        return None
+
+    og = opengraph(arbol)
+    candidatos = eventos_jsonld(arbol) + eventos_microdata(arbol)
+    evento_og = evento_opengraph(og)
+    if evento_og:
+        candidatos.append(evento_og)
+
+    for evento in candidatos:
+        datos = normalizar_evento(evento, og)
+        if datos:
+            return datos
+    return None
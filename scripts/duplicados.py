@@ -0,0 +1,162 @@
+import threading
+import zlib
+from collections import defaultdict
+from urllib.parse import urlsplit
+import numpy as np
+from scripts.normalizacion import normalizar_texto
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+# Palabras por shingle
+TAMANIO_SHINGLE = 5
+# Firma MinHash dividida en bandas para LSH. Con 20 bandas de 6 filas, dos textos con similitud
+# de Jaccard 0.6 caen en algún bucket común con probabilidad ~0.6 y con 0.8 ~0.99
+NUM_PERMUTACIONES = 120
+BANDAS = 20
+# Similitud de Jaccard estimada a partir de la cual dos páginas son el mismo artículo
+UMBRAL_SIMILITUD = 0.7
+# Por debajo de esta cantidad de shingles el texto es demasiado corto para compararlo
+MIN_SHINGLES = 20
+# Separador de las URLs en la columna fuentes_adicionales
+SEPARADOR_FUENTES = " | "
+
+_PRIMO = np.uint64((1 << 61) - 1)
+_MASCARA = np.uint64(0xFFFFFFFF)
+
+
+def _host(url):
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def shingles(texto, tamanio=TAMANIO_SHINGLE):
+    """Conjunto de hashes (32 bits) de las secuencias de ``tamanio`` palabras del texto normalizado."""
+    palabras = normalizar_texto(texto).split()
+    return {
+        zlib.crc32(" ".join(palabras[i:i + tamanio]).encode("utf-8"))
+        for i in range(len(palabras) - tamanio + 1)
+    }
+
+
+class IndiceDuplicados:
+    """
+    Índice MinHash + LSH sobre el texto limpio de las páginas para detectar el mismo artículo
+    publicado en distintos medios (gacetillas de prensa replicadas).
+
+    La primera página de cada grupo queda como representante; las siguientes que se le parecen
+    se reportan como duplicadas de ella. Sólo se agrupan páginas de hosts distintos: dentro de un
+    mismo sitio el menú y el pie compartidos inflan la similitud entre artículos diferentes, y las
+    variantes de una misma URL ya se resuelven por canonicalización.
+
+    Si se pasa ``estado`` (``EstadoPipeline``), las firmas de los representantes se guardan ahí y
+    se recargan al crear el índice, así los grupos se mantienen entre corridas. La firma de un
+    representante sólo se guarda cuando su extracción terminó bien (``confirmar``); si falla,
+    ``descartar`` lo saca del índice y libera sus copias para que se extraigan por su cuenta.
+    """
+
+    def __init__(self, umbral=UMBRAL_SIMILITUD, num_permutaciones=NUM_PERMUTACIONES,
+                 bandas=BANDAS, estado=None, semilla=1):
+        self.umbral = umbral
+        self.bandas = bandas
+        self.filas = num_permutaciones // bandas
+        self.estado = estado
+
+        generador = np.random.default_rng(semilla)
+        # Coeficientes de (a * x + b) mod p; a < 2^31 evita el desbordamiento en uint64
+        self._a = generador.integers(1, 1 << 31, size=num_permutaciones, dtype=np.uint64)
+        self._b = generador.integers(0, 1 << 32, size=num_permutaciones, dtype=np.uint64)
+
+        self._firmas = {}
+        self._hosts = {}
+        self._buckets = defaultdict(list)
+        self._lock = threading.Lock()
+
+        if estado is not None:
+            for url, firma in estado.firmas():
+                self._indexar(url, np.frombuffer(firma, dtype=np.uint64))
+
+    def firma(self, texto):
+        """Firma MinHash del texto, o None si es demasiado corto para compararlo."""
+        conjunto = shingles(texto)
+        if len(conjunto) < MIN_SHINGLES:
+            return None
+        x = np.fromiter(conjunto, dtype=np.uint64, count=len(conjunto))
+        hashes = (np.outer(x, self._a) + self._b) % _PRIMO & _MASCARA
+        return hashes.min(axis=0)
+
+    def _claves_lsh(self, firma):
+        return [(banda, firma[banda * self.filas:(banda + 1) * self.filas].tobytes())
+                for banda in range(self.bandas)]
+
+    def _indexar(self, url, firma):
+        self._firmas[url] = firma
+        self._hosts[url] = _host(url)
+        for clave in self._claves_lsh(firma):
+            self._buckets[clave].append(url)
+
+    def similitud(self, firma_a, firma_b):
+        """Similitud de Jaccard estimada entre dos firmas."""
+        return float(np.mean(firma_a == firma_b))
+
+    def agregar(self, url, texto):
+        """
+        Compara la página con las ya indexadas. Devuelve la URL del representante si es un
+        duplicado; si no, la registra como representante de un grupo nuevo y devuelve None. El
+        representante nuevo queda en memoria hasta que se llame a ``confirmar`` o ``descartar``.
+        """
+        firma = self.firma(texto)
+        if firma is None:
+            return None
+
+        host = _host(url)
+        with self._lock:
+            if url in self._firmas:
+                return None
+
+            candidatos = {
+                otra for clave in self._claves_lsh(firma) for otra in self._buckets.get(clave, ())
+                if self._hosts[otra] != host
+            }
+            mejor, mejor_similitud = None, self.umbral
+            for candidato in candidatos:
+                similitud = self.similitud(firma, self._firmas[candidato])
+                if similitud >= mejor_similitud:
+                    mejor, mejor_similitud = candidato, similitud
+            if mejor is not None:
+                return mejor
+
+            self._indexar(url, firma)
+        return None
+
+    def confirmar(self, url):
+        """Guarda la firma de un representante cuya extracción se completó."""
+        with self._lock:
+            firma = self._firmas.get(url)
+        if firma is not None and self.estado is not None:
+            self.estado.guardar_firma(url, firma.tobytes())
+
+    def descartar(self, url):
+        """
+        Saca del índice a un representante cuya extracción falló o no dio un evento, para que
+        su grupo no se pierda: las copias ya descartadas por parecerse a él vuelven a quedar
+        pendientes y la primera que se procese pasa a ser el nuevo representante. Devuelve las
+        URLs liberadas.
+        """
+        with self._lock:
+            firma = self._firmas.pop(url, None)
+            self._hosts.pop(url, None)
+            if firma is not None:
+                for clave in self._claves_lsh(firma):
+                    bucket = self._buckets.get(clave)
+                    if bucket and url in bucket:
+                        bucket.remove(url)
+        if self.estado is None:
+            return []
+        if firma is not None:
+            self.estado.borrar_firma(url)
+        return self.estado.liberar_duplicados(url)
+
+
+def unir_fuentes(urls):
+    """Valor de la columna ``fuentes_adicionales`` para una lista de URLs duplicadas."""
+    return SEPARADOR_FUENTES.join(urls) if urls else None
@@ -0,0 +1,252 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from scripts.urls import canonicalizar_url
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+DATA_DIR = "./data"
+ESTADO_PATH = os.path.join(DATA_DIR, "estado_pipeline.sqlite")
+
+# Etapas con estado por URL
+ETAPA_BUSQUEDA = "busqueda"
+ETAPA_REVISION = "revision"
+ETAPA_EXTRACCION = "extraccion"
+ETAPA_CARGA = "carga"
+
+# Estados posibles de una URL en una etapa
+COMPLETADO = "completado"
+DESCARTADO = "descartado"
+ERROR = "error"
+
+# Una URL con errores se reintenta en corridas siguientes hasta este número de intentos
+MAX_INTENTOS = 3
+
+
+class EstadoPipeline:
+    """
+    Registro persistente (SQLite en modo WAL) del estado de cada URL en cada etapa. Cada
+    resultado se escribe apenas se obtiene, así que si el proceso se corta (cuota agotada,
+    crash o kill) la siguiente corrida saltea lo que ya está hecho y retoma exactamente desde
+    donde quedó, sin repetir descargas ni tokens.
+    """
+
+    def __init__(self, path=ESTADO_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directorio = os.path.dirname(path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS estado_urls (
+                url TEXT NOT NULL,
+                etapa TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                datos TEXT,
+                intentos INTEGER NOT NULL DEFAULT 0,
+                actualizado REAL NOT NULL,
+                PRIMARY KEY (url, etapa)
+            );
+            CREATE INDEX IF NOT EXISTS idx_estado_etapa ON estado_urls (etapa, estado);
+            CREATE TABLE IF NOT EXISTS urls_vistas (
+                canonica TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                etapa TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                apariciones INTEGER NOT NULL DEFAULT 1,
+                primera_vez REAL NOT NULL,
+                actualizado REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS firmas_paginas (
+                url TEXT PRIMARY KEY,
+                firma BLOB NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def registrar(self, url, etapa, estado, datos=None):
+        """Guarda (y confirma en disco) el resultado de ``url`` en ``etapa``."""
+        datos_json = json.dumps(datos, ensure_ascii=False, default=str) if datos is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO estado_urls (url, etapa, estado, datos, intentos, actualizado) "
+                "VALUES (?, ?, ?, ?, 1, ?) "
+                "ON CONFLICT (url, etapa) DO UPDATE SET estado = excluded.estado, "
+                "datos = excluded.datos, intentos = intentos + 1, actualizado = excluded.actualizado",
+                (url, etapa, estado, datos_json, time.time())
+            )
+            # El índice de URLs vistas guarda hasta qué etapa llegó cada página
+            self._conn.execute(
+                "UPDATE urls_vistas SET etapa = ?, estado = ?, actualizado = ? WHERE canonica = ?",
+                (etapa, estado, time.time(), canonicalizar_url(url))
+            )
+            self._conn.commit()
+
+    def obtener(self, url, etapa):
+        """Devuelve ``(estado, datos, intentos)`` de ``url`` en ``etapa``, o None si no hay registro."""
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT estado, datos, intentos FROM estado_urls WHERE url = ? AND etapa = ?",
+                (url, etapa)
+            ).fetchone()
+        if fila is None:
+            return None
+        estado, datos, intentos = fila
+        return estado, json.loads(datos) if datos else None, intentos
+
+    def pendiente(self, url, etapa, max_intentos=MAX_INTENTOS):
+        """True si ``url`` todavía tiene que pasar por ``etapa`` en esta corrida."""
+        registro = self.obtener(url, etapa)
+        if registro is None:
+            return True
+        estado, _, intentos = registro
+        return estado == ERROR and intentos < max_intentos
+
+    def resueltas(self, etapa, max_intentos=MAX_INTENTOS):
+        """URLs que no hay que volver a procesar en ``etapa`` (terminadas o sin más reintentos)."""
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT url FROM estado_urls WHERE etapa = ? AND (estado != ? OR intentos >= ?)",
+                (etapa, ERROR, max_intentos)
+            ).fetchall()
+        return {url for (url,) in filas}
+
+    def datos(self, etapa, estado=COMPLETADO, urls=None):
+        """Datos guardados de las URLs en ``estado`` para ``etapa``, opcionalmente filtrando por ``urls``."""
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT url, datos FROM estado_urls WHERE etapa = ? AND estado = ? ORDER BY actualizado",
+                (etapa, estado)
+            ).fetchall()
+        if urls is not None:
+            urls = set(urls)
+            filas = [f for f in filas if f[0] in urls]
+        return [(url, json.loads(datos) if datos else None) for url, datos in filas]
+
+    # --- Índice de URLs vistas entre corridas ---
+
+    def urls_nuevas(self, urls):
+        """
+        Filtra ``urls`` dejando sólo las que no se vieron nunca, comparando por URL canónica
+        (también descarta variantes repetidas dentro de la misma lista). Las URLs ya conocidas
+        suman una aparición en el índice.
+        """
+        canonicas = {}
+        for url in urls:
+            canonica = canonicalizar_url(url)
+            if canonica and canonica not in canonicas:
+                canonicas[canonica] = url
+        if not canonicas:
+            return []
+
+        with self._lock:
+            conocidas = set()
+            lista = list(canonicas)
+            # Se consulta en tandas para no pasar el límite de parámetros de SQLite
+            for i in range(0, len(lista), 500):
+                tanda = lista[i:i + 500]
+                filas = self._conn.execute(
+                    f"SELECT canonica FROM urls_vistas WHERE canonica IN ({','.join('?' * len(tanda))})",
+                    tanda
+                ).fetchall()
+                conocidas.update(c for (c,) in filas)
+            if conocidas:
+                self._conn.executemany(
+                    "UPDATE urls_vistas SET apariciones = apariciones + 1 WHERE canonica = ?",
+                    [(c,) for c in conocidas]
+                )
+                self._conn.commit()
+        return [url for canonica, url in canonicas.items() if canonica not in conocidas]
+
+    def marcar_vistas(self, urls):
+        """Agrega ``urls`` al índice de URLs vistas en la etapa de búsqueda."""
+        ahora = time.time()
+        filas = [(canonicalizar_url(url), url, ETAPA_BUSQUEDA, COMPLETADO, ahora, ahora) for url in urls]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO urls_vistas (canonica, url, etapa, estado, primera_vez, actualizado) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [f for f in filas if f[0]]
+            )
+            self._conn.commit()
+
+    def etapa_alcanzada(self, url):
+        """Devuelve ``(etapa, estado)`` de la última etapa registrada para ``url`` (o su variante canónica)."""
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT etapa, estado FROM urls_vistas WHERE canonica = ?", (canonicalizar_url(url),)
+            ).fetchone()
+        return tuple(fila) if fila else None
+
+    # --- Firmas de páginas para detectar artículos duplicados ---
+
+    def guardar_firma(self, url, firma):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO firmas_paginas (url, firma) VALUES (?, ?)", (url, firma))
+            self._conn.commit()
+
+    def firmas(self):
+        with self._lock:
+            return self._conn.execute("SELECT url, firma FROM firmas_paginas").fetchall()
+
+    def borrar_firma(self, url):
+        with self._lock:
+            self._conn.execute("DELETE FROM firmas_paginas WHERE url = ?", (url,))
+            self._conn.commit()
+
+    def duplicados(self, representante=None):
+        """
+        Agrupa las URLs descartadas en la extracción por ser copia de otra página:
+        ``{url_representante: [urls_duplicadas, ...]}``, opcionalmente sólo para ``representante``.
+        """
+        consulta = (
+            "SELECT json_extract(datos, '$.duplicadoDe') AS representante, url FROM estado_urls "
+            "WHERE etapa = ? AND estado = ? AND representante IS NOT NULL"
+        )
+        parametros = [ETAPA_EXTRACCION, DESCARTADO]
+        if representante is not None:
+            consulta += " AND representante = ?"
+            parametros.append(representante)
+        with self._lock:
+            filas = self._conn.execute(consulta + " ORDER BY actualizado", parametros).fetchall()
+        grupos = {}
+        for url_representante, url in filas:
+            grupos.setdefault(url_representante, []).append(url)
+        return grupos
+
+    def liberar_duplicados(self, representante):
+        """
+        Borra el registro de extracción de las copias de ``representante`` para que vuelvan a
+        quedar pendientes (sin gastar intentos). Devuelve sus URLs.
+        """
+        urls = self.duplicados(representante).get(representante, [])
+        if urls:
+            with self._lock:
+                self._conn.executemany(
+                    "DELETE FROM estado_urls WHERE url = ? AND etapa = ?",
+                    [(url, ETAPA_EXTRACCION) for url in urls]
+                )
+                self._conn.commit()
+        return urls
+
+
+_estado = None
+_estado_lock = threading.Lock()
+
+
+def obtener_estado():
+    """Devuelve la instancia de ``EstadoPipeline`` compartida por el proceso."""
+    global _estado
+    with _estado_lock:
+        if _estado is None:
+            _estado = EstadoPipeline()
+        return _estado
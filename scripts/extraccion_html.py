@@ -0,0 +1,218 @@
+import json
+import re
+from lxml import etree, html as lxml_html
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+# Etiquetas que nunca aportan texto útil
+ETIQUETAS_DESCARTADAS = [
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "button", "select",
+    "input", "textarea", "object", "embed"
+]
+# Bloques de navegación y relleno del sitio
+ETIQUETAS_BOILERPLATE = ["nav", "aside", "footer", "header", "menu"]
+# Clases o ids típicos de menús, barras laterales, pies, banners, etc.
+PATRON_BOILERPLATE = re.compile(
+    r"(^|[\s_-])(nav|navbar|menu|footer|sidebar|side-bar|widget|cookie|banner|share|sharing|social|"
+    r"redes|breadcrumbs?|newsletter|suscrip\w*|publicidad|advert\w*|ads?|related|relacionad\w*|"
+    r"comments?|comentarios|popup|modal|masthead|topbar)($|[\s_-])",
+    re.IGNORECASE
+)
+# Etiquetas de bloque: cada una empieza una línea nueva en el texto
+ETIQUETAS_BLOQUE = {
+    "p", "div", "section", "article", "main", "h1", "h2", "h3", "h4", "h5", "h6", "li", "ul", "ol",
+    "dl", "dt", "dd", "table", "tr", "td", "th", "br", "blockquote", "pre", "figure", "figcaption",
+    "address", "header", "footer", "hr"
+}
+# Un contenedor principal (<article>, <main>) se usa si tiene al menos este texto
+MIN_CHARS_CONTENIDO_PRINCIPAL = 300
+# Un bloque marcado como boilerplate por su clase/id se conserva si tiene mucho texto propio
+MAX_CHARS_BOILERPLATE = 600
+# ... salvo que casi todo su texto sean links
+MAX_DENSIDAD_LINKS = 0.5
+
+_ESPACIOS = re.compile(r"\s+")
+
+
+# ----- METADATOS ESTRUCTURADOS -----
+
+def _es_evento(item):
+    tipos = item.get("@type", [])
+    if isinstance(tipos, str):
+        tipos = [tipos]
+    # Event y sus subtipos de schema.org (BusinessEvent, EducationEvent, ExhibitionEvent...)
+    return any(isinstance(t, str) and t.split("/")[-1].endswith("Event") for t in tipos)
+
+
+def _recorrer_jsonld(dato):
+    """Recorre un bloque JSON-LD (listas, @graph y objetos anidados) devolviendo los objetos."""
+    if isinstance(dato, list):
+        for item in dato:
+            yield from _recorrer_jsonld(item)
+    elif isinstance(dato, dict):
+        yield dato
+        if "@graph" in dato:
+            yield from _recorrer_jsonld(dato["@graph"])
+
+
+def eventos_jsonld(arbol):
+    """Objetos schema.org ``Event`` declarados en los ``<script type="application/ld+json">``."""
+    eventos = []
+    for script in arbol.xpath('//script[contains(translate(@type, "LDJSON", "ldjson"), "ld+json")]'):
+        try:
+            dato = json.loads(script.text or "")
+        except ValueError:
+            continue
+        eventos.extend(item for item in _recorrer_jsonld(dato) if _es_evento(item))
+    return eventos
+
+
+def opengraph(arbol):
+    """Metadatos OpenGraph (``og:*``, ``article:*``, ``event:*``) y la descripción de la página."""
+    metadatos = {}
+    for meta in arbol.xpath("//meta[@property or @name]"):
+        clave = (meta.get("property") or meta.get("name") or "").strip().lower()
+        contenido = (meta.get("content") or "").strip()
+        if not contenido:
+            continue
+        if clave.startswith(("og:", "article:", "event:")) or clave == "description":
+            metadatos.setdefault(clave, contenido)
+    return metadatos
+
+
+def fechas_time(arbol):
+    """Fechas de los elementos ``<time>``: el atributo ``datetime`` o, si falta, su texto."""
+    fechas = []
+    for elemento in arbol.iter("time"):
+        valor = (elemento.get("datetime") or elemento.text_content() or "").strip()
+        if valor and valor not in fechas:
+            fechas.append(valor)
+    return fechas
+
+
+# ----- LIMPIEZA -----
+
+def _texto_plano(elemento):
+    return _ESPACIOS.sub(" ", elemento.text_content()).strip()
+
+
+def _es_boilerplate(elemento):
+    if elemento.tag in ("html", "body"):
+        return False
+    if elemento.tag in ETIQUETAS_BOILERPLATE:
+        # El encabezado de un artículo suele tener el título y la fecha del evento
+        return not (elemento.tag == "header" and elemento.xpath("ancestor::article or ancestor::main"))
+    marca = f"{elemento.get('class', '')} {elemento.get('id', '')} {elemento.get('role', '')}"
+    if not PATRON_BOILERPLATE.search(marca) or elemento.xpath(".//article or .//main"):
+        return False
+    texto = len(_texto_plano(elemento))
+    if texto <= MAX_CHARS_BOILERPLATE:
+        return True
+    links = sum(len(_texto_plano(a)) for a in elemento.iter("a"))
+    return links / texto > MAX_DENSIDAD_LINKS
+
+
+def _contenido_principal(cuerpo):
+    """El ``<article>``/``<main>`` con más texto, o el cuerpo entero si no hay uno que alcance."""
+    candidatos = cuerpo.xpath('.//article | .//main | .//*[@role="main"] | .//*[@itemprop="articleBody"]')
+    if candidatos:
+        mejor = max(candidatos, key=lambda e: len(_texto_plano(e)))
+        if len(_texto_plano(mejor)) >= MIN_CHARS_CONTENIDO_PRINCIPAL:
+            return mejor
+    return cuerpo
+
+
+def _a_lineas(elemento):
+    for bloque in elemento.iter(*ETIQUETAS_BLOQUE):
+        bloque.text = "\n" + (bloque.text or "")
+        bloque.tail = "\n" + (bloque.tail or "")
+
+    lineas = []
+    for linea in elemento.text_content().split("\n"):
+        linea = _ESPACIOS.sub(" ", linea).strip()
+        # Se descartan las líneas vacías y las repetidas seguidas (menús duplicados, etc.)
+        if linea and (not lineas or lineas[-1] != linea):
+            lineas.append(linea)
+    return lineas
+
+
+def parsear_html(html):
+    """Árbol lxml del documento. Lanza ``ParserError``/``ValueError`` si el HTML está vacío."""
+    # Se parsea desde bytes: lxml rechaza str con declaración de encoding
+    parser = lxml_html.HTMLParser(encoding="utf-8", remove_comments=True)
+    return lxml_html.document_fromstring(html.encode("utf-8", errors="replace"), parser=parser)
+
+
+def _resumen_evento(evento):
+    partes = []
+    for campo, etiqueta in (("name", "Nombre"), ("startDate", "Inicio"), ("endDate", "Fin")):
+        if evento.get(campo):
+            partes.append(f"{etiqueta}: {evento[campo]}")
+    lugar = evento.get("location")
+    if isinstance(lugar, list):
+        lugar = lugar[0] if lugar else None
+    if isinstance(lugar, dict) and lugar.get("name"):
+        partes.append(f"Lugar: {lugar['name']}")
+    elif isinstance(lugar, str):
+        partes.append(f"Lugar: {lugar}")
+    return "; ".join(partes)
+
+
+def analizar_html(html):
+    """
+    Analiza una página y devuelve un diccionario con:
+
+    - ``texto``: el contenido principal en texto plano, sin scripts, menús, barras laterales ni
+      pies, precedido por los metadatos útiles (título, descripción, fechas y eventos declarados).
+    - ``eventos``: los objetos schema.org ``Event`` del JSON-LD.
+    - ``opengraph``: los metadatos OpenGraph.
+    - ``fechas``: las fechas de los elementos ``<time>``.
+    """
+    vacio = {"texto": "", "eventos": [], "opengraph": {}, "fechas": []}
+    if not html or not html.strip():
+        return vacio
+    try:
+        arbol = parsear_html(html)
+    except (etree.ParserError, ValueError):
+        return vacio
+
+    eventos = eventos_jsonld(arbol)
+    og = opengraph(arbol)
+    fechas = fechas_time(arbol)
+
+    for elemento in arbol.xpath("|".join(f"//{e}" for e in ETIQUETAS_DESCARTADAS)):
+        elemento.drop_tree()
+    cuerpo = arbol.find("body")
+    if cuerpo is None:
+        cuerpo = arbol
+    # De adentro hacia afuera: los bloques internos se quitan antes de medir a sus contenedores
+    for elemento in reversed(list(cuerpo.iter(etree.Element))):
+        if elemento.getparent() is not None and _es_boilerplate(elemento):
+            elemento.drop_tree()
+
+    lineas = _a_lineas(_contenido_principal(cuerpo))
+
+    encabezado = []
+    titulo = og.get("og:title") or (arbol.findtext(".//title") or "").strip()
+    if titulo:
+        encabezado.append(f"Título: {titulo}")
+    if og.get("og:description") or og.get("description"):
+        encabezado.append(f"Descripción: {og.get('og:description') or og.get('description')}")
+    if fechas:
+        encabezado.append(f"Fechas publicadas: {', '.join(fechas[:10])}")
+    for evento in eventos:
+        resumen = _resumen_evento(evento)
+        if resumen:
+            encabezado.append(f"Evento declarado: {resumen}")
+
+    return {
+        "texto": "\n".join(encabezado + lineas),
+        "eventos": eventos,
+        "opengraph": og,
+        "fechas": fechas,
+    }
+
+
+def html_a_texto(html):
+    """Texto limpio del contenido principal de una página (ver ``analizar_html``)."""
+    return analizar_html(html)["texto"]
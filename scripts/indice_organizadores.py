@@ -0,0 +1,147 @@
+import re
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process, utils
+from scripts.normalizacion import normalizar_texto
+from scripts.metricas import metricas
+
+# Palabras que no aportan para bloquear candidatos ni para armar siglas
+PALABRAS_VACIAS = {
+    "de", "del", "la", "las", "el", "los", "y", "e", "en", "para", "por", "a", "al",
+    "the", "of", "and", "for"
+}
+# Tokens demasiado frecuentes en el catálogo: bloquear por ellos no descarta casi nada
+MAX_FRECUENCIA_TOKEN = 0.1
+
+_PARENTESIS = re.compile(r"\(([^)]+)\)")
+
+
+def _tokens(normalizado):
+    return [t for t in normalizado.split() if t not in PALABRAS_VACIAS and len(t) > 1]
+
+
+def siglas(nombre):
+    """
+    Siglas de una entidad: las que aparecen entre paréntesis ('Universidad Nacional de Cuyo
+    (UNCuyo)' -> 'uncuyo') y las iniciales de sus palabras significativas ('unc').
+    """
+    resultado = {normalizar_texto(m).replace(" ", "") for m in _PARENTESIS.findall(nombre or "")}
+    sin_parentesis = _PARENTESIS.sub(" ", nombre or "")
+    palabras = _tokens(normalizar_texto(sin_parentesis))
+    if len(palabras) >= 2:
+        resultado.add("".join(p[0] for p in palabras))
+    return {s for s in resultado if len(s) >= 2}
+
+
+class MatcherOrganizadores:
+    """
+    Motor de matching de entidades organizadoras contra ``organizadores_normalizado.csv``.
+
+    Precalcula para cada entidad su nombre normalizado y sus siglas, y arma un índice invertido
+    por token. Cada consulta se resuelve primero por coincidencia exacta o de sigla; si no hay,
+    se toman como candidatos las entidades que comparten algún token poco frecuente y se puntúan
+    todas juntas con ``rapidfuzz.process.cdist`` (WRatio, el mismo scorer por defecto de
+    ``fuzzywuzzy.process.extractOne``).
+    """
+
+    def __init__(self, entidades):
+        self.entidades = list(dict.fromkeys(e for e in entidades if isinstance(e, str) and e.strip()))
+        self.normalizados = [normalizar_texto(e) for e in self.entidades]
+
+        self._exacto = {}
+        self._siglas = defaultdict(set)
+        self._tokens = defaultdict(set)
+        for i, (entidad, normalizado) in enumerate(zip(self.entidades, self.normalizados)):
+            self._exacto.setdefault(normalizado, i)
+            for sigla in siglas(entidad):
+                self._siglas[sigla].add(i)
+            for token in _tokens(normalizado):
+                self._tokens[token].add(i)
+
+        limite = max(1, int(len(self.entidades) * MAX_FRECUENCIA_TOKEN))
+        self._tokens_bloqueo = {t: ids for t, ids in self._tokens.items() if len(ids) <= limite}
+
+    @classmethod
+    def desde_df(cls, df_organizaciones, columna="Entidad organizadores"):
+        return cls(df_organizaciones[columna].dropna().unique().tolist())
+
+    def _resolver_directo(self, consulta):
+        normalizado = normalizar_texto(consulta)
+        if normalizado in self._exacto:
+            return self._exacto[normalizado]
+        por_sigla = self._siglas.get(normalizado.replace(" ", ""))
+        if por_sigla and len(por_sigla) == 1:
+            return next(iter(por_sigla))
+        return None
+
+    def _candidatos(self, consulta):
+        normalizado = normalizar_texto(consulta)
+        candidatos = set()
+        for token in _tokens(normalizado):
+            candidatos |= self._tokens_bloqueo.get(token, set())
+            candidatos |= self._siglas.get(token, set())
+        return candidatos
+
+    def emparejar(self, consultas):
+        """
+        Empareja una lista de nombres crudos en un solo lote. Devuelve una lista de tuplas
+        ``(entidad, score)`` en el mismo orden; ``(None, 0)`` para consultas vacías.
+        """
+        resultados = {}
+        pendientes = {}
+        for consulta in dict.fromkeys(c for c in consultas if isinstance(c, str) and c.strip()):
+            directo = self._resolver_directo(consulta)
+            if directo is not None:
+                resultados[consulta] = (self.entidades[directo], 100)
+            else:
+                pendientes[consulta] = self._candidatos(consulta)
+
+        if pendientes and self.entidades:
+            textos = list(pendientes)
+            # Si alguna consulta no comparte ningún token con el catálogo se compara contra todo
+            if all(pendientes.values()):
+                universo = sorted(set().union(*pendientes.values()))
+            else:
+                universo = list(range(len(self.entidades)))
+            opciones = [self.entidades[i] for i in universo]
+
+            scores = process.cdist(
+                textos, opciones, scorer=fuzz.WRatio, processor=utils.default_process, workers=-1)
+
+            # Cada consulta sólo puede elegir entre sus propios candidatos
+            posicion = {indice: j for j, indice in enumerate(universo)}
+            mascara = np.zeros(scores.shape, dtype=bool)
+            for fila, texto in enumerate(textos):
+                if pendientes[texto]:
+                    mascara[fila, [posicion[i] for i in pendientes[texto]]] = True
+                else:
+                    mascara[fila, :] = True
+            scores = np.where(mascara, scores, -1)
+
+            mejores = scores.argmax(axis=1)
+            for fila, texto in enumerate(textos):
+                score = scores[fila, mejores[fila]]
+                resultados[texto] = (opciones[mejores[fila]], int(round(score))) if score > 0 else (None, 0)
+
+        return [resultados.get(c, (None, 0)) for c in consultas]
+
+    def emparejar_uno(self, consulta):
+        return self.emparejar([consulta])[0]
+
+    def emparejar_columna(self, serie, umbral=90, sin_match="NO_MATCH"):
+        """
+        Empareja una columna completa de un DataFrame en una sola llamada. Devuelve un DataFrame
+        con el mismo índice y las columnas ``entidad``, ``score`` y ``requiereRevision``.
+        """
+        with metricas.span("match_organizadores"):
+            pares = self.emparejar(serie.tolist())
+        for _, score in pares:
+            metricas.observar("score_match_organizador", score)
+        entidades = [e if e is not None and s >= umbral else sin_match for e, s in pares]
+        scores = [s for _, s in pares]
+        return pd.DataFrame({
+            "entidad": entidades,
+            "score": scores,
+            "requiereRevision": ["No" if s >= umbral else "Sí" for s in scores],
+        }, index=serie.index)
@@ -0,0 +1,129 @@
+import os
+from collections import Counter, defaultdict
+import pandas as pd
+from rapidfuzz import fuzz, process, utils
+from scripts.normalizacion import normalizar_texto, trigramas
+from scripts.metricas import metricas
+
+DATA_DIR = "./data"
+SEDES_PATH = os.path.join(DATA_DIR, "sedes.csv")
+
+# Cantidad de candidatos (por trigramas compartidos) sobre los que se calcula el score fuzzy
+MAX_CANDIDATOS = 40
+
+
+class SedeIndex:
+    """
+    Índice del catálogo de sedes construido una sola vez a partir de ``sedes.csv``.
+
+    - Búsqueda exacta sobre el nombre normalizado (sin tildes ni mayúsculas).
+    - Índice invertido de trigramas para reducir el fuzzy matching a unos pocos candidatos
+      en lugar de recorrer todo el catálogo.
+    - Resultados cacheados por consulta, ya que el LLM repite mucho las mismas sedes.
+    """
+
+    def __init__(self, df_sedes, columna_nombre="Nombre", columna_localidad="Localidad"):
+        sedes = df_sedes[[columna_nombre, columna_localidad]].dropna(subset=[columna_nombre])
+        sedes = sedes.drop_duplicates(subset=[columna_nombre])
+
+        self.nombres = sedes[columna_nombre].astype(str).tolist()
+        self.localidades = sedes[columna_localidad].tolist()
+        self.normalizados = [normalizar_texto(n) for n in self.nombres]
+
+        self._exacto = {}
+        self._trigramas = defaultdict(set)
+        for i, normalizado in enumerate(self.normalizados):
+            self._exacto.setdefault(normalizado, i)
+            for trigrama in trigramas(normalizado):
+                self._trigramas[trigrama].add(i)
+
+        self._cache_buscar = {}
+        self._cache_localidad = {}
+
+    @classmethod
+    def desde_csv(cls, path=SEDES_PATH):
+        return cls(pd.read_csv(path, sep=";"))
+
+    def __len__(self):
+        return len(self.nombres)
+
+    def _candidatos(self, normalizado, max_candidatos=MAX_CANDIDATOS):
+        """Índices de las sedes que más trigramas comparten con la consulta."""
+        conteo = Counter()
+        for trigrama in trigramas(normalizado):
+            conteo.update(self._trigramas.get(trigrama, ()))
+        return [i for i, _ in conteo.most_common(max_candidatos)]
+
+    def buscar(self, nombre):
+        """
+        Devuelve ``(nombre_oficial, score)`` de la sede del catálogo más parecida a ``nombre``
+        (score 0-100, mismo criterio que ``fuzzywuzzy.process.extractOne``), o ``(None, 0)``.
+        """
+        if nombre in self._cache_buscar:
+            return self._cache_buscar[nombre]
+
+        with metricas.span("match_sede"):
+            normalizado = normalizar_texto(nombre)
+            if not normalizado:
+                resultado = (None, 0)
+            elif normalizado in self._exacto:
+                resultado = (self.nombres[self._exacto[normalizado]], 100)
+            else:
+                candidatos = self._candidatos(normalizado) or range(len(self.nombres))
+                opciones = {i: self.nombres[i] for i in candidatos}
+                mejor = process.extractOne(
+                    nombre, opciones, scorer=fuzz.WRatio, processor=utils.default_process)
+                resultado = (mejor[0], int(round(mejor[1]))) if mejor else (None, 0)
+        metricas.observar("score_match_sede", resultado[1])
+
+        self._cache_buscar[nombre] = resultado
+        return resultado
+
+    def localidad(self, nombre_sede, por_defecto="Desconocido"):
+        """
+        Localidad de la primera sede cuyo nombre contiene ``nombre_sede`` (comparación
+        normalizada), o ``por_defecto`` si no hay ninguna.
+        """
+        if nombre_sede in self._cache_localidad:
+            return self._cache_localidad[nombre_sede]
+
+        normalizado = normalizar_texto(nombre_sede)
+        resultado = por_defecto
+        if normalizado:
+            if normalizado in self._exacto:
+                indice = self._exacto[normalizado]
+            else:
+                # Sólo pueden contener la consulta las sedes que tienen todos sus trigramas internos
+                posibles = None
+                for trigrama in trigramas(normalizado):
+                    if trigrama.startswith(" ") or trigrama.endswith(" "):
+                        continue
+                    ids = self._trigramas.get(trigrama, set())
+                    posibles = ids if posibles is None else posibles & ids
+                    if not posibles:
+                        break
+                if posibles is None:
+                    posibles = range(len(self.normalizados))
+                indice = next(
+                    (i for i in sorted(posibles) if normalizado in self.normalizados[i]), None)
+            if indice is not None and pd.notna(self.localidades[indice]):
+                resultado = self.localidades[indice]
+
+        self._cache_localidad[nombre_sede] = resultado
+        return resultado
+
+
+_indices = {}
+
+
+def obtener_indice_sedes(sedes):
+    """
+    Devuelve un ``SedeIndex`` para ``sedes`` (DataFrame del catálogo o un índice ya construido),
+    construyéndolo una sola vez por DataFrame.
+    """
+    if isinstance(sedes, SedeIndex):
+        return sedes
+    clave = id(sedes)
+    if clave not in _indices or _indices[clave][0] is not sedes:
+        _indices[clave] = (sedes, SedeIndex(sedes))
+    return _indices[clave][1]
@@ -0,0 +1,220 @@
+import random
+import re
+import threading
+import time
+from groq import RateLimitError
+from scripts.metricas import metricas
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+# Límites por minuto del plan gratuito de Groq para cada modelo que usa el pipeline.
+# rpm: requests por minuto, tpm: tokens (entrada + salida) por minuto.
+LIMITES_MODELOS = {
+    "gemma2-9b-it": {"rpm": 30, "tpm": 15000},
+    "openai/gpt-oss-120b": {"rpm": 30, "tpm": 8000},
+    "llama-3.3-70b-versatile": {"rpm": 30, "tpm": 12000},
+    "gemini-2.0-flash": {"rpm": 15, "tpm": 1000000},
+}
+LIMITES_POR_DEFECTO = {"rpm": 30, "tpm": 6000}
+
+# Tokens de salida que se reservan por pedido hasta conocer el uso real
+TOKENS_SALIDA_ESTIMADOS = 512
+# Aproximación de caracteres por token para textos en español
+CHARS_POR_TOKEN = 4
+
+MAX_REINTENTOS = 6
+BACKOFF_BASE = 2.0
+BACKOFF_MAXIMO = 60.0
+# Si el proveedor pide esperar más que esto (cuota diaria agotada) no tiene sentido reintentar
+MAX_ESPERA_REINTENTO = 300.0
+
+
+# ----- AUXILIARES -----
+
+_PATRON_DURACION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parsear_duracion(valor):
+    """
+    Convierte duraciones como '2m59.56s', '7.66s', '120ms' o '3' (segundos) a segundos.
+    Devuelve None si no se puede interpretar.
+    """
+    if valor is None:
+        return None
+    valor = str(valor).strip()
+    try:
+        return float(valor)
+    except ValueError:
+        pass
+
+    factores = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    partes = _PATRON_DURACION.findall(valor)
+    if not partes:
+        return None
+    return sum(float(numero) * factores[unidad] for numero, unidad in partes)
+
+
+def estimar_tokens(messages, tokens_salida=TOKENS_SALIDA_ESTIMADOS):
+    """Estimación barata de los tokens que consumirá un pedido de chat."""
+    chars = sum(len(str(m.get("content", ""))) for m in messages)
+    return chars // CHARS_POR_TOKEN + tokens_salida
+
+
+# ----- TOKEN BUCKET -----
+
+class Cubeta:
+    """Token bucket clásico: se recarga a ``capacidad`` unidades por minuto de forma continua."""
+
+    def __init__(self, capacidad):
+        self.capacidad = float(capacidad)
+        self.disponible = float(capacidad)
+        self.actualizado = time.monotonic()
+
+    def recargar(self):
+        ahora = time.monotonic()
+        self.disponible = min(
+            self.capacidad,
+            self.disponible + (ahora - self.actualizado) * self.capacidad / 60.0
+        )
+        self.actualizado = ahora
+
+    def espera_para(self, cantidad):
+        """Segundos que faltan para poder consumir ``cantidad`` (0 si ya se puede)."""
+        self.recargar()
+        cantidad = min(cantidad, self.capacidad)
+        if self.disponible >= cantidad:
+            return 0.0
+        return (cantidad - self.disponible) * 60.0 / self.capacidad
+
+
+class LimitadorModelo:
+    """Presupuesto de requests y tokens por minuto de un único modelo."""
+
+    def __init__(self, rpm, tpm, modelo=None):
+        self.modelo = modelo
+        self.requests = Cubeta(rpm)
+        self.tokens = Cubeta(tpm)
+        self.bloqueado_hasta = 0.0
+        self.lock = threading.Lock()
+
+    def adquirir(self, tokens_estimados):
+        """Bloquea hasta que haya cupo de requests y tokens, y los consume."""
+        while True:
+            with self.lock:
+                espera = max(
+                    self.bloqueado_hasta - time.monotonic(),
+                    self.requests.espera_para(1),
+                    self.tokens.espera_para(tokens_estimados)
+                )
+                if espera <= 0:
+                    self.requests.disponible -= 1
+                    self.tokens.disponible -= min(tokens_estimados, self.tokens.capacidad)
+                    return
+            metricas.incrementar("espera_limitador_segundos", espera, modelo=self.modelo)
+            time.sleep(espera)
+
+    def ajustar_tokens(self, estimados, reales):
+        """Corrige el consumo reservado con el uso real informado por la respuesta."""
+        with self.lock:
+            self.tokens.recargar()
+            self.tokens.disponible -= reales - estimados
+
+    def actualizar_desde_headers(self, headers):
+        """
+        Sincroniza el presupuesto local con las cabeceras x-ratelimit-* del proveedor, que
+        reflejan también el consumo de otros procesos que usan la misma API key.
+        """
+        if not headers:
+            return
+        with self.lock:
+            limite_tokens = headers.get("x-ratelimit-limit-tokens")
+            restantes_tokens = headers.get("x-ratelimit-remaining-tokens")
+            if limite_tokens and limite_tokens.isdigit():
+                self.tokens.capacidad = float(limite_tokens)
+            if restantes_tokens and restantes_tokens.isdigit():
+                self.tokens.recargar()
+                self.tokens.disponible = min(self.tokens.disponible, float(restantes_tokens))
+
+            restantes_requests = headers.get("x-ratelimit-remaining-requests")
+            if restantes_requests == "0":
+                reset = parsear_duracion(headers.get("x-ratelimit-reset-requests"))
+                if reset:
+                    self.bloqueado_hasta = max(self.bloqueado_hasta, time.monotonic() + reset)
+
+    def penalizar(self, segundos):
+        with self.lock:
+            self.bloqueado_hasta = max(self.bloqueado_hasta, time.monotonic() + segundos)
+
+
+class LimitadorLLM:
+    """Registro de limitadores por modelo, compartido por todas las etapas que llaman al LLM."""
+
+    def __init__(self, limites=None):
+        self.limites = limites if limites is not None else LIMITES_MODELOS
+        self._modelos = {}
+        self._lock = threading.Lock()
+
+    def para(self, modelo):
+        with self._lock:
+            if modelo not in self._modelos:
+                limites = self.limites.get(modelo, LIMITES_POR_DEFECTO)
+                self._modelos[modelo] = LimitadorModelo(limites["rpm"], limites["tpm"], modelo)
+            return self._modelos[modelo]
+
+
+limitador = LimitadorLLM()
+
+
+# ----- LLAMADA AL LLM -----
+
+def _espera_reintento(error, intento):
+    """Tiempo a esperar tras un 429: retry-after del proveedor o backoff exponencial con jitter."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    espera = parsear_duracion(headers.get("retry-after"))
+    if espera is None:
+        espera = parsear_duracion(headers.get("x-ratelimit-reset-tokens"))
+    if espera is None:
+        espera = min(BACKOFF_MAXIMO, BACKOFF_BASE * (2 ** intento))
+    return espera + random.uniform(0, min(espera, BACKOFF_BASE))
+
+
+def completar_chat(client, model, messages, **kwargs):
+    """
+    Reemplazo de ``client.chat.completions.create`` que respeta el presupuesto por minuto del
+    modelo, lee las cabeceras de rate limit de cada respuesta y reintenta los 429 con backoff
+    y jitter. Sólo propaga ``RateLimitError`` si se agotan los reintentos o si el proveedor
+    pide esperar más de ``MAX_ESPERA_REINTENTO`` segundos.
+    """
+    limite = limitador.para(model)
+    estimados = estimar_tokens(messages, kwargs.get("max_tokens") or TOKENS_SALIDA_ESTIMADOS)
+
+    for intento in range(MAX_REINTENTOS + 1):
+        limite.adquirir(estimados)
+        try:
+            completions = client.chat.completions
+            with metricas.span("llm", modelo=model):
+                if hasattr(completions, "with_raw_response"):
+                    raw = completions.with_raw_response.create(model=model, messages=messages, **kwargs)
+                    limite.actualizar_desde_headers(raw.headers)
+                    response = raw.parse()
+                else:
+                    response = completions.create(model=model, messages=messages, **kwargs)
+        except RateLimitError as e:
+            metricas.incrementar("llm_rate_limit", modelo=model)
+            espera = _espera_reintento(e, intento)
+            if intento == MAX_REINTENTOS or espera > MAX_ESPERA_REINTENTO:
+                raise
+            metricas.incrementar("llm_reintentos", modelo=model)
+            metricas.incrementar("espera_limitador_segundos", espera, modelo=model)
+            print(f"Rate limit en {model}. Reintentando en {espera:.1f}s "
+                  f"(intento {intento + 1}/{MAX_REINTENTOS})...")
+            limite.penalizar(espera)
+            continue
+
+        uso = getattr(response, "usage", None)
+        if uso is not None:
+            metricas.incrementar("llm_tokens_entrada", getattr(uso, "prompt_tokens", 0) or 0, modelo=model)
+            metricas.incrementar("llm_tokens_salida", getattr(uso, "completion_tokens", 0) or 0, modelo=model)
+        if uso is not None and getattr(uso, "total_tokens", None):
+            limite.ajustar_tokens(estimados, uso.total_tokens)
+        return response
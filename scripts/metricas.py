@@ -0,0 +1,223 @@
+import csv
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+DATA_DIR = "./data"
+REPORTES_DIR = os.path.join(DATA_DIR, "reportes")
+PREFIJO_PROMETHEUS = "recolector"
+# Duraciones y observaciones que se guardan por serie para calcular los percentiles
+MAX_MUESTRAS = 20000
+PERCENTILES = (50, 95)
+
+_NOMBRE_INVALIDO = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def _clave(nombre, etiquetas):
+    return nombre, tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas_texto(etiquetas):
+    return ",".join(f"{k}={v}" for k, v in etiquetas)
+
+
+class Metricas:
+    """
+    Registro de métricas de una corrida, compartido por todas las etapas y seguro entre hilos:
+
+    - ``span``: mide cuánto tarda un bloque (una etapa, una llamada al LLM, una descarga).
+    - ``incrementar``: contadores (tokens por modelo, respuestas HTTP por dominio y estado,
+      reintentos, aciertos de caché, segundos de espera forzada).
+    - ``observar``: valores sueltos de los que interesa la distribución (scores del matcher).
+
+    Cada serie se identifica por su nombre y sus etiquetas. Al final de la corrida
+    ``guardar_reporte`` escribe el resumen en JSON y CSV (con p50/p95) y ``prometheus``
+    lo devuelve en el formato de texto de Prometheus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.inicio = time.time()
+        self.duraciones = defaultdict(list)
+        self.contadores = defaultdict(float)
+        self.observaciones = defaultdict(list)
+
+    def _agregar_muestra(self, series, clave, valor):
+        muestras = series[clave]
+        if len(muestras) >= MAX_MUESTRAS:
+            # Muestreo simple: se reemplaza una muestra al azar para acotar la memoria
+            muestras[int(np.random.randint(len(muestras)))] = valor
+        else:
+            muestras.append(valor)
+
+    @contextmanager
+    def span(self, nombre, **etiquetas):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar_duracion(nombre, time.perf_counter() - inicio, **etiquetas)
+
+    def registrar_duracion(self, nombre, segundos, **etiquetas):
+        with self._lock:
+            self._agregar_muestra(self.duraciones, _clave(nombre, etiquetas), segundos)
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        with self._lock:
+            self.contadores[_clave(nombre, etiquetas)] += valor
+
+    def observar(self, nombre, valor, **etiquetas):
+        with self._lock:
+            self._agregar_muestra(self.observaciones, _clave(nombre, etiquetas), float(valor))
+
+    def reiniciar(self):
+        with self._lock:
+            self.inicio = time.time()
+            self.duraciones.clear()
+            self.contadores.clear()
+            self.observaciones.clear()
+
+    # --- Resumen y reportes ---
+
+    @staticmethod
+    def _distribucion(muestras):
+        valores = np.asarray(muestras, dtype=float)
+        fila = {"cantidad": len(valores), "total": float(valores.sum())}
+        for p in PERCENTILES:
+            fila[f"p{p}"] = float(np.percentile(valores, p))
+        fila["maximo"] = float(valores.max())
+        return fila
+
+    def resumen(self):
+        """Diccionario con los spans, contadores y observaciones de la corrida."""
+        with self._lock:
+            duraciones = {k: list(v) for k, v in self.duraciones.items() if v}
+            contadores = dict(self.contadores)
+            observaciones = {k: list(v) for k, v in self.observaciones.items() if v}
+
+        return {
+            "inicio": datetime.fromtimestamp(self.inicio).isoformat(timespec="seconds"),
+            "duracion_total": time.time() - self.inicio,
+            "spans": [
+                {"nombre": nombre, "etiquetas": dict(etiquetas), **self._distribucion(muestras)}
+                for (nombre, etiquetas), muestras in sorted(duraciones.items())
+            ],
+            "contadores": [
+                {"nombre": nombre, "etiquetas": dict(etiquetas), "valor": valor}
+                for (nombre, etiquetas), valor in sorted(contadores.items())
+            ],
+            "observaciones": [
+                {"nombre": nombre, "etiquetas": dict(etiquetas), **self._distribucion(muestras)}
+                for (nombre, etiquetas), muestras in sorted(observaciones.items())
+            ],
+        }
+
+    def guardar_reporte(self, directorio=REPORTES_DIR, prometheus_path=None):
+        """
+        Escribe ``metricas_<fecha>.json`` y ``metricas_<fecha>.csv`` en ``directorio`` y, si se
+        indica ``prometheus_path``, las métricas en formato de texto de Prometheus (apto para
+        el textfile collector de node_exporter). Devuelve la ruta del JSON.
+        """
+        os.makedirs(directorio, exist_ok=True)
+        resumen = self.resumen()
+        marca = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        json_path = os.path.join(directorio, f"metricas_{marca}.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(resumen, f, ensure_ascii=False, indent=2)
+
+        csv_path = os.path.join(directorio, f"metricas_{marca}.csv")
+        columnas = ["tipo", "nombre", "etiquetas", "cantidad", "total", "p50", "p95", "maximo", "valor"]
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            escritor = csv.DictWriter(f, fieldnames=columnas, delimiter=";", extrasaction="ignore")
+            escritor.writeheader()
+            for tipo in ("spans", "contadores", "observaciones"):
+                for fila in resumen[tipo]:
+                    escritor.writerow({
+                        **fila, "tipo": tipo,
+                        "etiquetas": _etiquetas_texto(sorted(fila["etiquetas"].items()))
+                    })
+
+        if prometheus_path:
+            with open(prometheus_path, "w", encoding="utf-8") as f:
+                f.write(self.prometheus())
+
+        print(f"Reporte de métricas guardado en '{json_path}' y '{csv_path}'")
+        return json_path
+
+    def prometheus(self):
+        """Métricas en el formato de texto de exposición de Prometheus."""
+        def nombre_metrica(nombre, sufijo):
+            return f"{PREFIJO_PROMETHEUS}_{_NOMBRE_INVALIDO.sub('_', nombre)}{sufijo}"
+
+        def etiquetas(diccionario, **extra):
+            pares = {**diccionario, **extra}
+            if not pares:
+                return ""
+            texto = ",".join(f'{_NOMBRE_INVALIDO.sub("_", k)}="{_escapar(v)}"' for k, v in pares.items())
+            return "{" + texto + "}"
+
+        resumen = self.resumen()
+        lineas = []
+        tipos_declarados = set()
+
+        for tipo, sufijo in (("spans", "_segundos"), ("observaciones", "")):
+            for fila in resumen[tipo]:
+                nombre = nombre_metrica(fila["nombre"], sufijo)
+                if nombre not in tipos_declarados:
+                    lineas.append(f"# TYPE {nombre} summary")
+                    tipos_declarados.add(nombre)
+                for p in PERCENTILES:
+                    lineas.append(f"{nombre}{etiquetas(fila['etiquetas'], quantile=p / 100)} {fila[f'p{p}']}")
+                lineas.append(f"{nombre}_sum{etiquetas(fila['etiquetas'])} {fila['total']}")
+                lineas.append(f"{nombre}_count{etiquetas(fila['etiquetas'])} {fila['cantidad']}")
+
+        for fila in resumen["contadores"]:
+            nombre = nombre_metrica(fila["nombre"], "_total")
+            if nombre not in tipos_declarados:
+                lineas.append(f"# TYPE {nombre} counter")
+                tipos_declarados.add(nombre)
+            lineas.append(f"{nombre}{etiquetas(fila['etiquetas'])} {fila['valor']}")
+
+        return "\n".join(lineas) + "\n"
+
+    def imprimir_resumen(self):
+        """Tabla corta con las etapas y llamadas más costosas de la corrida."""
+        resumen = self.resumen()
+        print(f"\n--- Métricas de la corrida ({resumen['duracion_total']:.0f}s) ---")
+        for fila in sorted(resumen["spans"], key=lambda f: -f["total"])[:15]:
+            etiquetas = _etiquetas_texto(sorted(fila["etiquetas"].items()))
+            print(
+                f"{fila['nombre']}[{etiquetas}]: {fila['cantidad']} veces, total {fila['total']:.1f}s, "
+                f"p50 {fila['p50']:.2f}s, p95 {fila['p95']:.2f}s"
+            )
+
+
+# ----- INSTANCIA COMPARTIDA -----
+
+metricas = Metricas()
+
+
+def span(nombre, **etiquetas):
+    """Atajo a ``metricas.span``: ``with span("llm", modelo=...):``."""
+    return metricas.span(nombre, **etiquetas)
+
+
+def incrementar(nombre, valor=1, **etiquetas):
+    metricas.incrementar(nombre, valor, **etiquetas)
+
+
+def observar(nombre, valor, **etiquetas):
+    metricas.observar(nombre, valor, **etiquetas)
@@ -0,0 +1,22 @@
+import re
+import unicodedata
+
+_NO_ALFANUMERICO = re.compile(r"[^0-9a-z]+")
+
+
+def normalizar_texto(texto):
+    """
+    Normaliza un texto para compararlo: quita tildes, pasa a minúsculas y reemplaza todo lo
+    que no sea letra o número por un espacio simple. 'UNCUYO (Centro)' -> 'uncuyo centro'.
+    """
+    if not isinstance(texto, str):
+        return ""
+    sin_tildes = unicodedata.normalize("NFKD", texto)
+    sin_tildes = "".join(c for c in sin_tildes if not unicodedata.combining(c))
+    return _NO_ALFANUMERICO.sub(" ", sin_tildes.lower()).strip()
+
+
+def trigramas(texto_normalizado):
+    """Trigramas de caracteres de un texto ya normalizado (con bordes para palabras cortas)."""
+    relleno = f"  {texto_normalizado} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
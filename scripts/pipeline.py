@@ -0,0 +1,335 @@
+import os
+import queue
+import threading
+import time
+import pandas as pd
+from config.dbconfig import Session
+from scripts.search import busqueda_eventos
+from scripts.backfill import backfill_eventos
+from scripts.cache_paginas import obtener_pagina
+from scripts.revisar_links import revisar_pagina
+from scripts.clasificar_eventos import extraer_datos_evento_pagina, guardar_eventos, router_extraccion
+from scripts.router_llm import SinModelosDisponibles, NO_HAY_MODELOS_DISPONIBLES
+from scripts.procesar_eventos import procesar_respuesta
+from scripts.correccion_sedes import corregir_sedes
+from scripts.asignar_entidad import asignar_entidades_organizadoras
+from scripts.indice_sedes import SedeIndex
+from scripts.indice_organizadores import MatcherOrganizadores
+from scripts.duplicados import IndiceDuplicados, unir_fuentes
+from scripts.metricas import metricas
+from scripts import almacen
+from scripts.estado import (
+    obtener_estado, ETAPA_REVISION, ETAPA_EXTRACCION, ETAPA_CARGA, COMPLETADO, DESCARTADO, ERROR)
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+DATA_DIR = "./data"
+SEDES_PATH = os.path.join(DATA_DIR, "sedes.csv")
+ORGANIZADORES_PATH = os.path.join(DATA_DIR, "organizadores_normalizado.csv")
+
+# Tamaño de cada cola entre etapas: acota la memoria y frena a las etapas rápidas
+TAMANIO_COLA = 32
+# Hilos por etapa. La revisión y la extracción están dominadas por la red y el LLM.
+HILOS_REVISION = 4
+HILOS_EXTRACCION = 2
+
+_FIN = object()
+
+
+# ----- INFRAESTRUCTURA DE ETAPAS -----
+
+class Etapa:
+    """
+    Etapa del pipeline: ``hilos`` workers que toman elementos de ``entrada``, les aplican
+    ``funcion`` y publican el resultado (si no es None) en ``salida``. Cuando la entrada se
+    termina, el último worker en salir propaga el fin a la etapa siguiente.
+
+    Si ``funcion`` lanza ``SinModelosDisponibles`` (todos los modelos agotados) se activa
+    ``detener``: las etapas siguen vaciando sus colas sin procesar, para que todo termine
+    ordenadamente y lo ya cargado quede en la base.
+
+    Cada elemento procesado registra un span ``etapa`` con el nombre de la etapa en ``metricas``,
+    y al terminar la etapa registra su duración completa en ``etapa_total`` (la misma métrica que
+    las etapas de ``main.ejecutar_por_etapas``).
+    """
+
+    def __init__(self, nombre, funcion, entrada, salida, detener, hilos=1):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.entrada = entrada
+        self.salida = salida
+        self.detener = detener
+        self.procesados = 0
+        self.errores = 0
+        self._activos = hilos
+        self._inicio = None
+        self._lock = threading.Lock()
+        self._hilos = [
+            threading.Thread(target=self._trabajar, name=f"{nombre}-{i}", daemon=True)
+            for i in range(hilos)
+        ]
+
+    def iniciar(self):
+        self._inicio = time.perf_counter()
+        for hilo in self._hilos:
+            hilo.start()
+        return self
+
+    def esperar(self):
+        for hilo in self._hilos:
+            hilo.join()
+
+    def _trabajar(self):
+        while True:
+            item = self.entrada.get()
+            if item is _FIN:
+                # Devolver el fin a la cola para que lo vean los demás workers de la etapa
+                self.entrada.put(_FIN)
+                break
+            if self.detener.is_set():
+                continue
+            try:
+                with metricas.span("etapa", etapa=self.nombre):
+                    resultado = self.funcion(item)
+            except SinModelosDisponibles:
+                print(f"[{self.nombre}] Ningún modelo del LLM disponible. Deteniendo el pipeline...")
+                self.detener.set()
+                continue
+            except Exception as e:
+                print(f"[{self.nombre}] Error inesperado: {e}")
+                with self._lock:
+                    self.errores += 1
+                continue
+            with self._lock:
+                self.procesados += 1
+            if resultado is not None and self.salida is not None:
+                self.salida.put(resultado)
+
+        with self._lock:
+            self._activos -= 1
+            ultimo = self._activos == 0
+        if ultimo:
+            metricas.registrar_duracion("etapa_total", time.perf_counter() - self._inicio, etapa=self.nombre)
+        if ultimo and self.salida is not None:
+            self.salida.put(_FIN)
+
+
+# ----- PIPELINE -----
+
+class PipelineStreaming:
+    """
+    Orquestador que conecta búsqueda, revisión de links, extracción con LLM, resolución de
+    sede/organizador y carga en la base mediante colas acotadas. Cada evento llega a la base
+    apenas termina su recorrido, en lugar de esperar a que cada etapa procese la lista completa.
+
+    Las etapas consultan y actualizan el estado persistente por URL, así que al relanzarlo
+    tras una interrupción sólo se procesa lo que había quedado pendiente.
+
+    Con ``backfill`` (kwargs de ``backfill_eventos``) la búsqueda es la histórica por ventanas
+    de fechas y sus resultados entran al mismo recorrido a medida que llegan.
+    """
+
+    def __init__(self, buscar=True, hilos_revision=HILOS_REVISION,
+                 hilos_extraccion=HILOS_EXTRACCION, tamanio_cola=TAMANIO_COLA, backfill=None):
+        self.buscar = buscar
+        self.backfill = backfill
+        self.hilos_revision = hilos_revision
+        self.hilos_extraccion = hilos_extraccion
+        self.tamanio_cola = tamanio_cola
+
+        self.indice_sedes = SedeIndex(pd.read_csv(SEDES_PATH, sep=";"))
+        self.matcher = MatcherOrganizadores.desde_df(
+            pd.read_csv(ORGANIZADORES_PATH, low_memory=False, sep=";"))
+        self.session = Session()
+        self.estado = obtener_estado()
+        self.duplicados = IndiceDuplicados(estado=self.estado)
+        self._links_vistos = set()
+        self._lock_links = threading.Lock()
+
+    # --- Etapas ---
+
+    def _publicar_hits(self, resultados, cola):
+        for resultado in resultados:
+            link = resultado.get("link")
+            if not link:
+                continue
+            with self._lock_links:
+                if link in self._links_vistos:
+                    continue
+                self._links_vistos.add(link)
+            cola.put({"titulo": resultado.get("title", ""), "link": link})
+
+    def _hits_pendientes(self):
+        """
+        Resultados de búsqueda guardados que todavía no terminaron su recorrido: los que dejó una
+        corrida interrumpida (incluidos los que quedaban en las colas al detenerse) no vuelven a
+        aparecer en la búsqueda, porque sus URLs ya figuran como vistas.
+        """
+        df = almacen.leer(almacen.RESULTADOS_BUSQUEDA, columnas=["title", "link"])
+        terminadas = self.estado.resueltas(ETAPA_CARGA)
+        # Las descartadas (o sin más reintentos) en la revisión o la extracción no llegan a la carga
+        for etapa in (ETAPA_REVISION, ETAPA_EXTRACCION):
+            completadas = {url for url, _ in self.estado.datos(etapa)}
+            terminadas |= self.estado.resueltas(etapa) - completadas
+        pendientes = ~df["link"].isin(terminadas)
+        return df[pendientes].to_dict(orient="records")
+
+    def _producir_hits(self, cola, detener):
+        try:
+            pendientes = self._hits_pendientes()
+            if pendientes:
+                print(f"{len(pendientes)} resultados de búsqueda de corridas anteriores siguen pendientes.")
+            elif not self.buscar:
+                print("No hay resultados de búsqueda pendientes.")
+            self._publicar_hits(pendientes, cola)
+
+            al_encontrar = lambda resultados: self._publicar_hits(resultados, cola)
+            # Si las etapas se detuvieron (modelos agotados) la búsqueda no sigue gastando cuota
+            if self.buscar and self.backfill:
+                backfill_eventos(al_encontrar=al_encontrar, cancelar=detener, **self.backfill)
+            elif self.buscar:
+                busqueda_eventos(al_encontrar=al_encontrar, cancelar=detener)
+        finally:
+            cola.put(_FIN)
+
+    def _revisar(self, hit):
+        url = hit["link"]
+        if not self.estado.pendiente(url, ETAPA_CARGA):
+            return None
+        registro = self.estado.obtener(url, ETAPA_REVISION)
+        if registro and registro[0] != ERROR:
+            # Ya revisado en una corrida anterior: se reutiliza el veredicto
+            if registro[0] != COMPLETADO:
+                return None
+            return {"titulo": registro[1]["titulo"], "link": registro[1]["link"]}
+        if not self.estado.pendiente(url, ETAPA_REVISION):
+            return None
+
+        pagina = obtener_pagina(url)
+        if pagina is None:
+            self.estado.registrar(url, ETAPA_REVISION, ERROR)
+            return None
+        print(f"Revisando link: {url}")
+        linea, detalle = revisar_pagina(hit["titulo"], url, pagina["texto"])
+        if not linea:
+            self.estado.registrar(url, ETAPA_REVISION, DESCARTADO, detalle)
+            return None
+
+        self.estado.registrar(url, ETAPA_REVISION, COMPLETADO, {**linea, **detalle})
+        almacen.agregar(almacen.LINKS_REVISADOS, pd.DataFrame([linea]))
+        return linea
+
+    def _con_fuentes(self, url, evento):
+        """Copia del evento con las URLs de las páginas duplicadas como fuentes adicionales."""
+        evento = dict(evento)
+        evento["fuentesAdicionales"] = unir_fuentes(self.estado.duplicados(url).get(url))
+        return evento
+
+    def _extraer(self, linea):
+        url = linea["link"]
+        registro = self.estado.obtener(url, ETAPA_EXTRACCION)
+        if registro and registro[0] != ERROR:
+            return self._con_fuentes(url, registro[1]) if registro[0] == COMPLETADO else None
+        if not self.estado.pendiente(url, ETAPA_EXTRACCION):
+            return None
+
+        pagina = obtener_pagina(url)
+        if pagina is None:
+            self.estado.registrar(url, ETAPA_EXTRACCION, ERROR)
+            print(f"No se pudo extraer contenido de la URL {url}. Saltando...")
+            return None
+
+        representante = self.duplicados.agregar(url, pagina["texto"])
+        if representante:
+            print(f"{url} es el mismo artículo que {representante}. Se agrega como fuente adicional.")
+            self.estado.registrar(url, ETAPA_EXTRACCION, DESCARTADO, {"duplicadoDe": representante})
+            # Si el evento del representante ya se extrajo, se reenvía para cargar la fuente nueva
+            registro = self.estado.obtener(representante, ETAPA_EXTRACCION)
+            if registro and registro[0] == COMPLETADO:
+                return self._con_fuentes(representante, registro[1])
+            return None
+
+        print(f"Procesando URL: {url}")
+        raw_response = extraer_datos_evento_pagina(pagina, pagina["texto"])
+        if raw_response == NO_HAY_MODELOS_DISPONIBLES:
+            raise SinModelosDisponibles()
+        if not raw_response:
+            self._extraccion_fallida(url, ERROR)
+            print(f"No se obtuvo respuesta del LLM para {url}.")
+            return None
+        evento = procesar_respuesta(raw_response, url, self.indice_sedes)
+        if not evento:
+            self._extraccion_fallida(url, DESCARTADO)
+            return None
+        self.estado.registrar(url, ETAPA_EXTRACCION, COMPLETADO, evento)
+        self.duplicados.confirmar(url)
+        return self._con_fuentes(url, evento)
+
+    def _extraccion_fallida(self, url, resultado):
+        # Las copias ya descartadas por parecerse a esta página vuelven a quedar pendientes
+        self.estado.registrar(url, ETAPA_EXTRACCION, resultado)
+        liberadas = self.duplicados.descartar(url)
+        if liberadas:
+            print(f"{len(liberadas)} copias de {url} quedan pendientes para la próxima corrida.")
+
+    def _resolver(self, evento):
+        df_evento = pd.DataFrame([evento])
+        df_evento = corregir_sedes(
+            df_eventos=df_evento, df_sedes=self.indice_sedes, llm_client=router_extraccion, guardar=False)
+        return asignar_entidades_organizadoras(
+            df_eventos=df_evento, df_organizaciones=self.matcher, llm_client=router_extraccion, guardar=False)
+
+    def _cargar(self, df_evento):
+        carga = guardar_eventos(df_evento, self.session)
+        url = df_evento["sitioWeb"].iloc[0]
+        if url in carga["fallidos"]:
+            # El lote se revirtió: queda con error para que la próxima corrida lo vuelva a cargar
+            self.estado.registrar(url, ETAPA_CARGA, ERROR)
+            raise RuntimeError(f"No se pudo cargar el evento de {url} en la base.")
+        if url not in carga["cargados"]:
+            self.estado.registrar(url, ETAPA_CARGA, DESCARTADO)
+            return None
+        self.estado.registrar(url, ETAPA_CARGA, COMPLETADO)
+
+        # Registro para revisión humana (se exporta a CSV con ``python -m scripts.almacen``)
+        almacen.agregar(almacen.EVENTOS_PROCESADOS, df_evento)
+        return df_evento
+
+    # --- Ejecución ---
+
+    def ejecutar(self):
+        detener = threading.Event()
+        colas = [queue.Queue(maxsize=self.tamanio_cola) for _ in range(4)]
+        hits, validos, eventos, resueltos = colas
+
+        etapas = [
+            Etapa("revision", self._revisar, hits, validos, detener, self.hilos_revision),
+            Etapa("extraccion", self._extraer, validos, eventos, detener, self.hilos_extraccion),
+            Etapa("resolucion", self._resolver, eventos, resueltos, detener),
+            Etapa("carga", self._cargar, resueltos, None, detener),
+        ]
+        for etapa in etapas:
+            etapa.iniciar()
+
+        try:
+            self._producir_hits(hits, detener)
+            for etapa in etapas:
+                etapa.esperar()
+        finally:
+            self.session.close()
+            # Las etapas agregan de a una fila: se unen los archivos de la corrida
+            for nombre in (almacen.RESULTADOS_BUSQUEDA, almacen.LINKS_REVISADOS, almacen.EVENTOS_PROCESADOS):
+                almacen.compactar(nombre)
+
+        print("\n--- Pipeline en streaming finalizado ---")
+        for etapa in etapas:
+            print(f"{etapa.nombre}: {etapa.procesados} procesados, {etapa.errores} errores")
+        cargados = etapas[-1].procesados
+        if cargados:
+            print(f"Eventos guardados en el dataset '{almacen.EVENTOS_PROCESADOS}' y en la base de datos.")
+        return {etapa.nombre: etapa.procesados for etapa in etapas}
+
+
+def ejecutar_pipeline(buscar=True, backfill=None):
+    """Atajo para correr el pipeline en streaming con la configuración por defecto."""
+    return PipelineStreaming(buscar=buscar, backfill=backfill).ejecutar()
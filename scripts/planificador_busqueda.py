@@ -0,0 +1,188 @@
+import json
+import os
+import re
+import threading
+from datetime import date
+from scripts.normalizacion import normalizar_texto
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+DATA_DIR = "./data"
+HISTORIAL_PATH = os.path.join(DATA_DIR, "historial_consultas.json")
+
+# Google ignora los términos que pasan de las 32 palabras por query
+MAX_TERMINOS_QUERY = 32
+# Una query que quedó vacía esta cantidad de veces seguidas empieza a espaciarse
+MIN_VACIAS_PARA_ESPACIAR = 3
+# Intervalo máximo (en días) entre dos ejecuciones de una query que nunca trae nada
+MAX_INTERVALO_DIAS = 16
+# dateRestrict máximo al recuperar los días en que una query no se ejecutó
+MAX_DIAS_RESTRICCION = 30
+
+# Queries con las que se guardaba el historial antes de usar ``clave_consulta``
+_QUERY_ANTERIOR = re.compile(r'^"(?P<tipo>.+?)" "\d{4}" \((?P<sedes>.*)\)$')
+
+
+def contar_terminos(texto):
+    """Palabras que Google cuenta para el límite de la query (la puntuación no cuenta)."""
+    return len(normalizar_texto(texto).split())
+
+
+def clave_consulta(tipo, sedes):
+    """
+    Identifica una query en el historial sin depender del año que lleva el texto, así el
+    rendimiento aprendido no se pierde con el cambio de año.
+    """
+    return "|".join([tipo, *sorted(sedes)])
+
+
+def armar_consultas(tipos_evento, sedes, anio, max_terminos=MAX_TERMINOS_QUERY):
+    """
+    Arma las queries tipo × grupo de sedes. Las sedes se agrupan por orden del catálogo en
+    bloques que llenan el límite real de términos de la API (tipo + año + cada sede + cada OR),
+    en lugar de bloques fijos de 10 que en las sedes de nombre largo se pasan del límite y
+    hacen que Google ignore las últimas. El año sólo forma parte del texto de la query; cada
+    consulta lleva en ``clave`` su identificador en el historial (ver ``clave_consulta``).
+    """
+    consultas = []
+    for tipo in tipos_evento:
+        base = contar_terminos(tipo) + contar_terminos(anio)
+        bloques, bloque, terminos = [], [], base
+        for sede in sedes:
+            costo = contar_terminos(sede) + (1 if bloque else 0)
+            if bloque and terminos + costo > max_terminos:
+                bloques.append(bloque)
+                bloque, terminos = [], base
+                costo = contar_terminos(sede)
+            bloque.append(sede)
+            terminos += costo
+        if bloque:
+            bloques.append(bloque)
+
+        for bloque in bloques:
+            sedes_query = " OR ".join(f'"{s}"' for s in bloque)
+            consultas.append({
+                "tipo": tipo,
+                "sedes": bloque,
+                "query": f'"{tipo}" "{anio}" ({sedes_query})',
+                "clave": clave_consulta(tipo, bloque),
+            })
+    return consultas
+
+
+class PlanificadorBusqueda:
+    """
+    Lleva el historial de rendimiento de cada query (ejecuciones, resultados, resultados nuevos y
+    racha de respuestas vacías) y arma el plan del día:
+
+    - Las queries ya ejecutadas hoy no se repiten (el historial hace de progreso por query).
+    - Las que vienen quedando vacías se espacian con un intervalo que se duplica por cada
+      ejecución vacía, hasta ``MAX_INTERVALO_DIAS``.
+    - Al volver a ejecutar una query después de varios días, ``dateRestrict`` cubre todos los
+      días salteados para no perder lo publicado mientras tanto.
+    - El resto se ordena por resultados nuevos por ejecución, así el presupuesto diario se
+      gasta primero en las queries que más rinden.
+    """
+
+    def __init__(self, path=HISTORIAL_PATH, hoy=None):
+        self.path = path
+        self.hoy = hoy or date.today()
+        self._lock = threading.Lock()
+        self.historial = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.historial = self._migrar(json.load(f))
+
+    @staticmethod
+    def _migrar(historial):
+        """
+        Pasa las entradas guardadas con el texto de la query (que incluye el año) a
+        ``clave_consulta``. Si varios años caen en la misma clave se conserva la más reciente.
+        """
+        migrado = {}
+        for clave, registro in historial.items():
+            anterior = _QUERY_ANTERIOR.match(clave)
+            if anterior:
+                sedes = [sede.strip('"') for sede in anterior["sedes"].split(" OR ")]
+                clave = clave_consulta(anterior["tipo"], sedes)
+            previo = migrado.get(clave)
+            if previo is None or (registro["ultima_ejecucion"] or "") > (previo["ultima_ejecucion"] or ""):
+                migrado[clave] = registro
+        return migrado
+
+    @staticmethod
+    def _clave(consulta):
+        return consulta.get("clave") or clave_consulta(consulta["tipo"], consulta["sedes"])
+
+    def _guardar(self):
+        directorio = os.path.dirname(self.path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        temporal = f"{self.path}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(self.historial, f, ensure_ascii=False)
+        os.replace(temporal, self.path)
+
+    def _dias_desde_ultima(self, registro):
+        return (self.hoy - date.fromisoformat(registro["ultima_ejecucion"])).days
+
+    def _intervalo(self, registro):
+        vacias = registro["vacias_consecutivas"]
+        if vacias < MIN_VACIAS_PARA_ESPACIAR:
+            return 1
+        return min(2 ** (vacias - MIN_VACIAS_PARA_ESPACIAR + 1), MAX_INTERVALO_DIAS)
+
+    def _rendimiento(self, registro):
+        # Suavizado de Laplace: una query nueva arranca con el mismo rendimiento esperado
+        return (registro["nuevos"] + 1) / (registro["ejecuciones"] + 2)
+
+    def planificar(self, consultas, presupuesto=None):
+        """
+        Devuelve las queries a ejecutar hoy, de mayor a menor rendimiento y recortadas a
+        ``presupuesto``. Cada una lleva su ``dateRestrict``.
+        """
+        pendientes = []
+        for consulta in consultas:
+            registro = self.historial.get(self._clave(consulta))
+            if registro is None:
+                pendientes.append((self._rendimiento({"nuevos": 0, "ejecuciones": 0}),
+                                   {**consulta, "dateRestrict": "d1"}))
+                continue
+
+            dias = self._dias_desde_ultima(registro)
+            if dias < self._intervalo(registro):
+                continue
+            restriccion = f"d{min(dias, MAX_DIAS_RESTRICCION)}"
+            pendientes.append((self._rendimiento(registro), {**consulta, "dateRestrict": restriccion}))
+
+        # sorted es estable: a igual rendimiento se respeta el orden del catálogo
+        plan = [consulta for _, consulta in sorted(pendientes, key=lambda p: -p[0])]
+        return plan[:presupuesto] if presupuesto is not None else plan
+
+    def registrar(self, consulta, resultados, nuevos):
+        """Guarda el resultado de una query ejecutada hoy."""
+        with self._lock:
+            registro = self.historial.setdefault(self._clave(consulta), {
+                "ejecuciones": 0, "resultados": 0, "nuevos": 0, "vacias_consecutivas": 0,
+                "ultima_ejecucion": None,
+            })
+            registro["ejecuciones"] += 1
+            registro["resultados"] += resultados
+            registro["nuevos"] += nuevos
+            registro["vacias_consecutivas"] = 0 if resultados else registro["vacias_consecutivas"] + 1
+            registro["ultima_ejecucion"] = self.hoy.isoformat()
+            self._guardar()
+
+    def resumen(self, consultas):
+        """Cantidad de queries del catálogo ejecutadas hoy, salteadas por vacías y pendientes."""
+        hechas = espaciadas = 0
+        for consulta in consultas:
+            registro = self.historial.get(self._clave(consulta))
+            if registro is None:
+                continue
+            dias = self._dias_desde_ultima(registro)
+            if dias == 0:
+                hechas += 1
+            elif dias < self._intervalo(registro):
+                espaciadas += 1
+        return {"hechas": hechas, "espaciadas": espaciadas, "total": len(consultas)}
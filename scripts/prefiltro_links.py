@@ -0,0 +1,241 @@
+import json
+import math
+import os
+import re
+import threading
+from urllib.parse import urlsplit
+import numpy as np
+import pandas as pd
+from scripts.normalizacion import normalizar_texto
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+DATA_DIR = "./data"
+SEDES_PATH = os.path.join(DATA_DIR, "sedes.csv")
+PESOS_PATH = os.path.join(DATA_DIR, "prefiltro_pesos.json")
+
+# Por debajo de UMBRAL_RECHAZO el link se descarta sin consultar al LLM y por encima de
+# UMBRAL_ACEPTACION se acepta directamente. Sólo los casos intermedios van al LLM.
+UMBRAL_RECHAZO = 0.1
+UMBRAL_ACEPTACION = 0.97
+
+RECHAZAR = "rechazar"
+ACEPTAR = "aceptar"
+DUDOSO = "dudoso"
+
+# Pesos del modelo lineal (regresión logística) ajustados a mano. ``entrenar_desde_estado``
+# los reemplaza por pesos aprendidos de los veredictos anteriores del LLM.
+PESOS_POR_DEFECTO = {
+    "sesgo": -3.0,
+    "url_listado": -3.0,
+    "url_nota": 0.5,
+    "otra_provincia": -2.5,
+    "mendoza_titulo": 1.0,
+    "mendoza_texto": 1.0,
+    "sede": 1.5,
+    "evento_titulo": 1.5,
+    "evento_texto": 1.0,
+    "fecha": 1.0,
+    "rango_fechas": 0.8,
+    "inscripcion": 0.7,
+}
+
+DEPARTAMENTOS_MENDOZA = [
+    "mendoza", "capital", "godoy cruz", "guaymallen", "las heras", "lavalle", "lujan de cuyo",
+    "maipu", "san martin", "junin", "rivadavia", "santa rosa", "la paz", "tunuyan", "tupungato",
+    "san carlos", "san rafael", "general alvear", "malargue", "uspallata", "potrerillos",
+    "chacras de coria", "valle de uco"
+]
+# Localidades de Mendoza cuyo nombre se repite en otras provincias o países: no cuentan como
+# señal de Mendoza ("Santa Rosa, La Pampa", "San Martín, Buenos Aires", "La Paz, Bolivia")
+LOCALIDADES_AMBIGUAS = {
+    "capital", "santa rosa", "san martin", "ciudad de san martin", "la paz", "rio grande",
+    "25 de mayo", "junin", "rivadavia", "las heras", "lavalle", "maipu", "san carlos", "san jose",
+    "general alvear", "ciudad de general alvear"
+}
+OTRAS_PROVINCIAS = [
+    "buenos aires", "caba", "cordoba", "santa fe", "rosario", "parana", "entre rios", "tucuman",
+    "salta", "jujuy", "neuquen", "rio negro", "bariloche", "chubut", "santa cruz", "tierra del fuego",
+    "san juan", "san luis", "la rioja", "catamarca", "santiago del estero", "chaco", "corrientes",
+    "misiones", "formosa", "la pampa", "carlos paz", "mar del plata", "bahia blanca", "chile",
+    "uruguay", "montevideo", "mexico", "espana"
+]
+PALABRAS_EVENTO = [
+    "congreso", "jornada", "jornadas", "seminario", "simposio", "feria", "exposicion", "expo",
+    "convencion", "conferencia", "encuentro", "foro", "workshop", "cumbre", "asamblea", "muestra"
+]
+PALABRAS_INSCRIPCION = [
+    "inscripcion", "inscripciones", "disertantes", "disertante", "acreditacion", "acreditaciones",
+    "cronograma", "programa completo", "expositores", "panelistas", "entrada libre", "cupos"
+]
+# Segmentos de URL propios de portadas, secciones y listados
+SEGMENTOS_LISTADO = {
+    "tag", "tags", "temas", "tema", "etiqueta", "etiquetas", "categoria", "categorias", "category",
+    "seccion", "secciones", "section", "page", "pagina", "buscar", "search", "autor", "author",
+    "archivo", "archive", "noticias", "prensa", "ultimas-noticias"
+}
+MESES = "enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre"
+
+PATRON_FECHA = re.compile(rf"\b\d{{1,2}} (de )?({MESES})\b|\b\d{{1,2}}/\d{{1,2}}(/\d{{2,4}})?\b")
+PATRON_RANGO_FECHAS = re.compile(rf"\bdel? \d{{1,2}} (de ({MESES}) )?al \d{{1,2}} de ({MESES})\b")
+# Slug con varias palabras o identificador numérico: típico de una nota puntual
+_SLUG_NOTA = re.compile(r"([a-z0-9]+-){3,}[a-z0-9]+|\d{5,}")
+
+
+def _contiene(texto, frases):
+    """Cantidad de ``frases`` (ya normalizadas) que aparecen como palabras completas en ``texto``."""
+    relleno = f" {texto} "
+    return sum(1 for frase in frases if f" {frase} " in relleno)
+
+
+class Prefiltro:
+    """
+    Clasificador local y barato que se aplica antes de la revisión con LLM de cada link. Calcula
+    rasgos a partir de la URL, el título y el texto (nomenclátor de localidades y sedes de Mendoza
+    tomado de ``sedes.csv``, palabras de eventos, patrones de fecha y heurísticas de URL de
+    portadas y listados) y los combina con un modelo lineal en una probabilidad de que el link
+    sea un evento válido.
+
+    Un link que menciona otra provincia nunca se acepta directamente: como mucho queda dudoso y
+    lo decide el LLM.
+    """
+
+    def __init__(self, sedes_df=None, pesos=None, umbral_rechazo=UMBRAL_RECHAZO,
+                 umbral_aceptacion=UMBRAL_ACEPTACION):
+        self.pesos = {**PESOS_POR_DEFECTO, **(pesos or {})}
+        self.umbral_rechazo = umbral_rechazo
+        self.umbral_aceptacion = umbral_aceptacion
+
+        localidades = set(DEPARTAMENTOS_MENDOZA)
+        self.sedes = []
+        if sedes_df is not None:
+            localidades |= {normalizar_texto(l) for l in sedes_df["Localidad"].dropna()}
+            # Sólo nombres de sede lo bastante específicos para no coincidir por casualidad
+            self.sedes = sorted({
+                n for n in (normalizar_texto(s) for s in sedes_df["Nombre"].dropna())
+                if len(n) >= 10 and len(n.split()) >= 2
+            })
+        self.localidades = sorted(l for l in localidades if l and l not in LOCALIDADES_AMBIGUAS)
+
+    @classmethod
+    def desde_archivos(cls, sedes_path=SEDES_PATH, pesos_path=PESOS_PATH):
+        """Prefiltro con el catálogo de sedes y, si existen, los pesos entrenados."""
+        pesos = None
+        if os.path.exists(pesos_path):
+            with open(pesos_path, "r", encoding="utf-8") as f:
+                pesos = json.load(f)
+        return cls(pd.read_csv(sedes_path, sep=";"), pesos=pesos)
+
+    def rasgos(self, titulo, link, texto):
+        titulo_norm = normalizar_texto(titulo)
+        texto_norm = normalizar_texto(texto)
+        partes = urlsplit(link or "")
+        segmentos = [s for s in partes.path.lower().split("/") if s]
+        ruta_norm = normalizar_texto(partes.path.replace("-", " "))
+        ultimo = segmentos[-1] if segmentos else ""
+
+        es_nota = bool(_SLUG_NOTA.search(ultimo))
+        es_listado = not es_nota and (
+            len(segmentos) <= 1
+            or bool(SEGMENTOS_LISTADO & set(segmentos[-2:]))
+            or ultimo.isdigit()
+        )
+        mendoza_titulo = _contiene(f"{titulo_norm} {ruta_norm}", self.localidades) > 0
+        otra_provincia = _contiene(f"{titulo_norm} {ruta_norm}", OTRAS_PROVINCIAS) > 0
+
+        return {
+            "sesgo": 1.0,
+            "url_listado": float(es_listado),
+            "url_nota": float(es_nota),
+            "otra_provincia": float(otra_provincia),
+            "mendoza_titulo": float(mendoza_titulo),
+            "mendoza_texto": min(_contiene(texto_norm, self.localidades), 5) / 5,
+            "sede": float(_contiene(texto_norm, self.sedes) > 0),
+            "evento_titulo": float(_contiene(titulo_norm, PALABRAS_EVENTO) > 0),
+            "evento_texto": min(_contiene(texto_norm, PALABRAS_EVENTO), 5) / 5,
+            "fecha": float(bool(PATRON_FECHA.search(texto_norm))),
+            "rango_fechas": float(bool(PATRON_RANGO_FECHAS.search(texto_norm))),
+            "inscripcion": float(_contiene(texto_norm, PALABRAS_INSCRIPCION) > 0),
+        }
+
+    def probabilidad(self, rasgos):
+        logit = sum(self.pesos.get(nombre, 0.0) * valor for nombre, valor in rasgos.items())
+        return 1 / (1 + math.exp(-logit))
+
+    def clasificar(self, titulo, link, texto):
+        """Devuelve ``(decision, probabilidad, rasgos)`` con decision RECHAZAR, ACEPTAR o DUDOSO."""
+        rasgos = self.rasgos(titulo, link, texto)
+        probabilidad = self.probabilidad(rasgos)
+        if probabilidad < self.umbral_rechazo:
+            decision = RECHAZAR
+        elif probabilidad > self.umbral_aceptacion and not rasgos["otra_provincia"]:
+            decision = ACEPTAR
+        else:
+            decision = DUDOSO
+        return decision, probabilidad, rasgos
+
+
+# ----- INSTANCIA COMPARTIDA -----
+
+_prefiltro = None
+_prefiltro_lock = threading.Lock()
+
+
+def obtener_prefiltro():
+    """Devuelve el ``Prefiltro`` compartido por el proceso (se carga una sola vez)."""
+    global _prefiltro
+    with _prefiltro_lock:
+        if _prefiltro is None:
+            _prefiltro = Prefiltro.desde_archivos()
+        return _prefiltro
+
+
+# ----- ENTRENAMIENTO -----
+
+def entrenar(ejemplos, iteraciones=2000, tasa=0.5, regularizacion=0.01):
+    """
+    Ajusta una regresión logística (descenso por gradiente con regularización L2) sobre
+    ``ejemplos``: lista de ``(rasgos, es_valido)``. Devuelve el diccionario de pesos.
+    """
+    nombres = list(PESOS_POR_DEFECTO)
+    X = np.array([[r.get(n, 0.0) for n in nombres] for r, _ in ejemplos], dtype=float)
+    y = np.array([float(v) for _, v in ejemplos])
+    w = np.array([PESOS_POR_DEFECTO[n] for n in nombres], dtype=float)
+
+    for _ in range(iteraciones):
+        p = 1 / (1 + np.exp(-X @ w))
+        gradiente = X.T @ (p - y) / len(y) + regularizacion * w
+        w -= tasa * gradiente
+    return dict(zip(nombres, w.round(4).tolist()))
+
+
+def entrenar_desde_estado(estado=None, path=PESOS_PATH, min_ejemplos=50):
+    """
+    Entrena el prefiltro con los veredictos que dio el LLM en corridas anteriores (guardados en
+    el estado del pipeline junto con los rasgos de cada link) y guarda los pesos en ``path``.
+    """
+    from scripts.estado import obtener_estado, ETAPA_REVISION, COMPLETADO, DESCARTADO
+
+    estado = estado or obtener_estado()
+    ejemplos = []
+    for estado_url, valido in ((COMPLETADO, True), (DESCARTADO, False)):
+        for _, datos in estado.datos(ETAPA_REVISION, estado=estado_url):
+            if datos and datos.get("origen") == "llm" and datos.get("rasgos"):
+                ejemplos.append((datos["rasgos"], valido))
+
+    if len(ejemplos) < min_ejemplos:
+        print(f"Hay {len(ejemplos)} veredictos del LLM; hacen falta al menos {min_ejemplos} para entrenar.")
+        return None
+
+    pesos = entrenar(ejemplos)
+    prefiltro = Prefiltro(pesos=pesos)
+    aciertos = sum((prefiltro.probabilidad(r) >= 0.5) == v for r, v in ejemplos)
+    print(f"Prefiltro entrenado con {len(ejemplos)} ejemplos. Exactitud: {aciertos / len(ejemplos):.1%}")
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(pesos, f, indent=2)
+    return pesos
+
+
+if __name__ == "__main__":
+    entrenar_desde_estado()
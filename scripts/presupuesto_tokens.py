@@ -0,0 +1,167 @@
+import re
+from scripts.normalizacion import normalizar_texto
+from scripts.prefiltro_links import (
+    obtener_prefiltro, PALABRAS_EVENTO, PALABRAS_INSCRIPCION, PATRON_FECHA, PATRON_RANGO_FECHAS
+)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+# Contexto, tokens por minuto (plan gratuito de Groq) y tokens reservados para la respuesta
+LIMITES_MODELOS = {
+    "gemma2-9b-it": {"contexto": 8192, "tpm": 15000, "respuesta": 1024},
+    "openai/gpt-oss-120b": {"contexto": 131072, "tpm": 8000, "respuesta": 1024},
+    "llama-3.3-70b-versatile": {"contexto": 131072, "tpm": 12000, "respuesta": 1024},
+    "gemini-2.0-flash": {"contexto": 1048576, "tpm": 1000000, "respuesta": 1024},
+}
+LIMITES_POR_DEFECTO = {"contexto": 8192, "tpm": 6000, "respuesta": 1024}
+
+# Una sola llamada no debería consumir más que esta fracción del límite por minuto
+FRACCION_TPM = 0.5
+# El tokenizador local no es el del modelo: se deja un margen para no pasarse
+MARGEN_TOKENIZADOR = 0.9
+# Estimación de caracteres por token en español si no hay tokenizador disponible
+CHARS_POR_TOKEN = 3.5
+ENCODING_TIKTOKEN = "o200k_base"
+
+# Segmentos más largos que esto se parten en oraciones antes de puntuarlos
+MAX_CHARS_SEGMENTO = 1000
+# Líneas del encabezado que arma ``extraccion_html`` con los metadatos de la página
+PREFIJOS_ENCABEZADO = ("Título:", "Descripción:", "Fechas publicadas:", "Evento declarado:")
+MARCA_RECORTE = "\n... [Contenido recortado al presupuesto de tokens]"
+
+_ORACIONES = re.compile(r"(?<=[.!?])\s+")
+_ANIO = re.compile(r"\b20\d{2}\b")
+
+_encoding = None
+
+
+# ----- CONTEO DE TOKENS -----
+
+def _obtener_encoding():
+    global _encoding
+    if _encoding is None:
+        _encoding = False
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding(ENCODING_TIKTOKEN)
+            except Exception as e:
+                # tiktoken descarga el vocabulario la primera vez: sin red se estima por caracteres
+                print(f"No se pudo cargar el tokenizador ({e}). Se estiman los tokens por caracteres.")
+    return _encoding
+
+
+def contar_tokens(texto):
+    """Cantidad aproximada de tokens de ``texto`` (con tiktoken si está disponible)."""
+    if not texto:
+        return 0
+    encoding = _obtener_encoding()
+    if encoding:
+        return len(encoding.encode(texto, disallowed_special=()))
+    return int(len(texto) / CHARS_POR_TOKEN) + 1
+
+
+def presupuesto_contenido(modelo, tokens_prompt=0, paginas=1):
+    """
+    Tokens de contenido web que se pueden enviar por página en una llamada a ``modelo``, una vez
+    descontados el prompt fijo y la respuesta. Se limita tanto por el contexto del modelo como
+    por una fracción del límite de tokens por minuto, para no agotarlo con una sola llamada.
+    """
+    limites = LIMITES_MODELOS.get(modelo, LIMITES_POR_DEFECTO)
+    por_contexto = limites["contexto"] - limites["respuesta"] - tokens_prompt
+    por_minuto = int(limites["tpm"] * FRACCION_TPM) - limites["respuesta"] - tokens_prompt
+    disponible = int(min(por_contexto, por_minuto) * MARGEN_TOKENIZADOR)
+    return max(disponible // max(paginas, 1), 0)
+
+
+# ----- SELECCIÓN DE SEGMENTOS -----
+
+def _segmentos(texto):
+    for linea in texto.split("\n"):
+        linea = linea.strip()
+        if not linea:
+            continue
+        if len(linea) <= MAX_CHARS_SEGMENTO:
+            yield linea
+            continue
+        trozo = ""
+        for oracion in _ORACIONES.split(linea):
+            if trozo and len(trozo) + len(oracion) > MAX_CHARS_SEGMENTO:
+                yield trozo
+                trozo = ""
+            trozo = f"{trozo} {oracion}".strip()
+        if trozo:
+            yield trozo
+
+
+def puntuar_segmento(segmento, posicion, total, sedes=(), localidades=()):
+    """
+    Relevancia de un segmento para decidir si describe un evento: fechas, sedes, localidades,
+    palabras de tipos de evento e inscripción. Los segmentos del principio (título, copete)
+    suman un poco más y las líneas muy cortas (restos de menús, botones) restan.
+    """
+    if segmento.startswith(PREFIJOS_ENCABEZADO):
+        return float("inf")
+
+    normalizado = f" {normalizar_texto(segmento)} "
+    puntaje = 0.0
+    if PATRON_RANGO_FECHAS.search(normalizado):
+        puntaje += 4
+    elif PATRON_FECHA.search(normalizado):
+        puntaje += 3
+    if _ANIO.search(normalizado):
+        puntaje += 1
+    if any(f" {sede} " in normalizado for sede in sedes):
+        puntaje += 3
+    if any(f" {localidad} " in normalizado for localidad in localidades):
+        puntaje += 2
+    if any(f" {palabra} " in normalizado for palabra in PALABRAS_EVENTO):
+        puntaje += 2
+    if any(f" {palabra} " in normalizado for palabra in PALABRAS_INSCRIPCION):
+        puntaje += 1
+    if len(segmento) < 25:
+        puntaje -= 1
+    return puntaje + 1.5 * (1 - posicion / max(total, 1))
+
+
+def ajustar_a_presupuesto(texto, max_tokens):
+    """
+    Reduce ``texto`` a ``max_tokens`` tokens quedándose con los segmentos más relevantes
+    (ver ``puntuar_segmento``) en su orden original. Si ya entra, se devuelve sin cambios.
+    """
+    if not texto or contar_tokens(texto) <= max_tokens:
+        return texto
+
+    segmentos = list(_segmentos(texto))
+    # Las sedes del catálogo se buscan una vez en todo el texto y luego sólo las que aparecen
+    texto_normalizado = f" {normalizar_texto(texto)} "
+    prefiltro = obtener_prefiltro()
+    sedes = [s for s in prefiltro.sedes if f" {s} " in texto_normalizado]
+    localidades = [l for l in prefiltro.localidades if f" {l} " in texto_normalizado]
+
+    puntajes = [
+        puntuar_segmento(segmento, i, len(segmentos), sedes, localidades)
+        for i, segmento in enumerate(segmentos)
+    ]
+    disponible = max_tokens - contar_tokens(MARCA_RECORTE)
+    elegidos = []
+    for i in sorted(range(len(segmentos)), key=lambda i: (-puntajes[i], i)):
+        tokens = contar_tokens(segmentos[i]) + 1
+        if tokens <= disponible:
+            elegidos.append(i)
+            disponible -= tokens
+
+    return "\n".join(segmentos[i] for i in sorted(elegidos)) + MARCA_RECORTE
+
+
+def ajustar_a_modelo(texto, modelo, prompt="", paginas=1):
+    """
+    Recorta el contenido web al presupuesto de ``modelo`` descontando el ``prompt`` fijo que lo
+    acompaña. Con ``paginas`` > 1 el presupuesto se reparte entre las páginas de un lote.
+    """
+    tokens_prompt = contar_tokens(prompt) if prompt else 0
+    return ajustar_a_presupuesto(texto, presupuesto_contenido(modelo, tokens_prompt, paginas))
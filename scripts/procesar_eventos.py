@@ -1,163 +1,285 @@
 import json
-from datetime import datetime
+import re
+from datetime import date, datetime
+import pandas as pd
+from scripts.indice_sedes import obtener_indice_sedes
+from scripts.normalizacion import normalizar_texto
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+TIPOS_EVENTO = [
+    "Asamblea", "Conferencia", "Congreso", "Convención", "Encuentro", "Foro", "Jornada",
+    "Seminario", "Simposio", "Exposición", "Feria", "Workshop", "Evento Deportivo Internacional",
+    "Incentivo", "Evento Cultural", "Evento Deportivo Nacional", "Otro tipo de evento"
+]
+DETALLES_ROTACION = [
+    "Local", "Provincial", "Nacional - Regional (Patagonia)", "Nacional - Regional (NOA)",
+    "Nacional - Regional (Litoral)", "Nacional - Regional (Centro)", "Nacional - Regional (Cuyo)",
+    "Nacional", "Internacional - Iberoamérica", "Internacional - Panamérica", "Internacional - Latinoamérica",
+    "Internacional - Sudamérica", "Internacional - Mercosur", "Internacional", "Único", "NS/NC"
+]
+TEMAS = [
+    "Acuático", "Agricultura y ganadería", "Ajedrez", "Alimentos", "Arquitectura",
+    "Arte y diseño", "Artes marciales y peleas", "Automotores", "Básquet",
+    "Bibliotecología", "Ciclismo", "Ciencias históricas y sociales", "Ciencias naturales y exactas",
+    "Comercio", "Comunicación", "Cosmética y tratamientos estéticos", "Cultura", "Danza",
+    "Deporte y ocio", "Derecho", "Diseño de indumentaria y moda", "Ecología y medio ambiente",
+    "Economía", "Educación", "Energía", "Entretenimiento, parques y atracciones", "Farmacia",
+    "Fisicoculturismo", "Fútbol", "Gastronomía", "Geografia", "Gobierno/Sindical", "Golf",
+    "Handball", "Hockey", "Industria/Industrial", "Lingüística", "Literatura", "Logística",
+    "Management y negocios", "Maratón", "Matemática y estadística", "Medicina", "Multideportes",
+    "Multisectorial", "Ns/Nc", "Odontología", "Otro", "Packaging y regalería", "Polo",
+    "Psicología", "Religión", "Rugby", "Seguridad", "Seguros", "Servicios", "Sóftbol",
+    "Tecnología", "Tenis, paddel o paleta", "Tiro con arco y flecha", "Transporte",
+    "Turismo y hotelería", "Veterinaria", "Vóley"
+]
+
+MESES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6, "julio": 7,
+    "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12
+}
+# Año que se asume cuando ni la fecha ni 'añoRaw' lo indican (el prompt también fija 2025)
+ANIO_POR_DEFECTO = 2025
+VALORES_SIN_FECHA = ["no proporcionada", "ns/nc", "null", "none", "nan", ""]
+# Respuestas que se acumulan antes de normalizarlas juntas en la corrida por etapas
+TAMANIO_LOTE = 200
+# Valores distintos recordados por cada catálogo de opciones
+MAX_CACHE_OPCIONES = 10000
+
+_MESES = "|".join(MESES)
+# Sobre texto normalizado (sin tildes ni puntuación): '1º' queda como '1o'
+_DIA = r"\d{1,2}(?:o)?"
+# 'del 10 al 12 de julio', '10, 11 y 12 de julio de 2025', 'del 30 de junio al 2 de julio'
+_RANGO_FECHAS = (
+    rf"(?P<dia_inicio>\d{{1,2}})(?:o)?(?: {_DIA})*(?: de (?P<mes_inicio>{_MESES}))? "
+    rf"(?:al|a|y|hasta el) (?:el )?(?P<dia_fin>\d{{1,2}})(?:o)? de (?P<mes_fin>{_MESES})"
+    rf"(?: (?:de |del )?(?P<anio>\d{{4}}))?"
+)
+# '10 de julio de 2025', 'martes 5 de agosto'
+_FECHA_TEXTO = rf"(?P<dia>\d{{1,2}})(?:o)? de (?P<mes>{_MESES})(?: (?:de |del )?(?P<anio>\d{{4}}))?"
+
+# Campos de texto de la respuesta del LLM -> columnas del evento, con su valor por defecto
+CAMPOS_TEXTO = {
+    'nombre': ('nombreEvento', 'Desconocido'),
+    'anio': ('añoRaw', str(ANIO_POR_DEFECTO)),
+    'mes': ('mesLiteralRaw', 'Desconocido'),
+    'dia_inicio': ('diaInicioRaw', 'Desconocido'),
+    'dia_fin': ('diaFinalRaw', 'Desconocido'),
+    'fecha_texto': ('fechaRaw', 'Desconocida'),
+    'agrupacion': ('agrupacion', 'Desconocido'),
+    # Mantenemos el campo raw de la sede
+    'sedeRaw': ('sedeRaw', 'Desconocido'),
+}
+# Valores fijos de todos los eventos
+CAMPOS_FIJOS = {
+    'categoria': "Académico",
+    'frecuencia': "Anual",
+    'provincia': "Mendoza",
+    'entidadOrganizadora': "-",
+}
+# Sede y organizador de la extracción combinada: sólo se incluyen si el LLM los devolvió, y
+# entonces corregir_sedes y asignar_entidades_organizadoras no vuelven a consultar al LLM
+CAMPOS_OPCIONALES = {'sedeOriginalLLM': 'sedePrincipal', 'entidadOriginalLLM': 'organizador'}
+COLUMNAS_FECHA = ['fecha_edicion', 'fecha_inicio', 'fecha_fin']
+# Orden de las columnas del evento procesado
+COLUMNAS_EVENTO = [
+    'nombre', 'tipo', 'detalle_tipo_rotacion', 'tema', 'fecha_edicion', 'fecha_inicio', 'fecha_fin',
+    'anio', 'mes', 'dia_inicio', 'dia_fin', 'fecha_texto', 'sitioWeb', 'categoria', 'frecuencia',
+    'agrupacion', 'provincia', 'entidadOrganizadora', 'sedeRaw', *CAMPOS_OPCIONALES, 'localidad'
+]
+
+_PATRON_RANGO_FECHAS = re.compile(_RANGO_FECHAS)
+_PATRON_FECHA_TEXTO = re.compile(_FECHA_TEXTO)
+
+
+# ----- MAPEO A LAS OPCIONES FIJAS -----
+
+class CatalogoOpciones:
+    """
+    Opciones fijas de un campo (tipo de evento, rotación, tema) preparadas para mapear el texto
+    libre del LLM: todas las opciones normalizadas forman una única expresión regular que recorre
+    el texto una sola vez, en lugar de un ``in`` con ``.lower()`` por opción, y cada valor distinto
+    se resuelve una sola vez por corrida.
+
+    Si el texto menciona varias opciones gana la que figura primero en la lista. Las opciones sólo
+    coinciden desde el comienzo de una palabra ('jornadas' sigue siendo Jornada, pero 'nacional' ya
+    no se encuentra dentro de 'internacional'). Sin coincidencias se devuelve ``por_defecto`` o, si
+    es None, el valor original.
+    """
+
+    def __init__(self, opciones, por_defecto=None):
+        self.opciones = list(opciones)
+        self.por_defecto = por_defecto
+        self._prioridad = {}
+        for posicion, opcion in enumerate(self.opciones):
+            self._prioridad.setdefault(normalizar_texto(opcion), posicion)
+        # En cada posición la alternativa más larga primero ('nacional regional cuyo' antes que 'nacional')
+        alternativas = sorted(self._prioridad, key=len, reverse=True)
+        self._patron = re.compile(r"(?=\b(" + "|".join(re.escape(a) for a in alternativas) + "))")
+        self._cache = {}
+
+    def mapear(self, valor):
+        valor = valor if isinstance(valor, str) else ("" if valor is None or pd.isna(valor) else str(valor))
+        resultado = self._cache.get(valor)
+        if resultado is None:
+            posiciones = [self._prioridad[m.group(1)] for m in self._patron.finditer(normalizar_texto(valor))]
+            if posiciones:
+                resultado = self.opciones[min(posiciones)]
+            else:
+                resultado = valor if self.por_defecto is None else self.por_defecto
+            if len(self._cache) >= MAX_CACHE_OPCIONES:
+                self._cache.clear()
+            self._cache[valor] = resultado
+        return resultado
+
+    def mapear_serie(self, serie):
+        """Mapea una columna completa resolviendo cada valor distinto una sola vez."""
+        serie = serie.astype(object).where(serie.notna(), "")
+        return serie.map({valor: self.mapear(valor) for valor in pd.unique(serie)})
+
+
+catalogo_tipos = CatalogoOpciones(TIPOS_EVENTO, "Otro tipo de evento")
+catalogo_rotaciones = CatalogoOpciones(DETALLES_ROTACION, "NS/NC")
+catalogo_temas = CatalogoOpciones(TEMAS)
 
 
 def mapear_tipo_evento(valor_extraido):
-    lista_tipos = [
-        "Asamblea", "Conferencia", "Congreso", "Convención", "Encuentro", "Foro", "Jornada",
-        "Seminario", "Simposio", "Exposición", "Feria", "Workshop", "Evento Deportivo Internacional",
-        "Incentivo", "Evento Cultural", "Evento Deportivo Nacional", "Otro tipo de evento"
-    ]
-    for tipo in lista_tipos:
-        if tipo.lower() in valor_extraido.lower():
-            return tipo
-    return "Otro tipo de evento"
+    return catalogo_tipos.mapear(valor_extraido)
 
 
 def mapear_detalle_rotacion(valor_extraido):
-    lista_rotacion = [
-        "Local", "Provincial", "Nacional - Regional (Patagonia)", "Nacional - Regional (NOA)",
-        "Nacional - Regional (Litoral)", "Nacional - Regional (Centro)", "Nacional - Regional (Cuyo)",
-        "Nacional", "Internacional - Iberoamérica", "Internacional - Panamérica", "Internacional - Latinoamérica",
-        "Internacional - Sudamérica", "Internacional - Mercosur", "Internacional", "Único", "NS/NC"
-    ]
-    for rotacion in lista_rotacion:
-        if rotacion.lower() in valor_extraido.lower():
-            return rotacion
-    return "NS/NC"
+    return catalogo_rotaciones.mapear(valor_extraido)
+
+
+def mapear_tema(valor_extraido):
+    return catalogo_temas.mapear(valor_extraido)
 
 
 def buscar_localidad_sede(nombre_sede, sedes_df):
+    """
+    Devuelve la localidad de la primera sede del catálogo cuyo nombre contiene ``nombre_sede``.
+    ``sedes_df`` puede ser el DataFrame de sedes o un ``SedeIndex`` ya construido.
+    """
     try:
-        fila = sedes_df[sedes_df['Nombre'].str.contains(
-            nombre_sede, case=False, na=False)]
-        if not fila.empty:
-            return fila.iloc[0]['Localidad']
-        else:
-            return "Desconocido"
+        return obtener_indice_sedes(sedes_df).localidad(nombre_sede)
     except Exception as e:
         print(f"Error al buscar localidad de sede '{nombre_sede}': {e}")
         return "Desconocido"
 
 
-def mapear_tema(valor_extraido):
-    lista_temas = [
-        "Acuático", "Agricultura y ganadería", "Ajedrez", "Alimentos", "Arquitectura",
-        "Arte y diseño", "Artes marciales y peleas", "Automotores", "Básquet",
-        "Bibliotecología", "Ciclismo", "Ciencias históricas y sociales", "Ciencias naturales y exactas",
-        "Comercio", "Comunicación", "Cosmética y tratamientos estéticos", "Cultura", "Danza",
-        "Deporte y ocio", "Derecho", "Diseño de indumentaria y moda", "Ecología y medio ambiente",
-        "Economía", "Educación", "Energía", "Entretenimiento, parques y atracciones", "Farmacia",
-        "Fisicoculturismo", "Fútbol", "Gastronomía", "Geografia", "Gobierno/Sindical", "Golf",
-        "Handball", "Hockey", "Industria/Industrial", "Lingüística", "Literatura", "Logística",
-        "Management y negocios", "Maratón", "Matemática y estadística", "Medicina", "Multideportes",
-        "Multisectorial", "Ns/Nc", "Odontología", "Otro", "Packaging y regalería", "Polo",
-        "Psicología", "Religión", "Rugby", "Seguridad", "Seguros", "Servicios", "Sóftbol",
-        "Tecnología", "Tenis, paddel o paleta", "Tiro con arco y flecha", "Transporte",
-        "Turismo y hotelería", "Veterinaria", "Vóley"
-    ]
-    for tema in lista_temas:
-        if tema.lower() in valor_extraido.lower():
-            return tema
-    return valor_extraido
+# ----- FECHAS -----
 
+def _anio(valor, por_defecto=ANIO_POR_DEFECTO):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return por_defecto
 
-def procesar_respuesta(raw_response, url, sedes_df):
-    """
-    Mapea los campos de la respuesta cruda a los campos del objeto JSON Evento.
-    """
-    raw_response = limpiar_raw_response(raw_response)
 
+def _fecha(anio, mes, dia):
     try:
-        datos = json.loads(raw_response)
-    except json.JSONDecodeError as e:
-        print(f"Error procesando JSON para {url}: {e}")
-        print(f"Respuesta cruda que causó el error: {raw_response}")
+        return date(anio, MESES[mes], int(dia))
+    except (KeyError, TypeError, ValueError):
         return None
 
-    procesado = {
-        'nombre': datos.get('nombreEvento', 'Desconocido'),
-        'tipo': mapear_tipo_evento(datos.get('tipoEvento', '')),
-        'detalle_tipo_rotacion': mapear_detalle_rotacion(datos.get('detalleTipoRotacion', '')),
-        'tema': mapear_tema(datos.get('tema', '')),
-        'fecha_edicion': formatear_fecha(datos.get('fechaEdicion')),
-        'fecha_inicio': formatear_fecha(datos.get('fechaInicio')),
-        'fecha_fin': formatear_fecha(datos.get('fechaFinalizacion')),
-        'anio': datos.get('añoRaw', '2025'),
-        'mes': datos.get('mesLiteralRaw', 'Desconocido'),
-        'dia_inicio': datos.get('diaInicioRaw', 'Desconocido'),
-        'dia_fin': datos.get('diaFinalRaw', 'Desconocido'),
-        'fecha_texto': datos.get('fechaRaw', 'Desconocida'),
-        'sitioWeb': url,
-        'categoria': "Académico",
-        'frecuencia': "Anual",
-        'agrupacion': datos.get('agrupacion', 'Desconocido'),
-        'provincia': "Mendoza",
-        'entidadOrganizadora': "-",
-        # Mantenemos el campo raw de la sede
-        'sedeRaw': datos.get('sedeRaw', 'Desconocido')
-    }
 
-    # El campo 'Localidad' del LLM se usa para buscar la 'localidad' final
-    nombre_sede_extraido = datos.get('Localidad', '')
-    procesado['localidad'] = buscar_localidad_sede(
-        nombre_sede_extraido, sedes_df)
+def rango_fechas(valor, anio_defecto=ANIO_POR_DEFECTO):
+    """
+    Interpreta una fecha devuelta por el LLM: AAAA-MM-DD, DD/MM/AAAA o texto en español ('10 de
+    julio de 2025', 'del 10 al 12 de julio', 'del 30 de junio al 2 de julio'). Sin año se usa
+    ``anio_defecto``. Devuelve ``(inicio, fin)`` como ``date`` (iguales para una fecha simple)
+    o ``(None, None)`` si no se pudo interpretar. Versión de a un valor de ``parsear_fechas``.
+    """
+    if valor is None or not isinstance(valor, (str, int)):
+        return None, None
+    texto = str(valor).strip()
+    if texto.lower() in VALORES_SIN_FECHA:
+        return None, None
+    for formato, recorte in (("%Y-%m-%d", 10), ("%d/%m/%Y", None)):
+        try:
+            fecha = datetime.strptime(texto[:recorte], formato).date()
+            return fecha, fecha
+        except ValueError:
+            pass
 
-    return procesado
+    normalizado = normalizar_texto(texto)
+    rango = _PATRON_RANGO_FECHAS.search(normalizado)
+    if rango:
+        mes_inicio = rango["mes_inicio"] or rango["mes_fin"]
+        anio = _anio(rango["anio"], anio_defecto)
+        # 'del 30 de diciembre al 2 de enero': el inicio es del año anterior
+        anio_inicio = anio - 1 if MESES[mes_inicio] > MESES[rango["mes_fin"]] else anio
+        inicio = _fecha(anio_inicio, mes_inicio, rango["dia_inicio"])
+        fin = _fecha(anio, rango["mes_fin"], rango["dia_fin"])
+        if inicio or fin:
+            return inicio, fin
+    simple = _PATRON_FECHA_TEXTO.search(normalizado)
+    if simple:
+        fecha = _fecha(_anio(simple["anio"], anio_defecto), simple["mes"], simple["dia"])
+        return fecha, fecha
+    return None, None
 
 
 def formatear_fecha(fecha_str):
     """
-    Estandariza las fechas en formato YYYY/MM/DD
+    Estandariza las fechas en formato YYYY/MM/DD (ver ``rango_fechas``). Si no se pudo convertir
+    se retorna None para que SQLAlchemy inserte NULL.
     """
-    if not fecha_str:
-        return None
-    fecha_str = fecha_str.strip()
-    if fecha_str.lower() in ["no proporcionada", "ns/nc", "null", ""]:
-        return None
-    try:
-        dt = datetime.strptime(fecha_str, "%Y-%m-%d")
-        return dt.date()
-    except ValueError:
-        pass
-    try:
-        if "/" in fecha_str:
-            dt = datetime.strptime(fecha_str, "%d/%m/%Y")
-            return dt.date()
-    except ValueError:
-        pass
-    # Si la fecha tiene formato en texto:
-    if " de " in fecha_str:
-        try:
-            partes = fecha_str.split(" de ")
-            if len(partes) >= 3:
-                day = partes[0]
-                month_text = partes[1].lower().strip()
-                year = partes[2].split()[0]
-
-                # Usar el año actual si no se especifica
-                if not year.isdigit():  # Si el año no es un número, asumir 2025
-                    year_val = 2025
-                else:
-                    year_val = int(year)
-
-                meses = {
-                    "enero": "01", "febrero": "02", "marzo": "03", "abril": "04",
-                    "mayo": "05", "junio": "06", "julio": "07", "agosto": "08",
-                    "septiembre": "09", "setiembre": "09", "octubre": "10",
-                    "noviembre": "11", "diciembre": "12"
-                }
-                mes_num = meses.get(month_text, "01")
-                day_num = int(day)
-
-                return datetime.date(year_val, int(mes_num), day_num)
-        except Exception as e:
-            print(f"Error al parsear fecha '{fecha_str}': {e}")
-            pass
-    # Si no se pudo convertir, se retorna None para que SQLAlchemy inserte NULL
-    return None
+    return rango_fechas(fecha_str)[0]
+
+
+def _componer_fecha(anio, mes, dia):
+    return pd.to_datetime(pd.DataFrame({
+        "year": pd.to_numeric(anio, errors="coerce"),
+        "month": mes.map(MESES),
+        "day": pd.to_numeric(dia, errors="coerce"),
+    }), errors="coerce")
+
+
+def parsear_fechas(serie, anio_defecto=ANIO_POR_DEFECTO):
+    """
+    Versión vectorizada de ``rango_fechas`` para una columna completa. Los formatos numéricos se
+    convierten con ``pd.to_datetime`` y sólo el resto se normaliza y se busca con las expresiones
+    de texto en español. ``anio_defecto`` puede ser un escalar o una Serie alineada ('añoRaw').
+
+    Devuelve un DataFrame con las columnas ``inicio`` y ``fin`` (``datetime64``, NaT si no se
+    pudo interpretar).
+    """
+    texto = serie.astype(object).where(serie.map(lambda v: isinstance(v, (str, int))), None).astype("string")
+    texto = texto.str.strip()
+    texto = texto.mask(texto.str.lower().isin(VALORES_SIN_FECHA))
+
+    exacta = pd.to_datetime(texto.str.slice(0, 10), format="%Y-%m-%d", errors="coerce")
+    exacta = exacta.fillna(pd.to_datetime(texto, format="%d/%m/%Y", errors="coerce"))
+    inicio, fin = exacta.copy(), exacta.copy()
+
+    pendientes = texto.notna() & exacta.isna()
+    if pendientes.any():
+        anios = pd.Series(anio_defecto, index=serie.index)
+        anios = pd.to_numeric(anios, errors="coerce").fillna(ANIO_POR_DEFECTO)[pendientes]
+        normalizado = texto[pendientes].astype(object)
+        normalizado = normalizado.map({valor: normalizar_texto(valor) for valor in pd.unique(normalizado)})
+
+        rango = normalizado.str.extract(_PATRON_RANGO_FECHAS)
+        mes_inicio = rango["mes_inicio"].where(rango["mes_inicio"].notna(), rango["mes_fin"])
+        anio_rango = pd.to_numeric(rango["anio"], errors="coerce").fillna(anios)
+        cruza_anio = (mes_inicio.map(MESES) > rango["mes_fin"].map(MESES)).astype(int)
+        inicio_rango = _componer_fecha(anio_rango - cruza_anio, mes_inicio, rango["dia_inicio"])
+        fin_rango = _componer_fecha(anio_rango, rango["mes_fin"], rango["dia_fin"])
+        hay_rango = inicio_rango.notna() | fin_rango.notna()
+
+        simple = normalizado.str.extract(_PATRON_FECHA_TEXTO)
+        fecha_simple = _componer_fecha(
+            pd.to_numeric(simple["anio"], errors="coerce").fillna(anios), simple["mes"], simple["dia"])
+
+        inicio[pendientes] = inicio_rango.where(hay_rango, fecha_simple)
+        fin[pendientes] = fin_rango.where(hay_rango, fecha_simple)
+
+    return pd.DataFrame({"inicio": inicio, "fin": fin}, index=serie.index)
 
 
+# ----- NORMALIZACIÓN DE RESPUESTAS -----
+
 def limpiar_raw_response(raw_response):
     """
     Elimina delimitadores Markdown (triple backticks y etiquetas de lenguaje) de la respuesta.
@@ -170,3 +292,130 @@ def limpiar_raw_response(raw_response):
             lines = lines[:-1]
         return "\n".join(lines).strip()
     return raw_response
+
+
+def _leer_respuesta(raw_response, url):
+    raw_response = limpiar_raw_response(raw_response)
+    try:
+        datos = json.loads(raw_response)
+    except json.JSONDecodeError as e:
+        print(f"Error procesando JSON para {url}: {e}")
+        print(f"Respuesta cruda que causó el error: {raw_response}")
+        return None
+    if not isinstance(datos, dict):
+        print(f"Error procesando JSON para {url}: se esperaba un objeto y se recibió {type(datos).__name__}")
+        return None
+    return datos
+
+
+def _texto(valor, por_defecto):
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return por_defecto
+    return valor.strip() if isinstance(valor, str) else str(valor)
+
+
+def _opcional(valor):
+    valor = _texto(valor, "")
+    return valor or None
+
+
+def _columna_texto(serie, por_defecto):
+    """``_texto`` aplicado a una columna completa."""
+    return serie.where(serie.notna(), por_defecto).astype(str).str.strip().astype("string")
+
+
+def procesar_respuesta(raw_response, url, sedes_df):
+    """
+    Mapea los campos de la respuesta cruda a los campos del objeto JSON Evento.
+    Para las respuestas de toda una corrida conviene ``normalizar_respuestas``.
+    """
+    datos = _leer_respuesta(raw_response, url)
+    if datos is None:
+        return None
+
+    anio = _anio(datos.get('añoRaw'))
+    inicio_texto, fin_texto = rango_fechas(datos.get('fechaRaw'), anio)
+    procesado = {
+        **{destino: _texto(datos.get(campo), defecto) for destino, (campo, defecto) in CAMPOS_TEXTO.items()},
+        **CAMPOS_FIJOS,
+        'tipo': mapear_tipo_evento(datos.get('tipoEvento')),
+        'detalle_tipo_rotacion': mapear_detalle_rotacion(datos.get('detalleTipoRotacion')),
+        'tema': mapear_tema(datos.get('tema')),
+        'fecha_edicion': rango_fechas(datos.get('fechaEdicion'), anio)[0],
+        'fecha_inicio': rango_fechas(datos.get('fechaInicio'), anio)[0] or inicio_texto,
+        'fecha_fin': rango_fechas(datos.get('fechaFinalizacion'), anio)[1] or fin_texto,
+        'sitioWeb': url,
+    }
+    for destino, campo in CAMPOS_OPCIONALES.items():
+        if _opcional(datos.get(campo)):
+            procesado[destino] = _opcional(datos.get(campo))
+
+    # El campo 'Localidad' del LLM se usa para buscar la 'localidad' final
+    procesado['localidad'] = buscar_localidad_sede(datos.get('Localidad', ''), sedes_df)
+
+    return {columna: procesado[columna] for columna in COLUMNAS_EVENTO if columna in procesado}
+
+
+def normalizar_respuestas(respuestas, sedes_df):
+    """
+    Versión por lotes de ``procesar_respuesta`` para las respuestas de toda una corrida.
+    ``respuestas`` es un iterable de ``(raw_response, url)``; las que no son un objeto JSON
+    válido se informan y se omiten. Cada valor distinto de tipo, rotación, tema y localidad se
+    resuelve una sola vez y las fechas se interpretan por columna con ``parsear_fechas``.
+
+    Devuelve un DataFrame tipado con una fila por evento: tipo y rotación como categorías, fechas
+    como ``datetime64`` y el resto como texto. ``registros_evento`` lo convierte a diccionarios.
+    """
+    filas, urls = [], []
+    for raw_response, url in respuestas:
+        datos = _leer_respuesta(raw_response, url)
+        if datos is not None:
+            filas.append(datos)
+            urls.append(url)
+    # dtype object: una columna de enteros con faltantes no pasa a float ('2025' y no '2025.0')
+    datos = pd.DataFrame(filas, dtype=object)
+    vacia = pd.Series(None, index=datos.index, dtype=object)
+
+    def columna(campo):
+        return datos[campo] if campo in datos.columns else vacia
+
+    anios = pd.to_numeric(columna('añoRaw'), errors="coerce")
+    fechas_texto = parsear_fechas(columna('fechaRaw'), anios)
+    localidades = columna('Localidad').map(lambda v: _texto(v, ""))
+    indice_sedes = obtener_indice_sedes(sedes_df) if len(datos) else None
+
+    procesado = {
+        **{destino: _columna_texto(columna(campo), defecto) for destino, (campo, defecto) in CAMPOS_TEXTO.items()},
+        **{destino: pd.Series(valor, index=datos.index, dtype="string") for destino, valor in CAMPOS_FIJOS.items()},
+        'tipo': catalogo_tipos.mapear_serie(columna('tipoEvento')).astype(pd.CategoricalDtype(TIPOS_EVENTO)),
+        'detalle_tipo_rotacion': catalogo_rotaciones.mapear_serie(
+            columna('detalleTipoRotacion')).astype(pd.CategoricalDtype(DETALLES_ROTACION)),
+        'tema': catalogo_temas.mapear_serie(columna('tema')).astype("string"),
+        'fecha_edicion': parsear_fechas(columna('fechaEdicion'), anios)["inicio"],
+        'fecha_inicio': parsear_fechas(columna('fechaInicio'), anios)["inicio"].fillna(fechas_texto["inicio"]),
+        'fecha_fin': parsear_fechas(columna('fechaFinalizacion'), anios)["fin"].fillna(fechas_texto["fin"]),
+        'sitioWeb': pd.Series(urls, index=datos.index, dtype="string"),
+        **{destino: columna(campo).map(_opcional).astype("string") for destino, campo in CAMPOS_OPCIONALES.items()},
+        'localidad': localidades.map(
+            {nombre: buscar_localidad_sede(nombre, indice_sedes) for nombre in pd.unique(localidades)}
+        ).astype("string"),
+    }
+    return pd.DataFrame({columna: procesado[columna] for columna in COLUMNAS_EVENTO}, index=datos.index)
+
+
+def registros_evento(df):
+    """
+    Filas de ``normalizar_respuestas`` como los diccionarios de ``procesar_respuesta``: fechas
+    como ``date``, faltantes como None y sin las columnas opcionales vacías.
+    """
+    salida = df.copy()
+    for columna in COLUMNAS_FECHA:
+        salida[columna] = salida[columna].dt.date
+    salida = salida.astype(object).where(salida.notna(), None)
+
+    registros = salida.to_dict(orient="records")
+    for registro in registros:
+        for columna in CAMPOS_OPCIONALES:
+            if registro.get(columna) is None:
+                registro.pop(columna, None)
+    return registros
@@ -136,130 +136,333 @@ def revisar_links():
 
 revisar_links() """
 
-from groq import Groq, RateLimitError
+from groq import Groq
 import pandas as pd
 from dotenv import load_dotenv
-import os, json, requests
-from bs4 import BeautifulSoup
+import os, json, re
+from scripts.crawler import iterar_paginas
+from scripts.router_llm import RouterLLM, SinModelosDisponibles
+from scripts.presupuesto_tokens import ajustar_a_modelo
+from scripts.estado import obtener_estado, ETAPA_REVISION, COMPLETADO, DESCARTADO, ERROR
+from scripts.prefiltro_links import obtener_prefiltro, RECHAZAR, ACEPTAR, DUDOSO
+from scripts.metricas import metricas
+from scripts import almacen
 
 load_dotenv()
 
 client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 
-def extraer_contenido_web(url):
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
+VERSION_PROMPT_REVISION = "revision-v1"
+VERSION_PROMPT_REVISION_LOTE = "revision-lote-v1"
+
+MODELO_REVISION = "openai/gpt-oss-120b"
+router_revision = RouterLLM.desde_entorno(client, MODELO_REVISION)
+
+# Páginas que se revisan juntas en un mismo request
+TAMANIO_LOTE = 3
+
+CRITERIOS_REVISION = (
+    "Para que el evento sea considerado válido debe cumplir con las "
+    "siguientes características obligatorias:\n"
+    "- Debe consistir en una reunión de personas con un tema definido\n"
+    "- Debe ocurrir en una fecha determinada o periodo determinado. Por "
+    "ejemplo, el evento puede ser el 10/08/2025 o puede iniciar en esa "
+    "fecha y extenderse hasta el 15/08/2025.\n"
+    "- Debe estar situado en la provincia de Mendoza, Argentina. Cualquier "
+    "otra ubicación no es válida.\n"
+    "Ten en cuenta que el evento puede estar publicado por un medio o página"
+    "de Mendoza pero ocurrir en otra provincia o país, en ese caso **NO** es válido. "
+)
 
-        for script_or_style in soup(['script', 'style']):
-            script_or_style.decompose()
 
-        text_content = soup.get_text()
+def revisar_link(titulo, link, contenido_web):
+    """
+    Envía el contenido de una página al LLM para que decida si describe un evento válido.
+    Devuelve el diccionario {'titulo', 'link'} si es válido o None si no lo es (o si la
+    respuesta no se pudo interpretar). Propaga ``SinModelosDisponibles`` si todos los modelos
+    de la cadena de revisión están agotados.
+    """
+    prompt = (
+        "Eres un asistente que revisa publicaciones en internet para encontrar "
+        "eventos de reuniones. Vas a revisar contenido web extraído de diferentes sitios. "
+        + CRITERIOS_REVISION +
+        "En caso de que cumpla **TODAS** las condiciones, vas a devolver el "
+        f"título: {titulo} del evento y el link: {link} en un objeto JSON con las "
+        "propiedades 'titulo' y 'link'. NO RESPONDAS NADA MÁS QUE LOS DATOS "
+        "QUE TE SOLICITO, SOLO ESOS DOS CAMPOS. No agregues triple backtick ni "
+        "la palabra 'json'. "
+        "En caso de que el evento **NO SEA VÁLIDO** responde solo 'No es válido'."
+    )
+    contenido_web = ajustar_a_modelo(contenido_web, MODELO_REVISION, prompt)
+
+    contenido = router_revision.completar(
+        messages=[
+            {
+                "role": "system",
+                "content": prompt
+            },
+            {
+                "role": "user",
+                "content": f"Contenido web a revisar: {contenido_web}."
+            }
+        ],
+        version_prompt=VERSION_PROMPT_REVISION,
+        # El prompt incluye título y link, así que también forman parte de la clave
+        contenido=f"{titulo}\n{link}\n{contenido_web}",
+        validar=_respuesta_revision_valida,
+        stream=False
+    )
 
-        lines = (line.strip() for line_cnt, line in enumerate(
-            text_content.splitlines()) if line_cnt < 1000)
-        chunks = (phrase.strip() for phrase in ' '.join(lines).split("  "))
-        cleaned_text = '\n'.join(chunk for chunk in chunks if chunk)
+    contenido = (contenido or "").strip()
 
-        max_chars = 15000
-        if len(cleaned_text) > max_chars:
-            cleaned_text = cleaned_text[:max_chars] + \
-                "\n... [Contenido truncado para brevedad]"
+    print("RESPUESTA DE GENERAR LINK:", contenido)
 
-        return cleaned_text
-    except requests.exceptions.RequestException as e:
-        print(f"Error al acceder a la URL {url}: {e}")
+    if contenido == "No es válido":
         return None
+
+    try:
+        return json.loads(contenido)
     except Exception as e:
-        print(f"Error al procesar el contenido de {url}: {e}")
+        print("La respuesta del LLM no es un JSON válido")
+        print(f"{e}")
         return None
 
-def revisar_links():
+
+def _respuesta_revision_valida(contenido):
+    """Sólo se guardan en el caché los 'No es válido' y los JSON que se pueden leer."""
+    contenido = (contenido or "").strip()
+    if contenido == "No es válido":
+        return True
+    try:
+        json.loads(contenido)
+    except ValueError:
+        return False
+    return True
+
+
+def _interpretar_lote(contenido, cantidad):
     """
-    Itera sobre los links obtenidos de ```busqueda_eventos```, descarga el contenido de la página con
-    BeautifulSoup y se lo envía a un LLM para que revise si es un evento relevante o si es basura.
-    Genera un archivo CSV con los links que pasaron el filtro.
+    Interpreta la respuesta de una revisión por lotes. Devuelve ``{numero: valido}`` sólo con los
+    items que se pudieron leer sin ambigüedad; los que falten se revisan de a uno.
     """
+    contenido = re.sub(r"^```(json)?|```$", "", (contenido or "").strip()).strip()
+    inicio, fin = contenido.find("["), contenido.rfind("]")
+    if inicio == -1 or fin < inicio:
+        return {}
     try:
-        df = pd.read_csv("./data/resultados_busqueda.csv", sep=";", low_memory=False)
-    except FileNotFoundError:
-        print("No se encontró el archivo ./data/resultados_busqueda.csv. Ejecute search.py primero.")
-        return
-        
-    lineas = []
-    for index, row in df.iterrows():
-        titulo = row['title']
-        link = row['link']
-        
-        contenido_web = extraer_contenido_web(link)
-        
-        if contenido_web is None:
+        items = json.loads(contenido[inicio:fin + 1])
+    except ValueError:
+        return {}
+
+    veredictos = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
             continue
+        try:
+            numero = int(item.get("item"))
+        except (TypeError, ValueError):
+            continue
+        valido = item.get("valido")
+        if isinstance(valido, str):
+            valido = {"si": True, "sí": True, "true": True, "no": False, "false": False}.get(valido.strip().lower())
+        if not isinstance(valido, bool) or not 1 <= numero <= cantidad:
+            continue
+        if numero in veredictos and veredictos[numero] != valido:
+            # Veredictos contradictorios para el mismo item: se revisa de a uno
+            veredictos[numero] = None
+        else:
+            veredictos.setdefault(numero, valido)
+    return {numero: valido for numero, valido in veredictos.items() if valido is not None}
 
-        prompt = (
-            "Eres un asistente que revisa publicaciones en internet para encontrar "
-            "eventos de reuniones. Vas a revisar contenido web extraído de diferentes sitios. "
-            "Para que el evento sea considerado válido debe cumplir con las "
-            "siguientes características obligatorias:\n"
-            "- Debe consistir en una reunión de personas con un tema definido\n"
-            "- Debe ocurrir en una fecha determinada o periodo determinado. Por "
-            "ejemplo, el evento puede ser el 10/08/2025 o puede iniciar en esa "
-            "fecha y extenderse hasta el 15/08/2025.\n"
-            "- Debe estar situado en la provincia de Mendoza, Argentina. Cualquier "
-            "otra ubicación no es válida.\n"
-            "Ten en cuenta que el evento puede estar publicado por un medio o página"
-            "de Mendoza pero ocurrir en otra provincia o país, en ese caso **NO** es válido. "
-            "En caso de que cumpla **TODAS** las condiciones, vas a devolver el "
-            f"título: {titulo} del evento y el link: {link} en un objeto JSON con las "
-            "propiedades 'titulo' y 'link'. NO RESPONDAS NADA MÁS QUE LOS DATOS "
-            "QUE TE SOLICITO, SOLO ESOS DOS CAMPOS. No agregues triple backtick ni "
-            "la palabra 'json'. "
-            "En caso de que el evento **NO SEA VÁLIDO** responde solo 'No es válido'."
+
+def revisar_lote(paginas):
+    """
+    Revisa varias páginas en un único request: el prompt con los criterios se envía una sola
+    vez y cada página va numerada y recortada a su parte del presupuesto de tokens. El LLM responde un
+    arreglo JSON con un objeto ``{"item", "valido"}`` por página.
+
+    ``paginas`` es una lista de ``(titulo, link, texto)``. Devuelve una lista alineada con ella:
+    {'titulo', 'link'} si la página es válida, None si no lo es, y se revisa de a uno con
+    ``revisar_link`` cada página cuyo veredicto no se pudo interpretar.
+    """
+    prompt = (
+        "Eres un asistente que revisa publicaciones en internet para encontrar "
+        "eventos de reuniones. Vas a revisar el contenido web de varias páginas numeradas. "
+        + CRITERIOS_REVISION +
+        "Evalúa cada página por separado. Responde ÚNICAMENTE un arreglo JSON con un objeto "
+        "por página, en el mismo orden, con las propiedades 'item' (el número de la página) y "
+        "'valido' (true si cumple **TODAS** las condiciones, false si no). Por ejemplo: "
+        '[{"item": 1, "valido": false}, {"item": 2, "valido": true}]. '
+        "No agregues triple backtick, la palabra 'json' ni ningún otro texto."
+    )
+    bloques = [
+        f"### Página {numero}\nTítulo: {titulo}\nLink: {link}\n"
+        f"Contenido: {ajustar_a_modelo(texto, MODELO_REVISION, prompt, paginas=len(paginas))}"
+        for numero, (titulo, link, texto) in enumerate(paginas, start=1)
+    ]
+    contenido_lote = "\n\n".join(bloques)
+
+    try:
+        contenido = router_revision.completar(
+            messages=[
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": f"Páginas a revisar ({len(paginas)}):\n\n{contenido_lote}"}
+            ],
+            version_prompt=VERSION_PROMPT_REVISION_LOTE,
+            contenido=contenido_lote,
+            # Una respuesta a la que le falten veredictos no se guarda: se vuelve a pedir
+            validar=lambda respuesta: len(_interpretar_lote(respuesta, len(paginas))) == len(paginas),
+            stream=False
         )
+    except SinModelosDisponibles:
+        raise
+    except Exception as e:
+        print(f"Error en la revisión por lote ({e}). Se revisa de a una página.")
+        contenido = None
+    veredictos = _interpretar_lote(contenido, len(paginas))
+    print(f"Revisión por lote: {len(veredictos)}/{len(paginas)} veredictos interpretados")
+
+    resultados = []
+    for numero, (titulo, link, texto) in enumerate(paginas, start=1):
+        if numero not in veredictos:
+            resultados.append(revisar_link(titulo, link, texto))
+        elif veredictos[numero]:
+            resultados.append({"titulo": titulo, "link": link})
+        else:
+            resultados.append(None)
+    return resultados
+
+
+def _prefiltrar(titulo, link, texto, prefiltro):
+    """Aplica el prefiltro y devuelve ``(decision, linea, detalle)``."""
+    decision, probabilidad, rasgos = prefiltro.clasificar(titulo, link, texto)
+    metricas.incrementar("prefiltro_decisiones", decision=decision)
+    detalle = {"origen": "prefiltro", "probabilidad": round(probabilidad, 4), "rasgos": rasgos}
+    linea = None
+    if decision == RECHAZAR:
+        print(f"Prefiltro: descartado sin LLM ({probabilidad:.2f}): {link}")
+    elif decision == ACEPTAR:
+        print(f"Prefiltro: aceptado sin LLM ({probabilidad:.2f}): {link}")
+        linea = {"titulo": titulo, "link": link}
+    else:
+        detalle["origen"] = "llm"
+    return decision, linea, detalle
 
-        try:
-            print(f"Revisando link {index + 1}/{len(df)}: {link}")
-            response = client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Contenido web a revisar: {contenido_web}."
-                    }
-                ],
-                model="openai/gpt-oss-120b",
-                stream=False
-            )
-
-            contenido = response.choices[0].message.content.strip()
-            
-            print("RESPUESTA DE GENERAR LINK:", contenido)
-
-            if contenido == "No es válido":
-                continue
 
-            try:
-                data_json = json.loads(contenido)
-                lineas.append(data_json)
-            except Exception as e:
-                print("La respuesta del LLM no es un JSON válido")
-                print(f"{e}")
-                continue
+def revisar_pagina(titulo, link, texto, prefiltro=None):
+    """
+    Revisa una página en dos pasos: primero el prefiltro local, que resuelve sin LLM los casos
+    claros (portadas, listados, eventos de otras provincias, o eventos con sede, fecha y tipo
+    evidentes), y sólo si queda en duda se consulta a ``revisar_link``.
+
+    Devuelve ``(linea, detalle)``: ``linea`` es {'titulo', 'link'} si el link es válido o None, y
+    ``detalle`` indica quién decidió (``origen``), la probabilidad del prefiltro y sus rasgos, para
+    registrarlo en el estado y poder reentrenar el prefiltro con los veredictos del LLM.
+    """
+    decision, linea, detalle = _prefiltrar(titulo, link, texto, prefiltro or obtener_prefiltro())
+    if decision != DUDOSO:
+        return linea, detalle
+
+    valido = revisar_link(titulo, link, texto)
+    if not valido:
+        return None, detalle
+    return {"titulo": valido.get("titulo", titulo), "link": link}, detalle
 
-        except RateLimitError:
-            print("Límite de requests de Groq alcanzado. Guardando progreso y saliendo.")
-            break
-        except json.JSONDecodeError:
-            print(f"Error al parsear JSON en link: {link}. Contenido: {contenido}")
+
+def revisar_paginas(paginas, prefiltro=None, tamanio_lote=TAMANIO_LOTE):
+    """
+    Versión por lotes de ``revisar_pagina``. Recibe un iterable de ``(titulo, link, texto)`` y
+    genera ``(link, linea, detalle)`` a medida que se resuelve cada página: las que decide el
+    prefiltro salen enseguida y las dudosas se acumulan hasta completar un lote de
+    ``tamanio_lote`` para enviarlas al LLM en un solo request.
+    """
+    prefiltro = prefiltro or obtener_prefiltro()
+    lote = []
+
+    def enviar_lote():
+        if len(lote) == 1:
+            titulo, link, texto, detalle = lote[0]
+            valido = revisar_link(titulo, link, texto)
+            resultados = [{"titulo": valido.get("titulo", titulo), "link": link} if valido else None]
+        else:
+            resultados = revisar_lote([(titulo, link, texto) for titulo, link, texto, _ in lote])
+        for (_, link, _, detalle), linea in zip(lote, resultados):
+            yield link, linea, detalle
+        lote.clear()
+
+    for titulo, link, texto in paginas:
+        decision, linea, detalle = _prefiltrar(titulo, link, texto, prefiltro)
+        if decision != DUDOSO:
+            yield link, linea, detalle
             continue
+        lote.append((titulo, link, texto, detalle))
+        if len(lote) >= tamanio_lote:
+            yield from enviar_lote()
+    if lote:
+        yield from enviar_lote()
+
+
+def revisar_links(tamanio_lote=TAMANIO_LOTE):
+    """
+    Itera sobre los links obtenidos de ```busqueda_eventos```, descarga el contenido de las páginas en
+    paralelo con el crawler y se lo envía a un LLM para que revise si es un evento relevante o si es basura.
+    Genera un archivo CSV con los links que pasaron el filtro.
+
+    Las páginas que el prefiltro no resuelve se envían al LLM de a ``tamanio_lote`` por request
+    (``tamanio_lote=1`` revisa de a una).
 
+    El veredicto de cada link queda registrado en el estado del pipeline apenas se obtiene, así que
+    una corrida interrumpida retoma desde el primer link sin revisar.
+    """
+    estado = obtener_estado()
+
+    # Del historial de búsqueda sólo se leen el título y el link de los que faltan revisar:
+    # el filtro se aplica al escanear el dataset, sin cargar las corridas anteriores completas
+    resueltos = estado.resueltas(ETAPA_REVISION)
+    df = almacen.leer(almacen.RESULTADOS_BUSQUEDA, columnas=['title', 'link'],
+                      filtros=[('link', 'not in', list(resueltos))] if resueltos else None)
+    if df.empty and not resueltos:
+        print("No hay resultados de búsqueda guardados. Ejecute search.py primero.")
+        return
+
+    # Las páginas se descargan en paralelo y se revisan a medida que van llegando
+    titulos = dict(zip(df['link'], df['title']))
+    pendientes = list(titulos)
+    total = len(pendientes)
+    if resueltos:
+        print(f"{len(resueltos)} links ya fueron revisados en corridas anteriores.")
+
+    def paginas_descargadas():
+        for link, pagina in iterar_paginas(pendientes):
+            if pagina is None:
+                estado.registrar(link, ETAPA_REVISION, ERROR)
+                continue
+            yield titulos[link], link, pagina["texto"]
+
+    try:
+        revisadas = revisar_paginas(paginas_descargadas(), tamanio_lote=tamanio_lote)
+        for index, (link, linea, detalle) in enumerate(revisadas):
+            print(f"Link revisado {index + 1}/{total}: {link}")
+            if linea:
+                estado.registrar(link, ETAPA_REVISION, COMPLETADO, {**linea, **detalle})
+            else:
+                estado.registrar(link, ETAPA_REVISION, DESCARTADO, detalle)
+
+    except SinModelosDisponibles:
+        # Todos los modelos de la cadena agotaron su cuota (el router ya pasó por cada uno).
+        # Los links del lote en curso quedan sin registrar y se revisan en la próxima corrida.
+        print("Ningún modelo disponible para la revisión. Guardando progreso y saliendo.")
+
+    # Se agregan al dataset los links válidos que todavía no estaban (los de esta corrida y los de
+    # una anterior que se cortó antes de guardarlos)
+    guardados = set(almacen.leer(almacen.LINKS_REVISADOS, columnas=["link"])["link"])
+    lineas = [
+        {"titulo": datos["titulo"], "link": datos["link"]}
+        for _, datos in estado.datos(ETAPA_REVISION)
+        if datos["link"] not in guardados
+    ]
     if lineas:
-        datos = pd.DataFrame(lineas)
-        datos.to_csv("./data/links_eventos_revisados.csv", sep=";", index=False)
-        print(f"Se guardaron {len(lineas)} links revisados en ./data/links_eventos_revisados.csv")
+        almacen.agregar(almacen.LINKS_REVISADOS, pd.DataFrame(lineas))
+        print(f"Se guardaron {len(lineas)} links revisados en el dataset '{almacen.LINKS_REVISADOS}'")
     else:
-        print("No se procesaron nuevos links o no hubo links válidos para guardar.")
\ No newline at end of file
+        print("No se procesaron nuevos links o no hubo links válidos para guardar.")
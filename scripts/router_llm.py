@@ -0,0 +1,363 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import date
+from types import SimpleNamespace
+import httpx
+import numpy as np
+from groq import RateLimitError
+from google.api_core import exceptions as google_exceptions
+from scripts.cache_llm import completar_con_cache, obtener_cache_llm
+from scripts.limitador_llm import parsear_duracion
+from scripts.metricas import metricas
+
+# ----- DEFINICIÓN DE CONSTANTES -----
+
+DATA_DIR = "./data"
+CUOTA_LLM_PATH = os.path.join(DATA_DIR, "cuota_llm.json")
+
+# Respuesta de las extracciones cuando ningún modelo de la cadena puede atender el pedido
+NO_HAY_MODELOS_DISPONIBLES = "NO_HAY_MODELOS_DISPONIBLES"
+
+# Requests diarias del plan gratuito de cada modelo (None: sin límite conocido)
+CUOTA_DIARIA_MODELOS = {
+    "gemma2-9b-it": 14400,
+    "openai/gpt-oss-120b": 1000,
+    "llama-3.3-70b-versatile": 1000,
+    "gemini-2.0-flash": 200,
+}
+
+# Modelo de Groq al que se pasa cuando se agota el principal, y modelo de Gemini de respaldo
+MODELO_RESPALDO_GROQ = "llama-3.3-70b-versatile"
+MODELO_GEMINI = "gemini-2.0-flash"
+
+# Pausa de un modelo agotado cuando el proveedor no informa cuánto esperar
+PAUSA_CUOTA_AGOTADA = 15 * 60
+# Fallos seguidos (errores que no son de cuota) tras los que se pausa un modelo
+MAX_FALLOS_SEGUIDOS = 3
+PAUSA_POR_FALLOS = 120
+# Latencias que se guardan por modelo para calcular los percentiles
+MAX_LATENCIAS = 500
+TIMEOUT_LOCAL = 120
+
+
+class SinModelosDisponibles(Exception):
+    """Todos los modelos de la cadena están agotados o pausados."""
+
+
+# ----- CLIENTES DE OTROS PROVEEDORES -----
+# Exponen ``chat.completions.create`` y devuelven una respuesta con la forma de la de Groq/OpenAI
+# (``choices[0].message.content`` y ``usage``), así ``completar_chat`` y el caché
+# de respuestas los tratan igual que al cliente de Groq.
+
+def _respuesta(contenido, tokens_entrada, tokens_salida):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=contenido))],
+        usage=SimpleNamespace(
+            prompt_tokens=tokens_entrada,
+            completion_tokens=tokens_salida,
+            total_tokens=tokens_entrada + tokens_salida
+        )
+    )
+
+
+class ClienteGemini:
+    """Adaptador de ``google.generativeai`` a la interfaz de chat de Groq."""
+
+    def __init__(self, api_key):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, model, messages, **kwargs):
+        sistema = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        contenidos = [
+            {"role": "model" if m["role"] == "assistant" else "user", "parts": [m["content"]]}
+            for m in messages if m["role"] != "system"
+        ]
+        configuracion = {}
+        if (kwargs.get("response_format") or {}).get("type") == "json_object":
+            configuracion["response_mime_type"] = "application/json"
+        if kwargs.get("max_tokens"):
+            configuracion["max_output_tokens"] = kwargs["max_tokens"]
+        if kwargs.get("temperature") is not None:
+            configuracion["temperature"] = kwargs["temperature"]
+
+        modelo = self._genai.GenerativeModel(model, system_instruction=sistema or None)
+        response = modelo.generate_content(contenidos, generation_config=configuracion or None)
+        uso = getattr(response, "usage_metadata", None)
+        return _respuesta(
+            response.text,
+            getattr(uso, "prompt_token_count", 0) or 0,
+            getattr(uso, "candidates_token_count", 0) or 0
+        )
+
+
+class ClienteOpenAICompatible:
+    """
+    Cliente mínimo para un servidor local compatible con la API de OpenAI (Ollama, LM Studio,
+    vLLM, llama.cpp) o un stub para pruebas: ``POST {base_url}/chat/completions``.
+    """
+
+    def __init__(self, base_url, api_key=None, timeout=TIMEOUT_LOCAL):
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._http = httpx.Client(base_url=base_url.rstrip("/"), headers=headers, timeout=timeout)
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, model, messages, **kwargs):
+        cuerpo = {"model": model, "messages": messages}
+        cuerpo.update({k: v for k, v in kwargs.items() if k != "stream" and v is not None})
+        response = self._http.post("/chat/completions", json=cuerpo)
+        response.raise_for_status()
+        datos = response.json()
+        uso = datos.get("usage") or {}
+        return _respuesta(
+            datos["choices"][0]["message"]["content"],
+            uso.get("prompt_tokens", 0) or 0,
+            uso.get("completion_tokens", 0) or 0
+        )
+
+
+def es_error_de_cuota(error):
+    """True si el error indica que el modelo agotó su cuota (429 / ResourceExhausted)."""
+    if isinstance(error, (RateLimitError, google_exceptions.ResourceExhausted)):
+        return True
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429
+
+
+def _espera_informada(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    return parsear_duracion(headers.get("retry-after"))
+
+
+# ----- ESTADO DE CADA MODELO -----
+
+class ModeloRuteado:
+    """Un modelo de un proveedor dentro de la cadena, con su salud, cuota y latencias."""
+
+    def __init__(self, proveedor, modelo, client, cuota_diaria=None):
+        self.proveedor = proveedor
+        self.modelo = modelo
+        self.client = client
+        self.cuota_diaria = cuota_diaria
+        self.usadas = 0
+        self.llamadas = 0
+        self.fallos = 0
+        self.fallos_seguidos = 0
+        self.tokens = 0
+        self.pausado_hasta = 0.0
+        self.latencias = deque(maxlen=MAX_LATENCIAS)
+
+    @property
+    def nombre(self):
+        return f"{self.proveedor}:{self.modelo}"
+
+    def restante(self):
+        if self.cuota_diaria is None:
+            return None
+        return max(self.cuota_diaria - self.usadas, 0)
+
+    def disponible(self, ahora=None):
+        if self.restante() == 0:
+            return False
+        return (ahora or time.time()) >= self.pausado_hasta
+
+    def percentil(self, p):
+        if not self.latencias:
+            return None
+        return float(np.percentile(list(self.latencias), p))
+
+
+class RouterLLM:
+    """
+    Enruta cada pedido al primer modelo disponible de una cadena ordenada de proveedores/modelos
+    (Groq, Gemini, un servidor local compatible con OpenAI). Lleva la salud, la cuota diaria
+    restante y las latencias de cada modelo, y cuando uno agota su cuota o falla repetidamente
+    lo pausa y pasa al siguiente, así la corrida sigue aunque se termine un plan gratuito.
+
+    Antes de llamar a ningún modelo se busca el pedido en el caché de respuestas de todos los de
+    la cadena: un pedido ya respondido por cualquiera de ellos (por ejemplo, por el de respaldo
+    mientras el principal estaba agotado) se sirve del caché sin volver a pagarlo. Si ningún modelo puede
+    atender el pedido se lanza ``SinModelosDisponibles``.
+    """
+
+    def __init__(self, modelos, path=CUOTA_LLM_PATH):
+        self.modelos = list(modelos)
+        self.path = path
+        self._lock = threading.Lock()
+        self.dia = date.today().isoformat()
+        self._cargar()
+
+    @classmethod
+    def desde_entorno(cls, client_groq, modelo_groq, etiqueta_groq="groq", path=CUOTA_LLM_PATH):
+        """
+        Cadena por defecto: ``modelo_groq`` y el modelo de respaldo de Groq con ``client_groq``,
+        Gemini si está definida ``GEMINI_API_KEY`` y un servidor local si está definida
+        ``LLM_LOCAL_URL`` (con ``LLM_LOCAL_MODELO`` y, opcionalmente, ``LLM_LOCAL_API_KEY``).
+        ``etiqueta_groq`` distingue la cuota de cada API key de Groq en ``cuota_llm.json``.
+        """
+        modelos = [ModeloRuteado(etiqueta_groq, modelo_groq, client_groq, CUOTA_DIARIA_MODELOS.get(modelo_groq))]
+        if modelo_groq != MODELO_RESPALDO_GROQ:
+            modelos.append(ModeloRuteado(
+                etiqueta_groq, MODELO_RESPALDO_GROQ, client_groq, CUOTA_DIARIA_MODELOS.get(MODELO_RESPALDO_GROQ)))
+        if os.getenv("GEMINI_API_KEY"):
+            modelos.append(ModeloRuteado(
+                "gemini", MODELO_GEMINI, ClienteGemini(os.getenv("GEMINI_API_KEY")),
+                CUOTA_DIARIA_MODELOS.get(MODELO_GEMINI)))
+        if os.getenv("LLM_LOCAL_URL"):
+            modelos.append(ModeloRuteado(
+                "local", os.getenv("LLM_LOCAL_MODELO", "local"),
+                ClienteOpenAICompatible(os.getenv("LLM_LOCAL_URL"), os.getenv("LLM_LOCAL_API_KEY"))))
+        return cls(modelos, path=path)
+
+    @property
+    def modelo_principal(self):
+        """Primer modelo de la cadena: el que define el presupuesto de tokens del contenido."""
+        return self.modelos[0].modelo
+
+    # --- Persistencia de la cuota diaria y de las pausas ---
+
+    def _cargar(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            guardado = json.load(f)
+        usadas = guardado.get("usadas", {}) if guardado.get("dia") == self.dia else {}
+        pausas = guardado.get("pausados_hasta", {})
+        for modelo in self.modelos:
+            modelo.usadas = usadas.get(modelo.nombre, 0)
+            modelo.pausado_hasta = pausas.get(modelo.nombre, 0.0)
+
+    def _guardar(self):
+        if not self.path:
+            return
+        directorio = os.path.dirname(self.path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        datos = {"dia": self.dia, "usadas": {}, "pausados_hasta": {}}
+        if os.path.exists(self.path):
+            # Otro router (con otra cadena) puede compartir el archivo: se conservan sus modelos
+            with open(self.path, "r", encoding="utf-8") as f:
+                anterior = json.load(f)
+            if anterior.get("dia") == self.dia:
+                datos["usadas"].update(anterior.get("usadas", {}))
+            datos["pausados_hasta"].update(anterior.get("pausados_hasta", {}))
+        for modelo in self.modelos:
+            datos["usadas"][modelo.nombre] = modelo.usadas
+            datos["pausados_hasta"][modelo.nombre] = modelo.pausado_hasta
+        temporal = f"{self.path}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(datos, f)
+        os.replace(temporal, self.path)
+
+    def _nuevo_dia(self):
+        hoy = date.today().isoformat()
+        if hoy != self.dia:
+            self.dia = hoy
+            for modelo in self.modelos:
+                modelo.usadas = 0
+
+    # --- Registro de resultados ---
+
+    def _registrar_exito(self, modelo, latencia, tokens):
+        with self._lock:
+            modelo.llamadas += 1
+            modelo.usadas += 1
+            modelo.fallos_seguidos = 0
+            modelo.tokens += tokens
+            modelo.latencias.append(latencia)
+            self._guardar()
+
+    def _registrar_fallo(self, modelo, error):
+        with self._lock:
+            modelo.fallos += 1
+            metricas.incrementar(
+                "router_fallos", modelo=modelo.nombre, tipo="cuota" if es_error_de_cuota(error) else "error")
+            if es_error_de_cuota(error):
+                pausa = _espera_informada(error) or PAUSA_CUOTA_AGOTADA
+                print(f"{modelo.nombre} agotó su cuota. Se pausa {pausa:.0f}s y se pasa al siguiente modelo.")
+                modelo.pausado_hasta = time.time() + pausa
+            else:
+                modelo.fallos_seguidos += 1
+                print(f"Error en {modelo.nombre}: {error}")
+                if modelo.fallos_seguidos >= MAX_FALLOS_SEGUIDOS:
+                    print(f"{modelo.nombre} falló {modelo.fallos_seguidos} veces seguidas. Se pausa {PAUSA_POR_FALLOS}s.")
+                    modelo.pausado_hasta = time.time() + PAUSA_POR_FALLOS
+                    modelo.fallos_seguidos = 0
+            self._guardar()
+
+    # --- Llamada ---
+
+    def completar(self, messages, version_prompt, contenido, validar=None, **kwargs):
+        """
+        Igual que ``completar_con_cache`` pero eligiendo el modelo: prueba la cadena en orden y
+        pasa al siguiente modelo ante un error. Lanza ``SinModelosDisponibles`` si todos quedaron
+        agotados o pausados, o el último error si falló el pedido pero quedan modelos activos.
+        ``validar`` es el de ``completar_con_cache``: decide qué respuestas se guardan y cuáles
+        del caché se pueden devolver.
+        """
+        encontrada = obtener_cache_llm().obtener_de(
+            [modelo.modelo for modelo in self.modelos], version_prompt, contenido, validar)
+        metricas.incrementar(
+            "cache_llm", resultado="acierto" if encontrada else "fallo",
+            modelo=encontrada[0] if encontrada else self.modelo_principal)
+        if encontrada:
+            return encontrada[1]
+
+        with self._lock:
+            self._nuevo_dia()
+            candidatos = [modelo for modelo in self.modelos if modelo.disponible()]
+
+        ultimo_error = None
+        for modelo in candidatos:
+            def medir(latencia, tokens, modelo=modelo):
+                self._registrar_exito(modelo, latencia, tokens)
+
+            try:
+                return completar_con_cache(
+                    modelo.client, model=modelo.modelo, messages=messages,
+                    version_prompt=version_prompt, contenido=contenido, medir=medir,
+                    consultar_cache=False, validar=validar, **kwargs
+                )
+            except Exception as e:
+                self._registrar_fallo(modelo, e)
+                ultimo_error = e
+
+        # Si queda algún modelo activo el error es propio de este pedido, no falta de modelos
+        if ultimo_error is not None and any(modelo.disponible() for modelo in self.modelos):
+            raise ultimo_error
+        raise SinModelosDisponibles("Ningún modelo de la cadena está disponible")
+
+    # --- Métricas ---
+
+    def resumen(self):
+        """Estado de cada modelo de la cadena: disponibilidad, cuota, uso y latencias."""
+        with self._lock:
+            return [
+                {
+                    "modelo": modelo.nombre,
+                    "disponible": modelo.disponible(),
+                    "restante": modelo.restante(),
+                    "llamadas": modelo.llamadas,
+                    "fallos": modelo.fallos,
+                    "tokens": modelo.tokens,
+                    "latencia_p50": modelo.percentil(50),
+                    "latencia_p95": modelo.percentil(95),
+                }
+                for modelo in self.modelos
+            ]
+
+    def imprimir_resumen(self):
+        for fila in self.resumen():
+            latencia = "sin llamadas"
+            if fila["latencia_p50"] is not None:
+                latencia = f"p50 {fila['latencia_p50']:.1f}s, p95 {fila['latencia_p95']:.1f}s"
+            restante = "sin límite" if fila["restante"] is None else f"{fila['restante']} restantes hoy"
+            print(
+                f"{fila['modelo']}: {'disponible' if fila['disponible'] else 'pausado/agotado'}, "
+                f"{fila['llamadas']} llamadas, {fila['fallos']} fallos, {fila['tokens']} tokens, "
+                f"{restante}, {latencia}"
+            )
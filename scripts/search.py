@@ -2,8 +2,16 @@ import pandas as pd
 import httpx
 import os
 import time
-import json
+import threading
+from collections import deque
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from scripts.estado import obtener_estado
+from scripts.planificador_busqueda import PlanificadorBusqueda, armar_consultas
+from scripts.cuota_busqueda import CuotaCredenciales
+from scripts.metricas import metricas
+from scripts import almacen
 
 load_dotenv()
 
@@ -11,8 +19,6 @@ load_dotenv()
 
 DATA_DIR = "./data"
 SEDES_PATH = os.path.join(DATA_DIR, "sedes.csv")
-PROGRESO_PATH = os.path.join(DATA_DIR, "progreso.json")
-RESULTADOS_PATH = os.path.join(DATA_DIR, "resultados_busqueda.csv")
 
 API_CREDENTIALS = [
     {
@@ -27,152 +33,233 @@ API_CREDENTIALS = [
     }
 ]
 
-# ----- FUNCIONES AUXILIARES -----
+TIPOS_EVENTO = [
+    "Jornada", "Encuentro", "Congreso", "Conferencia", "Exposición", "Seminario",
+    "Evento Deportivo Internacional", "Simposio", "Convencion", "Feria"
+]
+
+# Queries en vuelo a la vez, repartidas entre todas las credenciales
+MAX_CONCURRENCIA = 8
+TIMEOUT = 15.0
+# Espera ante un 429 por límite por minuto (no por cuota diaria)
+ESPERA_LIMITE_POR_MINUTO = 10.0
 
-def guardar_progreso(credencial_idx, tipo_index, chunk_index):
-    """Guarda el índice de la credencial, tipo de evento y chunk de sedes."""
-    os.makedirs(DATA_DIR, exist_ok=True)
-    with open(PROGRESO_PATH, "w") as f:
-        progreso = {
-            "credencial_idx": credencial_idx,
-            "tipo_index": tipo_index,
-            "chunk_index": chunk_index
-        }
-        json.dump(progreso, f)
-
-def cargar_progreso():
-    """Carga el último progreso. Si no existe, empieza desde cero."""
-    if os.path.exists(PROGRESO_PATH):
-        with open(PROGRESO_PATH, "r") as f:
-            return json.load(f)
-    # Valores por defecto para el primer arranque
-    return {"credencial_idx": 0, "tipo_index": 0, "chunk_index": 0}
+# ----- FUNCIONES AUXILIARES -----
 
 def guardar_resultados(resultados):
-    """Normaliza y guarda una lista de resultados en el archivo CSV."""
+    """
+    Descarta los resultados cuya URL (en forma canónica) ya se vio en esta u otras corridas,
+    agrega los nuevos al dataset de resultados de búsqueda y los registra en el índice de URLs vistas.
+    Devuelve la lista de resultados nuevos.
+    """
     if not resultados:
         print("⚠ No se encontraron nuevos resultados para guardar.")
-        return
+        return []
+
+    estado = obtener_estado()
+    links_nuevos = set(estado.urls_nuevas([r.get('link') for r in resultados]))
+    nuevos = []
+    for resultado in resultados:
+        link = resultado.get('link')
+        if link in links_nuevos:
+            links_nuevos.discard(link)
+            nuevos.append(resultado)
+
+    if not nuevos:
+        print(f"Los {len(resultados)} resultados ya se habían encontrado antes.")
+        return []
 
-    df_result = pd.json_normalize(resultados)
+    df_result = pd.json_normalize(nuevos)
     columnas_a_guardar = ['title', 'link', 'snippet']
-    columnas_existentes = [col for col in columnas_a_guardar if col in df_result.columns]
-    
-    df_result.to_csv(
-        RESULTADOS_PATH, columns=columnas_existentes, mode='a',
-        header=not os.path.exists(RESULTADOS_PATH), index=False, sep=";"
-    )
-    print(f"{len(resultados)} resultados guardados/añadidos en {RESULTADOS_PATH}")
+    df_result = df_result.reindex(columns=columnas_a_guardar)
+
+    almacen.agregar(almacen.RESULTADOS_BUSQUEDA, df_result)
+    estado.marcar_vistas([r['link'] for r in nuevos])
+    print(f"{len(nuevos)} resultados nuevos guardados en el dataset '{almacen.RESULTADOS_BUSQUEDA}' "
+          f"({len(resultados) - len(nuevos)} ya conocidos)")
+    return nuevos
     
 # ----- WRAPPER DE LA BÚSQUEDA CON CUSTOM SEARCH API -----
 
-def google_search(api_key, search_engine_id, query, **params):
-    """Realiza una petición a la API de Google Custom Search."""
+def google_search(api_key, search_engine_id, query, client=None, **params):
+    """
+    Realiza una petición a la API de Google Custom Search. Si se pasa ``client`` se reutiliza
+    su pool de conexiones en lugar de abrir uno nuevo por query.
+    """
     base_url = "https://www.googleapis.com/customsearch/v1"
     all_params = {'key': api_key, 'cx': search_engine_id, 'q': query, **params}
-    
-    with httpx.Client() as client:
+
+    if client is None:
+        with httpx.Client() as client:
+            return google_search(api_key, search_engine_id, query, client=client, **params)
+
+    with metricas.span("custom_search"):
         response = client.get(base_url, params=all_params)
-        response.raise_for_status()
-        return response.json()
+    metricas.incrementar("http_respuestas", dominio="www.googleapis.com", estado=response.status_code)
+    response.raise_for_status()
+    return response.json()
 
-# ----- FUNCIÓN DE BÚSQUEDA -----
+def es_limite_por_minuto(response):
+    """True si un 429 corresponde al límite de queries por minuto y no a la cuota diaria."""
+    try:
+        mensaje = response.json()["error"]["message"]
+    except Exception:
+        return False
+    return "per minute" in mensaje.lower()
+
+# ----- EJECUCIÓN DE QUERIES -----
 
-def busqueda_eventos():
+def ejecutar_consultas(plan, cuota, al_ejecutar, al_encontrar=None, max_concurrencia=MAX_CONCURRENCIA,
+                       cancelar=None):
     """
-    Función de búsqueda con Google Custom Search API. Rota las API keys para aprovechar
-    las consultas gratis por día de ambas cuentas. Construye sublistas de sedes para no exceder
-    el tamaño máximo de query permitido por la API.
-    
-    Guarda los índices de tipo y de sede en un archivo JSON para que se retome la búsqueda desde
-    ahí al reanudar la ejecución.
+    Ejecuta en paralelo las queries de ``plan`` (una deque) sobre un único cliente HTTP con pool
+    de conexiones, repartidas entre todas las credenciales según la cuota diaria que les queda.
+    Cada query lleva en ``parametros`` los parámetros propios de la API (``dateRestrict``,
+    ``sort``, ``start``) y opcionalmente una ``etiqueta`` para el log.
+
+    Después de cada query ejecutada se llama a ``al_ejecutar(consulta, respuesta, resultados,
+    nuevos)``, que puede devolver queries adicionales para agregar al final del plan (las páginas
+    siguientes del backfill). Las queries que no se llegaron a ejecutar quedan en ``plan``.
+    ``cancelar`` (un ``threading.Event``) corta la búsqueda antes de la próxima query, por ejemplo
+    cuando el pipeline en streaming se detuvo y los resultados ya no se van a procesar.
     """
-    
-    anio = "2025"
-    tipos_evento = [
-        "Jornada", "Encuentro", "Congreso", "Conferencia", "Exposición", "Seminario",
-        "Evento Deportivo Internacional", "Simposio", "Convencion", "Feria"
-    ]
+    lock_plan = threading.Lock()
+    lock_resultados = threading.Lock()
+    detener = threading.Event()
+
+    def trabajar(client):
+        while not detener.is_set() and not (cancelar and cancelar.is_set()):
+            with lock_plan:
+                if not plan:
+                    return
+                consulta = plan.popleft()
 
+            credencial_idx = cuota.reservar()
+            if credencial_idx is None:
+                with lock_plan:
+                    plan.appendleft(consulta)
+                return
+            credencial_actual = API_CREDENTIALS[credencial_idx]
+
+            try:
+                print(f"Query ({credencial_actual['name']}): Buscando '{consulta['tipo']}' en {len(consulta['sedes'])} sedes"
+                      f"{consulta.get('etiqueta', '')}...")
+                response = google_search(
+                    api_key=credencial_actual["api_key"],
+                    search_engine_id=credencial_actual["search_engine_id"],
+                    query=consulta["query"],
+                    client=client,
+                    gl="ar", cr="countryAR", lr="lang_es",
+                    excludeTerms='site:.cl site:.uy site:.mx', **consulta["parametros"]
+                )
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 429:
+                    if es_limite_por_minuto(e.response):
+                        cuota.liberar(credencial_idx)
+                        time.sleep(ESPERA_LIMITE_POR_MINUTO)
+                    else:
+                        print(f"Cuota diaria agotada para la clave '{credencial_actual['name']}'. Cambiando a la siguiente.")
+                        cuota.agotar(credencial_idx)
+                    # La query no se ejecutó: vuelve al frente del plan para otra credencial
+                    with lock_plan:
+                        plan.appendleft(consulta)
+                    continue
+                # Se corta la búsqueda, pero la query (y su página, en el backfill) queda en el plan
+                print(f"Error HTTP inesperado: {e}")
+                cuota.liberar(credencial_idx)
+                with lock_plan:
+                    plan.appendleft(consulta)
+                detener.set()
+                return
+            except httpx.HTTPError as e:
+                # Sin respuesta no hay cuota gastada; la query queda pendiente para la próxima corrida
+                cuota.liberar(credencial_idx)
+                with lock_plan:
+                    plan.appendleft(consulta)
+                print(f"Error de red en la query: {e}")
+                return
+
+            resultados = response.get('items', [])
+            nuevos_resultados = []
+            # El CSV y el índice de URLs vistas se actualizan de a una query por vez
+            with lock_resultados:
+                if resultados:
+                    print(f"Éxito. Se encontraron {len(resultados)} resultados.")
+                    nuevos_resultados = guardar_resultados(resultados)
+                    if nuevos_resultados and al_encontrar:
+                        al_encontrar(nuevos_resultados)
+                else:
+                    print("Éxito. No se encontraron resultados para esta query.")
+
+            siguientes = al_ejecutar(consulta, response, len(resultados), len(nuevos_resultados))
+            if siguientes:
+                with lock_plan:
+                    plan.extend(siguientes)
+
+    limites = httpx.Limits(max_connections=max_concurrencia, max_keepalive_connections=max_concurrencia)
+    with httpx.Client(timeout=TIMEOUT, limits=limites) as client:
+        with ThreadPoolExecutor(max_workers=max_concurrencia) as pool:
+            for tarea in [pool.submit(trabajar, client) for _ in range(max_concurrencia)]:
+                tarea.result()
+
+# ----- FUNCIÓN DE BÚSQUEDA -----
+
+def leer_sedes():
+    """Nombres del catálogo de sedes, o None si no está el archivo."""
     try:
         df = pd.read_csv(SEDES_PATH, sep=";")
     except FileNotFoundError:
         print(f"Error: No se encontró el archivo de sedes en la ruta '{SEDES_PATH}'.")
+        return None
+    return df["Nombre"].dropna().tolist()
+
+def busqueda_eventos(al_encontrar=None, max_concurrencia=MAX_CONCURRENCIA, anio=None, cancelar=None):
+    """
+    Función de búsqueda con Google Custom Search API. Las queries (tipo de evento × grupo de sedes,
+    armados según el límite de términos de la API) pasan por el planificador, que saltea las ya
+    ejecutadas hoy, espacia las que vienen quedando vacías y ordena el resto por rendimiento.
+    ``anio`` es el año que se busca en las queries (por defecto, el actual).
+
+    Las queries se ejecutan en paralelo sobre un único cliente HTTP con pool de conexiones,
+    repartidas entre todas las credenciales según la cuota diaria que les queda, que se lleva
+    localmente: una credencial agotada no se vuelve a usar hasta el día siguiente.
+
+    El historial de cada query se guarda apenas se ejecuta, así que al reanudar la ejecución
+    sólo se corren las que faltan.
+
+    Los resultados de cada query se guardan apenas llegan, descartando las URLs ya vistas. Si se
+    indica ``al_encontrar``, se la llama con los resultados nuevos de cada query (lo usa el
+    pipeline en streaming para empezar a revisar links sin esperar a que termine la búsqueda), y
+    ``cancelar`` la corta antes de la próxima query (ver ``ejecutar_consultas``).
+    """
+    
+    anio = str(anio or date.today().year)
+
+    sedes = leer_sedes()
+    if sedes is None:
         return
+    consultas = armar_consultas(TIPOS_EVENTO, sedes, anio)
 
-    sedes = df["Nombre"].dropna().tolist()
-    sede_chunks = [sedes[i:i + 10] for i in range(0, len(sedes), 10)]
-
-    progreso = cargar_progreso()
-    credencial_idx = progreso["credencial_idx"]
-    tipo_start = progreso["tipo_index"]
-    chunk_start = progreso["chunk_index"]
-
-    resultados_acumulados = []
-
-    while credencial_idx < len(API_CREDENTIALS):
-        credencial_actual = API_CREDENTIALS[credencial_idx]
-        print(f"\n--- Usando credenciales: '{credencial_actual['name']}' ---")
-
-        clave_agotada = False
-
-        for tipo_idx in range(tipo_start, len(tipos_evento)):
-            tipo_evento = tipos_evento[tipo_idx]
-            primer_clause = f'"{tipo_evento}"'
-            segundo_clause = f'"{anio}"'
-
-            start_chunk_idx = chunk_start if tipo_idx == tipo_start else 0
-            
-            for chunk_idx in range(start_chunk_idx, len(sede_chunks)):
-                chunk = sede_chunks[chunk_idx]
-                query = f'{primer_clause} {segundo_clause} ({" OR ".join([f'"{s}"' for s in chunk])})'
-
-                try:
-                    print(f"Query: Buscando '{tipo_evento}' en {len(chunk)} sedes...")
-                    response = google_search(
-                        api_key=credencial_actual["api_key"],
-                        search_engine_id=credencial_actual["search_engine_id"],
-                        query=query,
-                        gl="ar", cr="countryAR", lr="lang_es",
-                        excludeTerms='site:.cl site:.uy site:.mx', dateRestrict="d1"
-                    )
-                    
-                    nuevos_resultados = response.get('items', [])
-                    if nuevos_resultados:
-                        resultados_acumulados.extend(nuevos_resultados)
-                        print(f"Éxito. Se encontraron {len(nuevos_resultados)} resultados.")
-                    else:
-                        print("Éxito. No se encontraron resultados para esta query.")
+    planificador = PlanificadorBusqueda()
+    cuota = CuotaCredenciales(API_CREDENTIALS)
+    plan = deque(
+        {**consulta, "parametros": {"dateRestrict": consulta["dateRestrict"]}}
+        for consulta in planificador.planificar(consultas, presupuesto=cuota.restante_total())
+    )
 
-                    guardar_progreso(credencial_idx, tipo_idx, chunk_idx + 1)
+    resumen = planificador.resumen(consultas)
+    print(f"Plan del día: {len(plan)} queries de {resumen['total']} "
+          f"({resumen['hechas']} ya ejecutadas hoy, {resumen['espaciadas']} espaciadas por venir vacías).")
+    print(f"Cuota disponible: {cuota.restante()}")
 
-                except httpx.HTTPStatusError as e:
-                    if e.response.status_code == 429:
-                        print(f"Cuota diaria agotada para la clave '{credencial_actual['name']}'. Cambiando a la siguiente.")
-                        clave_agotada = True
-                        
-                        guardar_progreso(credencial_idx + 1, tipo_idx, chunk_idx)
-                        break
-                    else:
-                        print(f"Error HTTP inesperado: {e}")
-                        guardar_resultados(resultados_acumulados)
-                        return
-                
-                time.sleep(2.0)
-
-            if clave_agotada:
-                break
-
-        if not clave_agotada:
-            print("\n Búsqueda completada con éxito.")
-            credencial_idx = len(API_CREDENTIALS)
-        else:
-            credencial_idx += 1
-            tipo_start = progreso["tipo_index"]
-            chunk_start = progreso["chunk_index"]
+    def registrar(consulta, respuesta, resultados, nuevos):
+        planificador.registrar(consulta, resultados, nuevos)
 
-    print("\n--- Proceso de búsqueda finalizado ---")
-    if credencial_idx >= len(API_CREDENTIALS) and clave_agotada:
-        print("Todas las credenciales han agotado su cuota.")
+    ejecutar_consultas(plan, cuota, registrar, al_encontrar=al_encontrar,
+                       max_concurrencia=max_concurrencia, cancelar=cancelar)
+    # Cada query agregó su propio archivo: se unen en uno por fecha de corrida
+    almacen.compactar(almacen.RESULTADOS_BUSQUEDA)
 
-    guardar_resultados(resultados_acumulados)
\ No newline at end of file
+    print("\n--- Proceso de búsqueda finalizado ---")
+    if plan and cuota.restante_total() == 0:
+        print(f"Todas las credenciales han agotado su cuota. Quedaron {len(plan)} queries para mañana.")
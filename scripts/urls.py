@@ -0,0 +1,66 @@
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Parámetros de query que sólo sirven para seguimiento y no cambian el contenido de la página
+PARAMETROS_SEGUIMIENTO = {
+    "fbclid", "gclid", "gclsrc", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "_ga", "_gl", "ref", "ref_src", "s_cid", "cmpid", "amp", "outputtype"
+}
+PREFIJOS_SEGUIMIENTO = ("utm_", "hsa_", "pk_", "mtm_")
+
+# Subdominios de versiones móviles o AMP del mismo sitio
+PREFIJOS_HOST = ("www.", "m.", "mobile.", "amp.")
+
+_BARRAS = re.compile(r"/{2,}")
+_SUFIJO_AMP = re.compile(r"(/amp/?|\.amp)$", re.IGNORECASE)
+_PREFIJO_AMP = re.compile(r"^/amp(?=/)", re.IGNORECASE)
+
+
+def _es_seguimiento(parametro):
+    parametro = parametro.lower()
+    return parametro in PARAMETROS_SEGUIMIENTO or parametro.startswith(PREFIJOS_SEGUIMIENTO)
+
+
+def canonicalizar_url(url):
+    """
+    Forma canónica de una URL para detectar la misma página publicada con distintas variantes:
+    fuerza https, pasa el host a minúsculas sin 'www.', 'm.' ni 'amp.', quita puerto por defecto,
+    fragmento, parámetros de seguimiento (utm_*, fbclid, ...) y la barra final, resuelve las rutas
+    AMP ('/nota/amp', '/amp/nota', 'nota.amp') y ordena los parámetros restantes.
+
+    'http://m.diario.com.ar/amp/nota-1/?utm_source=fb#top' -> 'https://diario.com.ar/nota-1'
+
+    Nunca lanza excepciones: una URL que no se puede interpretar se devuelve sin normalizar.
+    """
+    if not isinstance(url, str) or not url.strip():
+        return ""
+    try:
+        partes = urlsplit(url.strip())
+    except ValueError:
+        # URL mal formada (p. ej. un IPv6 sin cerrar): se compara tal cual
+        return url.strip()
+
+    host = (partes.hostname or "").lower()
+    try:
+        puerto = partes.port
+    except ValueError:
+        # Puerto no numérico o fuera de rango: se conserva tal como vino junto al host
+        host, puerto = partes.netloc.rpartition("@")[2].lower(), None
+    for prefijo in PREFIJOS_HOST:
+        if host.startswith(prefijo):
+            host = host[len(prefijo):]
+            break
+    if puerto and puerto not in (80, 443):
+        host = f"{host}:{puerto}"
+
+    ruta = _BARRAS.sub("/", partes.path or "/")
+    ruta = _SUFIJO_AMP.sub("", ruta)
+    ruta = _PREFIJO_AMP.sub("", ruta)
+    ruta = ruta.rstrip("/") or "/"
+
+    parametros = sorted(
+        (clave, valor) for clave, valor in parse_qsl(partes.query, keep_blank_values=True)
+        if not _es_seguimiento(clave)
+    )
+
+    return urlunsplit(("https", host, ruta if ruta != "/" else "", urlencode(parametros), ""))
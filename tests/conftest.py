@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Los módulos de scripts crean los clientes de Groq al importarse: alcanza con que la clave exista
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("EMETUR_GROQ_API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
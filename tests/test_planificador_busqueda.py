@@ -0,0 +1,35 @@
+import json
+from datetime import date
+from scripts.planificador_busqueda import PlanificadorBusqueda, armar_consultas, clave_consulta
+
+SEDES = ["Hotel Sheraton", "Auditorio Ángel Bustelo"]
+
+
+def test_el_historial_se_conserva_con_el_cambio_de_anio(tmp_path):
+    path = tmp_path / "historial.json"
+    planificador = PlanificadorBusqueda(path=str(path), hoy=date(2025, 12, 31))
+    for consulta in armar_consultas(["Congreso"], SEDES, "2025"):
+        planificador.registrar(consulta, resultados=0, nuevos=0)
+
+    consultas = armar_consultas(["Congreso"], SEDES, "2026")
+    planificador = PlanificadorBusqueda(path=str(path), hoy=date(2026, 1, 1))
+    assert planificador.resumen(consultas)["hechas"] == 0
+    plan = planificador.planificar(consultas)
+    assert [consulta["query"] for consulta in plan] == [consulta["query"] for consulta in consultas]
+    assert all(consulta["dateRestrict"] == "d1" for consulta in plan)
+    assert planificador.historial[consultas[0]["clave"]]["ejecuciones"] == 1
+
+
+def test_migra_el_historial_guardado_por_texto_de_query(tmp_path):
+    path = tmp_path / "historial.json"
+    registro = {"ejecuciones": 4, "resultados": 0, "nuevos": 0, "vacias_consecutivas": 4}
+    path.write_text(json.dumps({
+        '"Congreso" "2024" ("Hotel Sheraton" OR "Auditorio Ángel Bustelo")': {**registro, "ultima_ejecucion": "2024-12-30"},
+        '"Congreso" "2025" ("Hotel Sheraton" OR "Auditorio Ángel Bustelo")': {**registro, "ultima_ejecucion": "2025-12-30"},
+    }), encoding="utf-8")
+
+    planificador = PlanificadorBusqueda(path=str(path), hoy=date(2026, 1, 1))
+    assert list(planificador.historial) == [clave_consulta("Congreso", SEDES)]
+    assert planificador.historial[clave_consulta("Congreso", SEDES)]["ultima_ejecucion"] == "2025-12-30"
+    # Cuatro ejecuciones vacías seguidas: la query sigue espaciada después del cambio de año
+    assert planificador.planificar(armar_consultas(["Congreso"], SEDES, "2026")) == []
@@ -0,0 +1,142 @@
+import json
+import random
+from datetime import date
+import pandas as pd
+import pytest
+from scripts.procesar_eventos import (
+    DETALLES_ROTACION, TEMAS, TIPOS_EVENTO, mapear_detalle_rotacion, mapear_tema, mapear_tipo_evento,
+    normalizar_respuestas, parsear_fechas, procesar_respuesta, rango_fechas, registros_evento)
+
+SEDES = pd.DataFrame({
+    "Nombre": ["Universidad Nacional de Cuyo", "Centro de Congresos y Exposiciones", "Hotel Sheraton"],
+    "Localidad": ["MENDOZA", "MENDOZA", "GODOY CRUZ"],
+})
+
+CANTIDAD_RESPUESTAS = 20000
+
+
+# ----- FECHAS -----
+
+@pytest.mark.parametrize("valor, esperado", [
+    ("2025-07-10", (date(2025, 7, 10), date(2025, 7, 10))),
+    ("2025-07-10T09:00:00", (date(2025, 7, 10), date(2025, 7, 10))),
+    ("10/07/2025", (date(2025, 7, 10), date(2025, 7, 10))),
+    ("10 de julio de 2025", (date(2025, 7, 10), date(2025, 7, 10))),
+    ("del 10 al 12 de julio", (date(2025, 7, 10), date(2025, 7, 12))),
+    ("10, 11 y 12 de julio de 2026", (date(2026, 7, 10), date(2026, 7, 12))),
+    ("del 30 de junio al 2 de julio", (date(2025, 6, 30), date(2025, 7, 2))),
+    ("del 30 de diciembre al 2 de enero de 2026", (date(2025, 12, 30), date(2026, 1, 2))),
+    ("1º de mayo", (date(2025, 5, 1), date(2025, 5, 1))),
+    ("Martes 1° de Setiembre", (date(2025, 9, 1), date(2025, 9, 1))),
+    ("No proporcionada", (None, None)),
+    ("31 de febrero", (None, None)),
+    (None, (None, None)),
+])
+def test_rango_fechas(valor, esperado):
+    assert rango_fechas(valor) == esperado
+
+
+def test_rango_fechas_usa_el_anio_indicado():
+    assert rango_fechas("del 30 de junio al 2 de julio", 2024) == (date(2024, 6, 30), date(2024, 7, 2))
+
+
+def test_parsear_fechas_coincide_con_rango_fechas():
+    valores = ["2025-07-10", "10/07/2025", "del 30 de junio al 2 de julio",
+               "del 30 de diciembre al 2 de enero de 2026", "1º de mayo", "ns/nc", None, 2025]
+    fechas = parsear_fechas(pd.Series(valores, dtype=object))
+    for valor, (_, fila) in zip(valores, fechas.iterrows()):
+        inicio, fin = rango_fechas(valor)
+        assert (None if pd.isna(fila["inicio"]) else fila["inicio"].date()) == inicio
+        assert (None if pd.isna(fila["fin"]) else fila["fin"].date()) == fin
+
+
+# ----- MAPEO A LAS OPCIONES FIJAS -----
+
+@pytest.mark.parametrize("valor, esperado", [
+    ("Internacional", "Internacional"),
+    ("Nacional", "Nacional"),
+    ("Internacional - Mercosur", "Internacional - Mercosur"),
+    ("nacional - regional (cuyo)", "Nacional - Regional (Cuyo)"),
+    ("sin datos", "NS/NC"),
+])
+def test_mapear_detalle_rotacion(valor, esperado):
+    assert mapear_detalle_rotacion(valor) == esperado
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    ("Foro", "Foro"),
+    ("Foro Provincial de Turismo", "Foro"),
+    # 'foro' dentro de 'aforo' no es una mención del tipo de evento
+    ("Aforo completo", "Otro tipo de evento"),
+    ("Jornadas", "Jornada"),
+    ("Evento Deportivo Internacional", "Evento Deportivo Internacional"),
+    (None, "Otro tipo de evento"),
+])
+def test_mapear_tipo_evento(valor, esperado):
+    assert mapear_tipo_evento(valor) == esperado
+
+
+def test_mapear_tema_sin_coincidencias_devuelve_el_valor():
+    assert mapear_tema("medicina") == "Medicina"
+    assert mapear_tema("Astronomía") == "Astronomía"
+
+
+# ----- NORMALIZACIÓN POR LOTES -----
+
+def _respuesta_aleatoria(azar):
+    """Respuesta cruda del LLM con los formatos, faltantes y errores que se ven en la práctica."""
+    fechas = [
+        "2025-07-10", "10/07/2025", "10 de julio de 2025", "del 10 al 12 de julio",
+        "del 30 de junio al 2 de julio", "del 30 de diciembre al 2 de enero", "1º de mayo",
+        "No proporcionada", "", None, 2025, "31 de febrero",
+    ]
+    textos = [None, "", "  con espacios  ", 17, "Otro"]
+    campos = {
+        "nombreEvento": azar.choice(textos + ["Congreso de Medicina"]),
+        "tipoEvento": azar.choice(TIPOS_EVENTO + textos + ["Jornadas", "Aforo", "Congreso Internacional"]),
+        "detalleTipoRotacion": azar.choice(DETALLES_ROTACION + textos + ["internacional"]),
+        "tema": azar.choice(TEMAS + textos + ["medicina"]),
+        "fechaEdicion": azar.choice(fechas),
+        "fechaInicio": azar.choice(fechas),
+        "fechaFinalizacion": azar.choice(fechas),
+        "fechaRaw": azar.choice(fechas),
+        "añoRaw": azar.choice([None, "2024", 2026, "s/d"]),
+        "mesLiteralRaw": azar.choice(textos),
+        "diaInicioRaw": azar.choice(textos + [10]),
+        "diaFinalRaw": azar.choice(textos + [12]),
+        "Localidad": azar.choice(list(SEDES["Nombre"]) + textos),
+        "sedeRaw": azar.choice(textos),
+        "agrupacion": azar.choice(textos),
+        "sedePrincipal": azar.choice(textos),
+        "organizador": azar.choice(textos),
+    }
+    datos = {campo: valor for campo, valor in campos.items() if azar.random() > 0.1}
+    raw = json.dumps(datos, ensure_ascii=False)
+    forma = azar.random()
+    if forma < 0.05:
+        return raw[:-3]
+    if forma < 0.07:
+        return json.dumps([datos])
+    if forma < 0.2:
+        return f"```json\n{raw}\n```"
+    return raw
+
+
+def test_normalizar_respuestas_equivale_a_procesar_respuesta():
+    azar = random.Random(1)
+    respuestas = [(_respuesta_aleatoria(azar), f"https://ejemplo.com/{i}") for i in range(CANTIDAD_RESPUESTAS)]
+
+    esperados = [procesar_respuesta(raw, url, SEDES) for raw, url in respuestas]
+    esperados = [registro for registro in esperados if registro is not None]
+    assert esperados
+    obtenidos = registros_evento(normalizar_respuestas(respuestas, SEDES))
+
+    assert len(obtenidos) == len(esperados)
+    for obtenido, esperado in zip(obtenidos, esperados):
+        assert obtenido == esperado
+
+
+def test_normalizar_respuestas_sin_respuestas_validas():
+    df = normalizar_respuestas([("no es json", "https://ejemplo.com")], SEDES)
+    assert df.empty
+    assert registros_evento(df) == []
@@ -0,0 +1,40 @@
+import pytest
+from scripts.revisar_links import _interpretar_lote
+
+
+def test_interpreta_un_arreglo_completo():
+    contenido = '[{"item": 1, "valido": false}, {"item": 2, "valido": true}, {"item": 3, "valido": false}]'
+    assert _interpretar_lote(contenido, 3) == {1: False, 2: True, 3: False}
+
+
+def test_quita_el_bloque_markdown_y_el_texto_alrededor():
+    contenido = 'Resultado:\n```json\n[{"item": 1, "valido": true}]\n```'
+    assert _interpretar_lote(contenido, 1) == {1: True}
+
+
+def test_acepta_booleanos_como_texto_y_numeros_como_texto():
+    contenido = '[{"item": "1", "valido": "sí"}, {"item": 2, "valido": "False"}]'
+    assert _interpretar_lote(contenido, 2) == {1: True, 2: False}
+
+
+def test_omite_items_fuera_de_rango_o_ilegibles():
+    contenido = (
+        '[{"item": 0, "valido": true}, {"item": 4, "valido": true}, {"item": "x", "valido": true}, '
+        '{"item": 2, "valido": "tal vez"}, {"item": 3}, "texto", {"item": 1, "valido": true}]'
+    )
+    assert _interpretar_lote(contenido, 3) == {1: True}
+
+
+def test_veredictos_contradictorios_quedan_sin_interpretar():
+    contenido = '[{"item": 1, "valido": true}, {"item": 1, "valido": false}, {"item": 2, "valido": true}]'
+    assert _interpretar_lote(contenido, 2) == {2: True}
+
+
+def test_repetir_el_mismo_veredicto_no_es_contradictorio():
+    contenido = '[{"item": 1, "valido": true}, {"item": 1, "valido": true}]'
+    assert _interpretar_lote(contenido, 1) == {1: True}
+
+
+@pytest.mark.parametrize("contenido", [None, "", "No es válido", "[{\"item\": 1,", '{"item": 1, "valido": true}'])
+def test_respuestas_no_interpretables(contenido):
+    assert _interpretar_lote(contenido, 2) == {}
@@ -0,0 +1,22 @@
+import pytest
+from scripts.urls import canonicalizar_url
+
+
+@pytest.mark.parametrize("url, esperada", [
+    ("http://m.diario.com.ar/amp/nota-1/?utm_source=fb#top", "https://diario.com.ar/nota-1"),
+    ("https://www.diario.com.ar:443/nota?b=2&a=1&fbclid=x", "https://diario.com.ar/nota?a=1&b=2"),
+    ("http://www.diario.com.ar:8080/nota/", "https://diario.com.ar:8080/nota"),
+    ("", ""),
+    (None, ""),
+])
+def test_canonicalizar_url(url, esperada):
+    assert canonicalizar_url(url) == esperada
+
+
+@pytest.mark.parametrize("url, esperada", [
+    ("http://www.diario.com.ar:abc/nota/", "https://diario.com.ar:abc/nota"),
+    ("http://diario.com.ar:99999/nota", "https://diario.com.ar:99999/nota"),
+    ("http://[::1/nota", "http://[::1/nota"),
+])
+def test_canonicalizar_url_mal_formada_no_lanza(url, esperada):
+    assert canonicalizar_url(url) == esperada